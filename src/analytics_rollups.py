@@ -0,0 +1,335 @@
+import json
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from src.cost_rollup import labor_cost
+from src.database_models import (
+    ExpenseEntry, Material, MaterialUsage, Project, ProjectWeekRollup, Resource, ResourceWeekRollup, RollupWatermark,
+    TimeEntry, WorkOrder, WorkOrderTransition
+)
+
+ROLLUP_BATCH_SIZE = 20_000
+GAP_TIMEOUT = timedelta(minutes=10)
+MAX_GAPS = 10_000
+COMPLETED_STATUSES = frozenset({'completed', 'complete', 'done'})
+DEFAULT_LABOR_RATE = Decimal('100.00')  # Hourly rate when a time entry names no resource with a known rate
+
+
+def week_start(moment: datetime) -> datetime:
+    """
+    Monday at midnight of the week containing `moment`.
+    """
+    return datetime(moment.year, moment.month, moment.day) - timedelta(days=moment.weekday())
+
+
+@dataclass(slots=True)
+class ProjectWeekDelta:
+    labor_seconds: int = 0
+    labor_cost: Decimal = Decimal('0')
+    material_cost: Decimal = Decimal('0')
+    expense_total: Decimal = Decimal('0')
+    work_orders_completed: int = 0
+    work_orders_late: int = 0
+    days_late: int = 0
+
+
+@dataclass(slots=True)
+class ResourceWeekDelta:
+    logged_seconds: int = 0
+    labor_cost: Decimal = Decimal('0')
+
+
+@dataclass(slots=True)
+class RollupDeltas:
+    projects: Dict[Tuple[int, datetime], ProjectWeekDelta] = field(default_factory=dict)
+    resources: Dict[Tuple[int, datetime], ResourceWeekDelta] = field(default_factory=dict)
+
+    def project(self, project_id: int, moment: datetime) -> ProjectWeekDelta:
+        key = (project_id, week_start(moment))
+        delta = self.projects.get(key)
+        if delta is None:
+            delta = self.projects[key] = ProjectWeekDelta()
+        return delta
+
+    def resource(self, resource_id: int, moment: datetime) -> ResourceWeekDelta:
+        key = (resource_id, week_start(moment))
+        delta = self.resources.get(key)
+        if delta is None:
+            delta = self.resources[key] = ResourceWeekDelta()
+        return delta
+
+
+class RollupRefresher:
+    """
+    Keeps the weekly project and resource rollups current by folding in only
+    the source rows added since the last refresh.
+
+    Each source table has a watermark: the highest id applied, plus ids
+    below it that were missing when it advanced. Those may belong to
+    transactions that had not committed yet, so they are retried until
+    `gap_timeout` passes. Rows are attributed to the week they start in.
+    Edits and deletes of source rows are not tracked; `rebuild` recomputes
+    everything for reconciliation.
+    """
+
+    def __init__(self, batch_size: int = ROLLUP_BATCH_SIZE, gap_timeout: timedelta = GAP_TIMEOUT,
+                 labor_rate: Decimal = DEFAULT_LABOR_RATE):
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.labor_rate = labor_rate
+        self._sources: Dict[str, Tuple[object, Callable, Callable]] = {
+            'time_entries': (TimeEntry.id, self._time_entry_rows, self._apply_time_entries),
+            'material_usage': (MaterialUsage.id, self._material_usage_rows, self._apply_material_usage),
+            'expense_entries': (ExpenseEntry.id, self._expense_rows, self._apply_expenses),
+            'work_order_transitions': (WorkOrderTransition.id, self._transition_rows, self._apply_transitions),
+        }
+
+    def refresh(self, session: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Apply new source rows to the rollups in the session's transaction and
+        return how many rows of each source were applied. The caller commits.
+        """
+        now = now or datetime.utcnow()
+        applied = {}
+        for source, (id_column, rows_after, apply) in self._sources.items():
+            mark = session.get(RollupWatermark, source, with_for_update=True)
+            if mark is None:
+                mark = RollupWatermark(source=source, last_id=0, gaps='{}')
+                session.add(mark)
+            gaps = json.loads(mark.gaps or '{}')
+            applied[source] = 0
+            while True:
+                pending = or_(id_column > mark.last_id, id_column.in_([int(gap) for gap in gaps]))
+                rows = session.execute(rows_after(pending).order_by(id_column).limit(self.batch_size)).all()
+                deltas = RollupDeltas()
+                apply(rows, deltas)
+                self._merge(session, deltas)
+                self._advance(mark, gaps, [row.id for row in rows], now)
+                applied[source] += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+            mark.gaps = json.dumps(gaps)
+            mark.refreshed_at = now
+        session.flush()
+        return applied
+
+    def rebuild(self, session: Session) -> Dict[str, int]:
+        """
+        Drop the rollups and watermarks and recompute them from all source rows.
+        """
+        for model in (ProjectWeekRollup, ResourceWeekRollup, RollupWatermark):
+            session.execute(delete(model))
+        return self.refresh(session)
+
+    def _advance(self, mark: RollupWatermark, gaps: Dict[str, str], ids: List[int], now: datetime) -> None:
+        seen = set(ids)
+        for gap in [gap for gap in gaps if int(gap) in seen]:
+            del gaps[gap]
+        newest = max(seen, default=mark.last_id)
+        if newest > mark.last_id:
+            stamp = now.isoformat()
+            for missing in range(max(mark.last_id + 1, newest - MAX_GAPS), newest):
+                if missing not in seen:
+                    gaps.setdefault(str(missing), stamp)
+            mark.last_id = newest
+        expired = (now - self.gap_timeout).isoformat()
+        for gap in [gap for gap, first_seen in gaps.items() if first_seen < expired]:
+            del gaps[gap]
+        if len(gaps) > MAX_GAPS:
+            for gap in sorted(gaps, key=int)[:len(gaps) - MAX_GAPS]:
+                del gaps[gap]
+
+    def _merge(self, session: Session, deltas: RollupDeltas) -> None:
+        for model, owner, changes in ((ProjectWeekRollup, 'project_id', deltas.projects),
+                                      (ResourceWeekRollup, 'resource_id', deltas.resources)):
+            if not changes:
+                continue
+            keys = tuple_(getattr(model, owner), model.week_start)
+            existing = {(getattr(row, owner), row.week_start): row
+                        for row in session.scalars(select(model).where(keys.in_(list(changes))))}
+            for key, delta in changes.items():
+                row = existing.get(key)
+                if row is None:
+                    row = model(**{owner: key[0], 'week_start': key[1]})
+                    session.add(row)
+                for column in fields(delta):
+                    setattr(row, column.name, (getattr(row, column.name) or 0) + getattr(delta, column.name))
+
+    # Sources: a select of the new rows, and how each row changes the rollups
+
+    def _time_entry_rows(self, pending):
+        return (select(TimeEntry.id, TimeEntry.project_id, TimeEntry.resource_id, TimeEntry.start_time,
+                       TimeEntry.end_time, Resource.cost_per_hour)
+                .outerjoin(Resource, Resource.id == TimeEntry.resource_id).where(pending))
+
+    def _apply_time_entries(self, rows, deltas: RollupDeltas) -> None:
+        for row in rows:
+            seconds = int((row.end_time - row.start_time).total_seconds())
+            cost = labor_cost(seconds, row.cost_per_hour if row.cost_per_hour is not None else self.labor_rate)
+            project = deltas.project(row.project_id, row.start_time)
+            project.labor_seconds += seconds
+            project.labor_cost += cost
+            if row.resource_id is not None:
+                resource = deltas.resource(row.resource_id, row.start_time)
+                resource.logged_seconds += seconds
+                resource.labor_cost += cost
+
+    def _material_usage_rows(self, pending):
+        return (select(MaterialUsage.id, MaterialUsage.used_at, MaterialUsage.quantity_used, WorkOrder.project_id,
+                       Material.unit_cost)
+                .outerjoin(WorkOrder, WorkOrder.id == MaterialUsage.work_order_id)
+                .outerjoin(Material, Material.id == MaterialUsage.material_id).where(pending))
+
+    def _apply_material_usage(self, rows, deltas: RollupDeltas) -> None:
+        for row in rows:
+            if row.project_id is not None and row.unit_cost is not None:
+                deltas.project(row.project_id, row.used_at).material_cost += row.unit_cost * row.quantity_used
+
+    def _expense_rows(self, pending):
+        return select(ExpenseEntry.id, ExpenseEntry.project_id, ExpenseEntry.date, ExpenseEntry.amount).where(pending)
+
+    def _apply_expenses(self, rows, deltas: RollupDeltas) -> None:
+        for row in rows:
+            deltas.project(row.project_id, row.date).expense_total += row.amount
+
+    def _transition_rows(self, pending):
+        return (select(WorkOrderTransition.id, WorkOrderTransition.at, WorkOrderTransition.from_status,
+                       WorkOrderTransition.to_status, WorkOrder.project_id, WorkOrder.end_date)
+                .join(WorkOrder, WorkOrder.id == WorkOrderTransition.work_order_id).where(pending))
+
+    def _apply_transitions(self, rows, deltas: RollupDeltas) -> None:
+        for row in rows:
+            was_done = (row.from_status or '').lower() in COMPLETED_STATUSES
+            done = row.to_status.lower() in COMPLETED_STATUSES
+            if row.project_id is None or was_done == done:
+                continue
+            sign = 1 if done else -1  # Reopening takes the completion back out
+            project = deltas.project(row.project_id, row.at)
+            project.work_orders_completed += sign
+            if row.at > row.end_date:
+                project.work_orders_late += sign
+                project.days_late += sign * (row.at - row.end_date).days
+
+
+def _week_range(query, column, first_week: Optional[datetime], last_week: Optional[datetime]):
+    if first_week is not None:
+        query = query.where(column >= week_start(first_week))
+    if last_week is not None:
+        query = query.where(column <= week_start(last_week))
+    return query
+
+
+def project_totals(session: Session, project_ids: Optional[List[int]] = None,
+                   first_week: Optional[datetime] = None, last_week: Optional[datetime] = None,
+                   now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Cost against budget and schedule variance per project, summed from the
+    weekly rollups. Schedule variance is planned duration minus elapsed days,
+    as ProjectManagementService reports it.
+    """
+    now = now or datetime.utcnow()
+    totals = _week_range(
+        select(ProjectWeekRollup.project_id,
+               func.sum(ProjectWeekRollup.labor_seconds).label('labor_seconds'),
+               func.sum(ProjectWeekRollup.labor_cost).label('labor_cost'),
+               func.sum(ProjectWeekRollup.material_cost).label('material_cost'),
+               func.sum(ProjectWeekRollup.expense_total).label('expense_total'),
+               func.sum(ProjectWeekRollup.work_orders_completed).label('work_orders_completed'),
+               func.sum(ProjectWeekRollup.work_orders_late).label('work_orders_late'),
+               func.sum(ProjectWeekRollup.days_late).label('days_late'))
+        .group_by(ProjectWeekRollup.project_id),
+        ProjectWeekRollup.week_start, first_week, last_week).subquery()
+    query = (select(Project.id, Project.name, Project.budget, Project.start_date, Project.end_date, totals)
+             .outerjoin(totals, totals.c.project_id == Project.id).order_by(Project.id))
+    if project_ids is not None:
+        query = query.where(Project.id.in_(project_ids))
+    results = []
+    for row in session.execute(query):
+        labor, material, expenses = (Decimal(row.labor_cost or 0), Decimal(row.material_cost or 0),
+                                     Decimal(row.expense_total or 0))
+        total = labor + material + expenses
+        budget = Decimal(row.budget)
+        results.append({
+            'project_id': row.id,
+            'name': row.name,
+            'budget': budget,
+            'total_cost': total,
+            'labor_hours': Decimal(row.labor_seconds or 0) / 3600,
+            'labor_cost': labor,
+            'material_cost': material,
+            'expense_total': expenses,
+            'cost_variance': budget - total,
+            'budget_used': float(total / budget) if budget else None,
+            'schedule_variance': (row.end_date - row.start_date).days - (now - row.start_date).days,
+            'work_orders_completed': row.work_orders_completed or 0,
+            'work_orders_late': row.work_orders_late or 0,
+            'days_late': row.days_late or 0,
+        })
+    return results
+
+
+def weekly_project_costs(session: Session, first_week: Optional[datetime] = None,
+                         last_week: Optional[datetime] = None) -> List[Dict]:
+    """
+    Portfolio cost and completions per week, across all projects.
+    """
+    query = _week_range(
+        select(ProjectWeekRollup.week_start,
+               func.sum(ProjectWeekRollup.labor_cost).label('labor_cost'),
+               func.sum(ProjectWeekRollup.material_cost).label('material_cost'),
+               func.sum(ProjectWeekRollup.expense_total).label('expense_total'),
+               func.sum(ProjectWeekRollup.work_orders_completed).label('work_orders_completed'),
+               func.sum(ProjectWeekRollup.work_orders_late).label('work_orders_late'))
+        .group_by(ProjectWeekRollup.week_start).order_by(ProjectWeekRollup.week_start),
+        ProjectWeekRollup.week_start, first_week, last_week)
+    return [{
+        'week_start': row.week_start,
+        'labor_cost': Decimal(row.labor_cost),
+        'material_cost': Decimal(row.material_cost),
+        'expense_total': Decimal(row.expense_total),
+        'total_cost': Decimal(row.labor_cost) + Decimal(row.material_cost) + Decimal(row.expense_total),
+        'work_orders_completed': row.work_orders_completed,
+        'work_orders_late': row.work_orders_late,
+    } for row in session.execute(query)]
+
+
+def utilisation(session: Session, by: str = 'department', first_week: Optional[datetime] = None,
+                last_week: Optional[datetime] = None) -> List[Dict]:
+    """
+    Logged hours against weekly capacity, per week and department or resource.
+    A department's capacity counts all its resources, including idle ones.
+    Resources without a department are grouped under None.
+    """
+    if by not in ('department', 'resource'):
+        raise ValueError(f"Unknown utilisation grouping: {by}")
+    group = Resource.department if by == 'department' else Resource.id
+    capacities = dict(session.execute(select(group, func.sum(Resource.weekly_capacity_hours)).group_by(group)).all())
+    query = _week_range(
+        select(group.label('group'), ResourceWeekRollup.week_start,
+               func.sum(ResourceWeekRollup.logged_seconds).label('logged_seconds'),
+               func.sum(ResourceWeekRollup.labor_cost).label('labor_cost'))
+        .join(Resource, Resource.id == ResourceWeekRollup.resource_id)
+        .group_by(group, ResourceWeekRollup.week_start).order_by(ResourceWeekRollup.week_start, group),
+        ResourceWeekRollup.week_start, first_week, last_week)
+    results = []
+    for row in session.execute(query):
+        logged_hours = Decimal(row.logged_seconds) / 3600
+        capacity = Decimal(capacities.get(row.group) or 0)
+        results.append({
+            by: row.group,
+            'week_start': row.week_start,
+            'logged_hours': logged_hours,
+            'capacity_hours': capacity,
+            'utilisation': float(logged_hours / capacity) if capacity else None,
+            'labor_cost': Decimal(row.labor_cost),
+        })
+    return results
+
+
+def last_refreshed(session: Session) -> Optional[datetime]:
+    return session.scalar(select(func.min(RollupWatermark.refreshed_at)))
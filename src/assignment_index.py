@@ -0,0 +1,169 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from src.core_domain_models import AssignmentConflict
+from src.resource_calendar import from_seconds, to_seconds
+from src.segment_tree import MaxSegmentTree
+
+
+class ResourceIntervalIndex:
+    """
+    Booked [start, end) intervals of one resource, sorted by start. Unlike a
+    ResourceCalendar the intervals may overlap, so the index can report existing
+    double bookings as well as prevent new ones.
+
+    A max segment tree over the interval ends answers overlap queries in
+    O(log n + k) for k hits; it is built on the first query and then updated in
+    place as intervals are added and removed.
+    """
+
+    def __init__(self):
+        self._starts = array('q')
+        self._ends = array('q')
+        self._keys: List[Hashable] = []
+        self._bounds: Dict[Hashable, Tuple[int, int]] = {}
+        self._tree: Optional[MaxSegmentTree] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._bounds
+
+    def add(self, key: Hashable, start: int, end: int) -> None:
+        if key in self._bounds:
+            raise ValueError(f"Assignment {key!r} is already indexed")
+        index = bisect_left(self._starts, start)
+        self._starts.insert(index, start)
+        self._ends.insert(index, end)
+        self._keys.insert(index, key)
+        self._bounds[key] = (start, end)
+        if self._tree is not None:
+            self._tree.replace(index, index, [end])
+
+    def remove(self, key: Hashable) -> bool:
+        bounds = self._bounds.pop(key, None)
+        if bounds is None:
+            return False
+        index = bisect_left(self._starts, bounds[0])
+        while self._keys[index] != key:
+            index += 1
+        del self._starts[index]
+        del self._ends[index]
+        del self._keys[index]
+        if self._tree is not None:
+            self._tree.replace(index, index + 1, [])
+        return True
+
+    def overlapping(self, start: int, end: int) -> List[Hashable]:
+        """
+        Keys of intervals that intersect [start, end), in start order.
+        """
+        # Only intervals starting before `end` can overlap; among those, report
+        # the ones ending after `start` by descending into subtrees whose max end does.
+        limit = bisect_left(self._starts, end)
+        if limit == 0:
+            return []
+        if self._tree is None:
+            self._tree = MaxSegmentTree(self._ends, -(1 << 62))
+        tree, size = self._tree.tree, self._tree.size
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or tree[node] <= start:
+                continue
+            if node >= size:
+                found.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return [self._keys[index] for index in found]
+
+    def bounds(self, key: Hashable) -> Tuple[int, int]:
+        return self._bounds[key]
+
+
+class AssignmentIndex:
+    """
+    Resource assignments partitioned by resource, for double-booking checks.
+    Keys identify an assignment within its resource, e.g. a work order id.
+    """
+
+    def __init__(self):
+        self._by_resource: Dict[Hashable, ResourceIntervalIndex] = {}
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._by_resource.values())
+
+    def add(self, resource_id: Hashable, key: Hashable, start: datetime, end: datetime) -> None:
+        if end <= start:
+            raise ValueError("Assignment must end after it starts")
+        index = self._by_resource.get(resource_id)
+        if index is None:
+            index = self._by_resource[resource_id] = ResourceIntervalIndex()
+        index.add(key, to_seconds(start), to_seconds(end))
+
+    def remove(self, resource_id: Hashable, key: Hashable) -> bool:
+        index = self._by_resource.get(resource_id)
+        return index is not None and index.remove(key)
+
+    def overlapping(self, resource_id: Hashable, start: datetime, end: datetime) -> List[Hashable]:
+        """
+        Keys of the assignments of a resource that intersect [start, end).
+        """
+        index = self._by_resource.get(resource_id)
+        if index is None:
+            return []
+        return index.overlapping(to_seconds(start), to_seconds(end))
+
+    def is_free(self, resource_id: Hashable, start: datetime, end: datetime) -> bool:
+        return not self.overlapping(resource_id, start, end)
+
+    def conflicts(self, batch: Iterable[Tuple[Hashable, Hashable, datetime, datetime]]) -> List[AssignmentConflict]:
+        """
+        Every conflict of a batch of proposed (resource_id, key, start, end)
+        assignments, against the index and among themselves. The index is not
+        modified. Runs in O(n log n + k) for k conflicts.
+        """
+        conflicts = []
+        by_resource: Dict[Hashable, List[Tuple[int, int, Hashable]]] = {}
+        for resource_id, key, start, end in batch:
+            lo, hi = to_seconds(start), to_seconds(end)
+            index = self._by_resource.get(resource_id)
+            if index is not None:
+                for existing in index.overlapping(lo, hi):
+                    existing_lo, existing_hi = index.bounds(existing)
+                    conflicts.append(_conflict(resource_id, key, existing, max(lo, existing_lo), min(hi, existing_hi)))
+            by_resource.setdefault(resource_id, []).append((lo, hi, key))
+
+        # Sweep each resource's batch by start time, keeping the still-open intervals in a heap
+        for resource_id, items in by_resource.items():
+            items.sort(key=lambda item: (item[0], item[1]))
+            active: List[Tuple[int, int, Hashable]] = []
+            for order, (lo, hi, key) in enumerate(items):
+                while active and active[0][0] <= lo:
+                    heapq.heappop(active)
+                for open_hi, open_order, open_key in active:
+                    conflicts.append(_conflict(resource_id, key, open_key, lo, min(hi, open_hi)))
+                heapq.heappush(active, (hi, order, key))
+        return conflicts
+
+    def blocked_until(self, resource_id: Hashable, start: int, end: int) -> Optional[int]:
+        """
+        Latest end of the assignments overlapping [start, end), or None if the
+        resource is free then. Bounds are epoch seconds, for the schedulers.
+        """
+        index = self._by_resource.get(resource_id)
+        if index is None:
+            return None
+        return max((index.bounds(key)[1] for key in index.overlapping(start, end)), default=None)
+
+
+def _conflict(resource_id: Hashable, key: Hashable, other: Hashable, start: int, end: int) -> AssignmentConflict:
+    return AssignmentConflict(resource_id=resource_id, assignment_id=key, conflicting_id=other,
+                              overlap_start=from_seconds(start), overlap_end=from_seconds(end))
@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src import fast_rest_api
+from src.database_models import AsyncSessionLocal, Project, User, UserRole, init_async_db
+
+
+async def seed(url: str) -> Tuple[AsyncEngine, User]:
+    engine = await init_async_db(url)
+    async with AsyncSessionLocal() as db:
+        user = User(username='bench', email='bench@example.com', password_hash='x', role=UserRole.MANAGER)
+        db.add_all([user, Project(name='Bench', start_date=datetime(2025, 1, 1), end_date=datetime(2025, 12, 31),
+                                  budget=0)])
+        await db.commit()
+    return engine, user
+
+
+@contextmanager
+def bench_client(url: str) -> Iterator[TestClient]:
+    """
+    A test client on a freshly seeded database, signed in as a manager.
+    """
+    engine, user = asyncio.run(seed(url))
+    fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: user
+    try:
+        yield TestClient(fast_rest_api.app)
+    finally:
+        fast_rest_api.app.dependency_overrides.clear()
+        asyncio.run(engine.dispose())
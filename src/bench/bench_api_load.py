@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional
+
+import httpx
+
+from src import fast_rest_api
+from src.bench.api_fixtures import seed
+
+
+async def run_load(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> List[float]:
+    """
+    Fire `requests` GETs at `path` from `concurrency` workers; returns per-request latencies.
+    """
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def main_async(path: str, requests: int, concurrency: int, url: str,
+                     base_url: Optional[str], token: Optional[str]) -> None:
+    engine = None
+    if base_url:
+        # Against a running server, e.g. `uvicorn src.fast_rest_api:app`, to compare revisions
+        client = httpx.AsyncClient(base_url=base_url, headers={'Authorization': f"Bearer {token}"} if token else {})
+    else:
+        engine, user = await seed(url)
+        fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: user
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fast_rest_api.app), base_url='http://bench')
+
+    async with client:
+        await run_load(client, path, min(requests, concurrency), concurrency)  # warm the pool
+        started = time.perf_counter()
+        latencies = await run_load(client, path, requests, concurrency)
+        elapsed = time.perf_counter() - started
+    if engine is not None:
+        fast_rest_api.app.dependency_overrides.clear()
+        await engine.dispose()
+
+    latencies.sort()
+    print(f"GET {path}: {requests} requests, concurrency {concurrency}")
+    print(f"throughput: {requests / elapsed:.0f} req/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the ERP API")
+    parser.add_argument('--path', default='/projects/1')
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--url', default='sqlite://', help="database URL for the in-process app")
+    parser.add_argument('--base-url', help="load a running server instead of the in-process app")
+    parser.add_argument('--token', help="bearer token for --base-url")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.path, args.requests, args.concurrency, args.url, args.base_url, args.token))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.capacity_simulation import CapacitySimulator, PlanSnapshot, Scenario, daily_windows
+from src.core_domain_models import Resource, ResourceType, WorkOrder, WorkOrderStatus
+from src.resource_calendar import ResourceCalendar
+
+
+def build_plan(machines: int, orders: int, weeks: int, seed: int) -> PlanSnapshot:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6)
+    resources = []
+    for i in range(machines):
+        shift = daily_windows([f"M{i}"], start, weeks * 7, timedelta(hours=6), timedelta(hours=8))
+        resources.append(Resource(id=f"M{i}", name=f"Machine {i}", type=ResourceType.MACHINE,
+                                  capacity_per_hour=Decimal(rng.randint(5, 20)),
+                                  cost_per_hour=Decimal(rng.randint(3_000, 12_000)) / 100, availability_schedule={},
+                                  calendar=ResourceCalendar([(lo, hi) for _, lo, hi in shift])))
+    work_orders = [
+        WorkOrder(id=f"WO{i}", bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=rng.randint(5, 40),
+                  start_date=start + timedelta(days=rng.randrange(weeks)), end_date=start, assigned_resources=[],
+                  actual_labor_hours=Decimal('0'), actual_material_usage={}, priority=rng.randint(0, 3),
+                  due_date=start + timedelta(days=rng.randrange(7, weeks * 7)))
+        for i in range(orders)
+    ]
+    return PlanSnapshot.capture(resources, work_orders, start, start + timedelta(weeks=weeks))
+
+
+def build_scenarios(snapshot: PlanSnapshot, count: int, seed: int):
+    rng = random.Random(seed)
+    machine_ids = [resource.id for resource in snapshot.resources]
+    week = timedelta(weeks=1)
+    scenarios = [Scenario('baseline')]
+    while len(scenarios) < count:
+        first = snapshot.horizon_start + week * rng.randrange(4)
+        down = rng.sample(machine_ids, 2)
+        if rng.random() < 0.5:
+            scenarios.append(Scenario(f"{down[0]}, {down[1]} down from {first:%d %b}",
+                                      downtime=tuple((machine, first, first + week) for machine in down)))
+        else:
+            boosted = rng.sample(machine_ids, 5)
+            scenarios.append(Scenario(f"second shift on {len(boosted)} machines from {first:%d %b}",
+                                      extra_time=daily_windows(boosted, first, 7, timedelta(hours=14),
+                                                               timedelta(hours=8))))
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="What-if capacity scenarios, sequential vs process pool")
+    parser.add_argument('--machines', type=int, default=60)
+    parser.add_argument('--orders', type=int, default=8_000)
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--scenarios', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    snapshot = build_plan(args.machines, args.orders, args.weeks, args.seed)
+    scenarios = build_scenarios(snapshot, args.scenarios, args.seed)
+
+    started = time.perf_counter()
+    inline = CapacitySimulator(snapshot, workers=0).run(scenarios)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pooled = CapacitySimulator(snapshot, workers=args.workers).run(scenarios)
+    parallel = time.perf_counter() - started
+
+    assert [(r.late_orders, r.cost) for r in pooled] == [(r.late_orders, r.cost) for r in inline]
+    print(f"{args.scenarios} scenarios, {args.orders} work orders on {args.machines} machines")
+    print(f"sequential:          {sequential:.2f}s")
+    print(f"{args.workers} worker processes: {parallel:.2f}s")
+    for result in pooled[:5]:
+        busiest = max(result.utilisation.values())
+        print(f"  {result.name:<40} late {len(result.late_orders):>5}  cost {result.cost:>12}  "
+              f"busiest {busiest:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.core_domain_models import Material, Resource, ResourceType, TimeEntry, WorkOrder, WorkOrderStatus
+from src.cost_rollup import CostRollupEngine, reference_costs
+from src.material_registry import MaterialRegistry
+from src.resource_calendar import ResourceCalendar
+from src.time_expense_store import TimeEntryStore
+
+
+def build_dataset(orders: int, entries: int, resources: int, skus: int, seed: int):
+    rng = random.Random(seed)
+    registry = MaterialRegistry(
+        Material(id=f"M{i}", name=f"Material {i}", description='', unit_cost=Decimal(rng.randint(1, 99_999)) / 100,
+                 stock_quantity=0, reorder_point=0, lead_time_days=0)
+        for i in range(skus))
+    staff = {f"R{i}": Resource(id=f"R{i}", name=f"R{i}", type=ResourceType.HUMAN, capacity_per_hour=Decimal('1'),
+                               cost_per_hour=Decimal(rng.randint(2_000, 20_000)) / 100, availability_schedule={},
+                               calendar=ResourceCalendar([]))
+             for i in range(resources)}
+    start = datetime(2025, 1, 6)
+    work_orders = [
+        WorkOrder(id=f"WO{i}", bom_id='B1', status=WorkOrderStatus.COMPLETED, quantity=1, start_date=start,
+                  end_date=start, assigned_resources=[], actual_labor_hours=Decimal('0'),
+                  actual_material_usage={f"M{rng.randrange(skus)}": rng.randint(1, 50) for _ in range(3)})
+        for i in range(orders)
+    ]
+    store = TimeEntryStore()
+    for i in range(entries):
+        began = start + timedelta(seconds=rng.randrange(365 * 86_400))
+        store.append(TimeEntry(id=f"T{i}", resource_id=f"R{rng.randrange(resources)}", project_id='P1',
+                               work_order_id=f"WO{rng.randrange(orders)}", start_time=began,
+                               end_time=began + timedelta(seconds=rng.randint(60, 12 * 3600)),
+                               activity_description=''))
+    return registry, staff, work_orders, store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost rollup of completed work orders, cents engine vs Decimal")
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--entries', type=int, default=400_000)
+    parser.add_argument('--resources', type=int, default=500)
+    parser.add_argument('--skus', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    registry, staff, work_orders, store = build_dataset(args.orders, args.entries, args.resources, args.skus,
+                                                        args.seed)
+    engine = CostRollupEngine(registry, staff)
+
+    started = time.perf_counter()
+    costs = engine.rollup(work_orders, store).costs()
+    fast = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = reference_costs(work_orders, store, registry, staff)
+    slow = time.perf_counter() - started
+
+    assert costs == expected, "cents engine disagrees with the Decimal reference"
+    print(f"{args.orders} work orders, {args.entries} time entries")
+    print(f"cents engine:      {fast:.3f}s")
+    print(f"Decimal reference: {slow:.3f}s")
+    print(f"identical to the cent, total {sum(costs.values())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import gc
+import random
+import subprocess
+import sys
+import tracemalloc
+import types
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable
+
+from src import core_domain_models
+from src.catalogue_store import BomStore, MaterialStore, WorkOrderStore
+from src.material_registry import MaterialRegistry
+
+BASELINE_REVISION = 'a81aec9'  # Last revision before the models were slotted and keyed by id
+
+
+def previous_models(revision: str) -> types.ModuleType:
+    """
+    core_domain_models as of a git revision, loaded alongside the current one.
+    """
+    path = f"{revision}:src/core_domain_models.py"
+    source = subprocess.run(['git', 'show', path], capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(f"core_domain_models_{revision}")
+    sys.modules[module.__name__] = module  # dataclasses resolve field types through sys.modules
+    exec(compile(source, path, 'exec'), module.__dict__)
+    return module
+
+
+def generate(models: types.ModuleType, skus: int, boms: int, orders: int, components: int, seed: int, by_id: bool,
+             keep: Callable = list):
+    """
+    The catalogue and open orders as (materials, BOMs, work orders) iterables.
+    `keep` receives the materials first and returns how later records refer to them.
+    """
+    material_cls, bom_cls, order_cls = models.Material, models.BillOfMaterials, models.WorkOrder
+    rng = random.Random(seed)
+    materials = [material_cls(f"M{i}", f"Material {i}", '', Decimal('1.25'), rng.randint(0, 500),
+                              rng.randint(0, 50), rng.randint(0, 60)) for i in range(skus)]
+    kept = keep(materials)
+
+    def key(material):
+        return material.id if by_id else material
+
+    catalogue = (bom_cls(f"B{i}", f"P{i}", '1', {key(m): rng.randint(1, 5) for m in rng.sample(materials, components)},
+                         Decimal('1.5'), '', {}) for i in range(boms))
+    start = datetime(2025, 1, 6)
+    open_orders = (order_cls(f"WO{i}", f"B{rng.randrange(boms)}", models.WorkOrderStatus.PLANNED, rng.randint(1, 20),
+                             start + timedelta(days=rng.randrange(365)), start, [], Decimal('0'),
+                             {key(m): rng.randint(1, 9) for m in rng.sample(materials, 4)}, 0, None)
+                   for i in range(orders))
+    return kept, catalogue, open_orders
+
+
+def build(models: types.ModuleType, *sizes, by_id: bool):
+    materials, catalogue, open_orders = generate(models, *sizes, by_id=by_id,
+                                                 keep=MaterialRegistry if by_id else list)
+    return materials, list(catalogue), list(open_orders)
+
+
+def build_columnar(*sizes):
+    stores = {}
+
+    def keep(materials):
+        store = stores['materials'] = MaterialStore()
+        for material in materials:
+            store.register(material)
+        return store
+
+    materials, catalogue, open_orders = generate(core_domain_models, *sizes, by_id=True, keep=keep)
+    boms, orders = BomStore(materials), WorkOrderStore(materials)
+    for bom in catalogue:
+        boms.append(bom)
+    for work_order in open_orders:
+        orders.append(work_order)
+    return materials, boms, orders
+
+
+def measure(label: str, build_data: Callable, *args, **kwargs) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = build_data(*args, **kwargs)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    gc.collect()
+    print(f"{label:<38} {current / 2 ** 20:8.1f} MiB")
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory footprint of the in-memory catalogue and open orders")
+    parser.add_argument('--skus', type=int, default=200_000)
+    parser.add_argument('--boms', type=int, default=20_000)
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--components', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--baseline-rev', default=BASELINE_REVISION,
+                        help="git revision whose core_domain_models is the baseline")
+    args = parser.parse_args()
+    sizes = (args.skus, args.boms, args.orders, args.components, args.seed)
+
+    before = measure(f"models at {args.baseline_rev}, keyed by Material", build, previous_models(args.baseline_rev),
+                     *sizes, by_id=False)
+    slotted = measure('slotted, keyed by id via registry', build, core_domain_models, *sizes, by_id=True)
+    columnar = measure('columnar stores', build_columnar, *sizes)
+    print(f"{args.skus} materials, {args.boms} BOMs, {args.orders} open work orders: slotted objects "
+          f"{slotted / before:.0%}, columnar stores {columnar / before:.0%} of the {args.baseline_rev} footprint")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from src import fast_rest_api
+from src.bench.api_fixtures import seed
+from src.bench.bench_api_load import run_load
+from src.database_models import AsyncSessionLocal, User, UserRole
+from src.password_hashing import PasswordHasher
+
+
+async def login_storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> None:
+    remaining = iter(range(logins))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.post('/token', data={'username': 'storm', 'password': 'secret'})
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def measure(hasher: PasswordHasher, url: str, logins: int, requests: int) -> None:
+    engine, user = await seed(url)
+    fast_rest_api.password_hasher = hasher
+    async with AsyncSessionLocal() as db:
+        db.add(User(username='storm', email='storm@example.com', role=UserRole.WORKER,
+                    password_hash=await hasher.hash('secret')))
+        await db.commit()
+    fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: user
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fast_rest_api.app),
+                                 base_url='http://bench') as client:
+        started = time.perf_counter()
+        storm = asyncio.ensure_future(login_storm(client, logins, concurrency=20))
+        latencies = await run_load(client, '/projects/1', requests, concurrency=5)
+        await storm
+        elapsed = time.perf_counter() - started
+
+    fast_rest_api.app.dependency_overrides.clear()
+    hasher.shutdown()
+    await engine.dispose()
+
+    latencies.sort()
+    mode = f"pool of {hasher.workers}" if hasher.workers else "inline"
+    print(f"{mode:>10}: {logins / elapsed:6.1f} logins/s, GET /projects/1 "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of an unrelated endpoint during a login storm")
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--url', default='sqlite://')
+    args = parser.parse_args()
+    for workers in (0, args.workers):
+        asyncio.run(measure(PasswordHasher(rounds=args.rounds, workers=workers), args.url, args.logins, args.requests))
+
+
+if __name__ == '__main__':
+    main()
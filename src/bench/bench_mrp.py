@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.bom_explosion import BomExplosionEngine
+from src.core_domain_models import BillOfMaterials, Material, WorkOrder, WorkOrderStatus
+from src.material_registry import MaterialRegistry
+from src.mrp import MaterialRequirementsPlanningService
+
+
+def build_dataset(skus: int, boms: int, orders: int, components: int, seed: int):
+    rng = random.Random(seed)
+    materials = [
+        Material(id=f"M{i}", name=f"Material {i}", description='', unit_cost=Decimal('1.00'),
+                 stock_quantity=rng.randint(0, 500), reorder_point=rng.randint(0, 50),
+                 lead_time_days=rng.randint(0, 60))
+        for i in range(skus)
+    ]
+    bill_of_materials = [
+        BillOfMaterials(id=f"B{i}", product_id=f"P{i}", version='1',
+                        components={material.id: rng.randint(1, 5) for material in rng.sample(materials, components)},
+                        labor_hours=Decimal('1'), notes='')
+        for i in range(boms)
+    ]
+    horizon_start = datetime(2025, 1, 6)
+    work_orders = [
+        WorkOrder(id=f"WO{i}", bom_id=rng.choice(bill_of_materials).id, status=WorkOrderStatus.PLANNED,
+                  quantity=rng.randint(1, 20), start_date=horizon_start + timedelta(days=rng.randint(0, 363)),
+                  end_date=horizon_start, assigned_resources=[], actual_labor_hours=Decimal('0'),
+                  actual_material_usage={})
+        for i in range(orders)
+    ]
+    return materials, bill_of_materials, work_orders, horizon_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full MRP netting run")
+    parser.add_argument('--skus', type=int, default=50_000)
+    parser.add_argument('--boms', type=int, default=5_000)
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--components', type=int, default=12)
+    parser.add_argument('--buckets', type=int, default=52)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    materials, boms, work_orders, horizon_start = build_dataset(
+        args.skus, args.boms, args.orders, args.components, args.seed)
+    engine = BomExplosionEngine(MaterialRegistry(materials))
+    for bom in boms:
+        engine.register_bom(bom)
+    service = MaterialRequirementsPlanningService(engine)
+
+    started = time.perf_counter()
+    result = service.run(work_orders, materials, horizon_start, buckets=args.buckets)
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = service.run(work_orders, materials, horizon_start, buckets=args.buckets)
+    warm = time.perf_counter() - started
+
+    purchase_orders = result.planned_purchase_orders()
+    print(f"{args.skus} SKUs x {args.buckets} buckets, {args.orders} work orders")
+    print(f"cold run (explosions computed): {cold:.3f}s")
+    print(f"warm run (explosions cached):   {warm:.3f}s")
+    print(f"planned purchase orders: {len(purchase_orders)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, create_engine, insert, text
+
+from src.database_models import Base, create_schema
+
+EPOCH = datetime(2025, 1, 1)
+HORIZON_SECONDS = 365 * 24 * 3600
+
+QUERIES = {
+    'open work orders by status': (
+        "SELECT id FROM work_orders WHERE status = :status ORDER BY start_date, id LIMIT 100",
+        {'status': 'open'}),
+    'assignments overlapping a window': (
+        "SELECT id FROM resource_assignments WHERE resource_id = :resource "
+        "AND start_time < :window_end AND end_time > :window_start",
+        {'resource': 17, 'window_start': EPOCH + timedelta(days=100), 'window_end': EPOCH + timedelta(days=101)}),
+    'material usage of a work order': (
+        "SELECT sum(quantity_used) FROM material_usage WHERE work_order_id = :work_order",
+        {'work_order': 4242}),
+    'project hours in a month': (
+        "SELECT count(*) FROM time_entries WHERE project_id = :project "
+        "AND start_time >= :month_start AND start_time < :month_end",
+        {'project': 7, 'month_start': datetime(2025, 6, 1), 'month_end': datetime(2025, 7, 1)}),
+}
+
+
+def unindexed_metadata() -> MetaData:
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata).indexes.clear()
+    return metadata
+
+
+def generate(connection, tables, rows: int, seed: int, chunk: int = 50_000) -> None:
+    rng = random.Random(seed)
+    work_orders = max(rows // 10, 1)
+
+    def moment() -> datetime:
+        return EPOCH + timedelta(seconds=rng.randrange(HORIZON_SECONDS))
+
+    def work_order(i):
+        start = moment()
+        return {'id': i + 1, 'project_id': rng.randrange(1, 1001), 'quantity': rng.randint(1, 50),
+                'status': rng.choice(('open', 'planned', 'complete', 'complete', 'complete')),
+                'start_date': start, 'end_date': start + timedelta(days=rng.randint(1, 30))}
+
+    # Assignments may not overlap per resource (PostgreSQL enforces it with an
+    # exclusion constraint), so each one sits inside its own slot of the horizon
+    resources = 500
+    slot_seconds = HORIZON_SECONDS // max(-(-work_orders // resources), 1)
+
+    def assignment(i):
+        length = min(rng.randint(1, 12) * 3600, slot_seconds)
+        start = EPOCH + timedelta(seconds=i // resources * slot_seconds + rng.randrange(slot_seconds - length + 1))
+        return {'id': i + 1, 'work_order_id': rng.randrange(1, work_orders + 1), 'resource_id': i % resources,
+                'start_time': start, 'end_time': start + timedelta(seconds=length)}
+
+    def usage(i):
+        return {'id': i + 1, 'work_order_id': rng.randrange(1, work_orders + 1), 'material_id': rng.randrange(20_000),
+                'quantity_used': rng.randint(1, 20), 'used_at': moment()}
+
+    def time_entry(i):
+        start = moment()
+        return {'id': i + 1, 'project_id': rng.randrange(1, 1001), 'resource_id': rng.randrange(500),
+                'start_time': start, 'end_time': start + timedelta(hours=rng.randint(1, 10))}
+
+    for name, count, make in (('work_orders', work_orders, work_order),
+                              ('resource_assignments', work_orders, assignment),
+                              ('material_usage', rows, usage),
+                              ('time_entries', rows, time_entry)):
+        for offset in range(0, count, chunk):
+            connection.execute(insert(tables[name]), [make(i) for i in range(offset, min(offset + chunk, count))])
+
+
+def explain(connection, sql: str, params: dict) -> str:
+    if connection.dialect.name == 'sqlite':
+        return '; '.join(row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql), params))
+    return '\n      '.join(row[0] for row in connection.execute(text('EXPLAIN ' + sql), params))
+
+
+def timed(connection, sql: str, params: dict, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(text(sql), params).all()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def run(url: str, rows: int, seed: int, indexed: bool) -> None:
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        if indexed:
+            # Indexes and, on PostgreSQL, monthly partitions of time_entries and material_usage
+            create_schema(connection)
+            tables = Base.metadata.tables
+        else:
+            metadata = unindexed_metadata()
+            metadata.create_all(connection)
+            tables = metadata.tables
+        started = time.perf_counter()
+        generate(connection, tables, rows, seed)
+        print(f"loaded {rows:,} rows per fact table in {time.perf_counter() - started:.1f}s")
+        connection.execute(text('ANALYZE'))
+
+    with engine.connect() as connection:
+        for label, (sql, params) in QUERIES.items():
+            print(f"  {label}: {timed(connection, sql, params) * 1000:.2f} ms")
+            print(f"      {explain(connection, sql, params)}")
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and timings before and after the schema indexes")
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--url', default='sqlite:///erp_schema_bench.db',
+                        help="database to (re)create; use PostgreSQL to include partition pruning")
+    args = parser.parse_args()
+    for indexed in (False, True):
+        print('after (indexed schema)' if indexed else 'before (foreign keys only)')
+        run(args.url, args.rows, args.seed, indexed)
+
+
+if __name__ == '__main__':
+    main()
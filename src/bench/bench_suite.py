@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src import fast_rest_api
+from src.bench.bench_api_load import run_load
+from src.bench.factory_data import SCALES, START, FactoryDataset, generate
+from src.bom_explosion import BomExplosionEngine
+from src.core_services import (
+    InventoryManagementService, ProductionPlanningService, ProjectManagementService, TimeAndExpenseService,
+    WorkflowManagementService
+)
+from src.cost_rollup import CostRollupEngine
+from src.database_models import (
+    AsyncSessionLocal, Project, TimeEntry, User, UserRole, WorkOrder, init_async_db
+)
+from src.material_registry import MaterialRegistry
+
+# A case prepares its inputs from the dataset, untimed, and returns the timed
+# workload. The workload returns how many operations it performed.
+Case = Callable[[FactoryDataset], Callable[[], int]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        return function
+    return register
+
+
+@case('schedule_backlog')
+def schedule_backlog(dataset: FactoryDataset) -> Callable[[], int]:
+    resources = [replace(resource, calendar=resource.calendar.copy()) for resource in dataset.resources]
+    work_orders = [replace(order, assigned_resources=[]) for order in dataset.work_orders]
+    return lambda: len(ProductionPlanningService().schedule_work_orders(work_orders, resources).scheduled) or 1
+
+
+@case('material_availability')
+def material_availability(dataset: FactoryDataset) -> Callable[[], int]:
+    explosion = BomExplosionEngine(MaterialRegistry(dataset.materials))
+    for bom in dataset.boms:
+        explosion.register_bom(bom)
+    inventory = InventoryManagementService(explosion)
+    boms = dataset.bom_index()
+    demands = [(boms[order.bom_id], order.quantity) for order in dataset.work_orders]
+
+    def run() -> int:
+        for bom, quantity in demands:
+            inventory.check_material_availability(bom, quantity)
+        return len(demands)
+    return run
+
+
+@case('resource_availability')
+def resource_availability(dataset: FactoryDataset) -> Callable[[], int]:
+    calendars = [resource.calendar for resource in dataset.resources]
+    probes = [(calendars[i % len(calendars)], order.start_date, order.end_date - order.start_date)
+              for i, order in enumerate(dataset.work_orders)]
+
+    def run() -> int:
+        for calendar, start, duration in probes:
+            calendar.is_available(start, start + duration)
+            calendar.find_next_window(start, duration)
+        return 2 * len(probes)
+    return run
+
+
+@case('critical_path')
+def critical_path(dataset: FactoryDataset) -> Callable[[], int]:
+    projects = [replace(dataset.projects[0], id=workflow.id,
+                        assigned_workflow=replace(workflow, steps=[replace(step) for step in workflow.steps]))
+                for workflow in dataset.workflows]
+
+    def run() -> int:
+        service = WorkflowManagementService()
+        updates = 0
+        for project in projects:
+            service.get_schedule(project)
+            for step in project.assigned_workflow.steps[::10]:
+                service.update_step_estimate(project, step.id, step.estimated_duration + 30)
+                updates += 1
+        return sum(len(project.assigned_workflow.steps) for project in projects) + updates
+    return run
+
+
+@case('time_entry_logging')
+def time_entry_logging(dataset: FactoryDataset) -> Callable[[], int]:
+    entries = dataset.time_entries
+
+    def run() -> int:
+        service = TimeAndExpenseService()
+        for entry in entries:
+            service.log_time_entry(entry)
+        return len(entries)
+    return run
+
+
+@case('time_reports')
+def time_reports(dataset: FactoryDataset) -> Callable[[], int]:
+    service = TimeAndExpenseService()
+    for entry in dataset.time_entries:
+        service.log_time_entry(entry)
+    months = [(START + timedelta(days=day), START + timedelta(days=day + 30))
+              for day in range(0, dataset.scale.calendar_days, 30)]
+
+    def run() -> int:
+        for project in dataset.projects:
+            for first, last in months:
+                service.generate_time_report(project.id, first, last)
+        return len(dataset.projects) * len(months)
+    return run
+
+
+@case('project_metrics')
+def project_metrics(dataset: FactoryDataset) -> Callable[[], int]:
+    registry = MaterialRegistry(dataset.materials)
+    resources = {resource.id: resource for resource in dataset.resources}
+    entries = dataset.time_entries
+    expenses = list(dataset.iter_expenses())
+
+    def run() -> int:
+        service = ProjectManagementService(registry, resources)
+        for entry in entries:
+            service.record_time_entry(entry)
+        for entry in expenses:
+            service.record_expense(entry)
+        for project in dataset.projects:
+            service.calculate_project_metrics(project)
+        return len(entries) + len(expenses) + len(dataset.projects)
+    return run
+
+
+@case('cost_rollup')
+def cost_rollup(dataset: FactoryDataset) -> Callable[[], int]:
+    registry = MaterialRegistry(dataset.materials)
+    engine = CostRollupEngine(registry, {resource.id: resource for resource in dataset.resources},
+                              ProjectManagementService.LABOR_RATE)
+    store = TimeAndExpenseService().time_entries
+    for entry in dataset.time_entries:
+        store.append(entry)
+    work_orders = [replace(order, actual_material_usage={f"M{i % len(registry)}": order.quantity
+                                                         for i in range(index, index + 3)})
+                   for index, order in enumerate(dataset.work_orders)]
+    return lambda: len(engine.rollup(work_orders, store).work_order_ids)
+
+
+API_REQUESTS = 100
+API_CONCURRENCY = 10
+API_ENTRIES = 200_000  # Cap on the time entries copied into the database
+
+
+def _api_case(path: Callable[[FactoryDataset], str]) -> Case:
+    """
+    GETs against the in-process app on an in-memory SQLite database seeded
+    from the dataset. The database is dropped once the workload has run.
+    """
+    def setup(dataset: FactoryDataset) -> Callable[[], int]:
+        loop = asyncio.new_event_loop()
+        engine, user = loop.run_until_complete(_seed_database(dataset))
+        target = path(dataset)
+
+        async def load() -> int:
+            fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: user
+            transport = httpx.ASGITransport(app=fast_rest_api.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+                    await run_load(client, target, API_REQUESTS, API_CONCURRENCY)
+            finally:
+                fast_rest_api.app.dependency_overrides.clear()
+                await engine.dispose()
+            return API_REQUESTS
+
+        def run() -> int:
+            try:
+                return loop.run_until_complete(load())
+            finally:
+                loop.close()
+        return run
+    return setup
+
+
+async def _seed_database(dataset: FactoryDataset) -> Tuple[AsyncEngine, User]:
+    engine = await init_async_db('sqlite://')
+    async with AsyncSessionLocal() as db:
+        user = User(username='bench', email='bench@example.com', password_hash='x', role=UserRole.MANAGER)
+        db.add(user)
+        await db.flush()
+        await db.execute(insert(Project), [
+            {'id': i + 1, 'name': project.name, 'start_date': project.start_date, 'end_date': project.end_date,
+             'budget': project.budget} for i, project in enumerate(dataset.projects)])
+        await db.execute(insert(WorkOrder), [
+            {'id': i + 1, 'project_id': i % len(dataset.projects) + 1, 'status': 'planned',
+             'quantity': order.quantity, 'start_date': order.start_date, 'end_date': order.end_date}
+            for i, order in enumerate(dataset.work_orders)])
+        project_ids = {project.id: i + 1 for i, project in enumerate(dataset.projects)}
+        entries = dataset.iter_time_entries()
+        for _ in range(0, min(dataset.scale.time_entries, API_ENTRIES), 10_000):
+            await db.execute(insert(TimeEntry), [
+                {'project_id': project_ids[entry.project_id], 'user_id': user.id, 'start_time': entry.start_time,
+                 'end_time': entry.end_time, 'activity_description': entry.activity_description}
+                for entry, _ in zip(entries, range(10_000))])
+        await db.commit()
+    return engine, user
+
+
+CASES['api_project_detail'] = _api_case(lambda dataset: '/projects/1')
+CASES['api_work_order_page'] = _api_case(lambda dataset: '/work-orders/?limit=100&status=planned')
+
+
+def measure(name: str, dataset: FactoryDataset, repeat: int) -> dict:
+    """
+    Time `repeat` runs, each on freshly prepared inputs, then one more run
+    under tracemalloc for the peak memory the workload allocates.
+    """
+    seconds: List[float] = []
+    operations = 0
+    for _ in range(repeat):
+        workload = CASES[name](dataset)
+        gc.collect()
+        started = time.perf_counter()
+        operations = workload()
+        seconds.append(time.perf_counter() - started)
+        del workload
+    workload = CASES[name](dataset)
+    gc.collect()
+    tracemalloc.start()
+    workload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(seconds)
+    return {
+        'seconds': seconds,
+        'best': best,
+        'median': statistics.median(seconds),
+        'operations': operations,
+        'ops_per_second': operations / best if best else None,
+        'peak_bytes': peak,
+    }
+
+
+def environment(scale: str, seed: int) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': scale,
+        'sizes': asdict(SCALES[scale]),
+        'seed': seed,
+    }
+
+
+def run_suite(scale: str, seed: int, cases: Optional[List[str]] = None, repeat: int = 3) -> dict:
+    dataset = generate(SCALES[scale], seed)
+    results = {}
+    for name in cases or list(CASES):
+        results[name] = measure(name, dataset, repeat)
+        print(f"{name:<24} best {results[name]['best']:8.3f}s  peak {results[name]['peak_bytes'] / 2 ** 20:8.1f} MiB",
+              file=sys.stderr)
+    return {'environment': environment(scale, seed), 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    Cases whose best time or peak memory grew by more than `threshold`.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        time_ratio = result['best'] / before['best'] if before['best'] else 1.0
+        memory_ratio = result['peak_bytes'] / before['peak_bytes'] if before['peak_bytes'] else 1.0
+        flagged = time_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        print(f"{name:<24} time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}{'  REGRESSION' if flagged else ''}",
+              file=sys.stderr)
+        if flagged:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded benchmark suite over a synthetic factory")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--cases', nargs='*', choices=sorted(CASES), help="default: all")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results as JSON here instead of stdout")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    report = run_suite(args.scale, args.seed, args.cases, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(json.load(baseline), report, args.threshold)
+        if regressions:
+            sys.exit(f"regressed: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
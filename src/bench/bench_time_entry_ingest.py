@@ -0,0 +1,41 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from src.bench.api_fixtures import bench_client
+
+
+def punches(count: int) -> list:
+    shift_start = datetime(2025, 3, 3, 6)
+    return [{'project_id': 1, 'resource_id': i % 300,
+             'start_time': (shift_start + timedelta(seconds=i)).isoformat(),
+             'end_time': (shift_start + timedelta(hours=8, seconds=i)).isoformat(),
+             'activity_description': 'shift'} for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-row and bulk time entry ingestion")
+    parser.add_argument('--rows', type=int, default=5_000)
+    parser.add_argument('--batch', type=int, default=1_000)
+    parser.add_argument('--url', default='sqlite://')
+    args = parser.parse_args()
+    rows = punches(args.rows)
+
+    with bench_client(args.url) as client:
+        started = time.perf_counter()
+        for row in rows:
+            client.post('/time-entries/', json=row)
+        single = time.perf_counter() - started
+
+    with bench_client(args.url) as client:
+        started = time.perf_counter()
+        for offset in range(0, len(rows), args.batch):
+            client.post('/time-entries/bulk', json=rows[offset:offset + args.batch])
+        bulk = time.perf_counter() - started
+
+    print(f"single-row route: {args.rows / single:10.0f} rows/s ({single:.2f}s)")
+    print(f"bulk route:       {args.rows / bulk:10.0f} rows/s ({bulk:.2f}s, batches of {args.batch})")
+
+
+if __name__ == '__main__':
+    main()
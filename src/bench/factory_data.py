@@ -0,0 +1,187 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+from src.core_domain_models import (
+    BillOfMaterials, ExpenseEntry, Material, Project, Resource, ResourceType, TimeEntry, WorkOrder, WorkOrderStatus,
+    Workflow, WorkflowStep
+)
+from src.resource_calendar import ResourceCalendar
+
+START = datetime(2025, 1, 6)  # A Monday
+
+
+@dataclass(slots=True, frozen=True)
+class FactoryScale:
+    materials: int
+    boms: int
+    components: int  # Leaf materials per BOM
+    resources: int
+    calendar_days: int  # Horizon covered by resource calendars and work orders
+    workflows: int
+    workflow_steps: int  # Steps per workflow
+    workflow_width: int  # Steps per layer of the DAG, so depth is steps / width
+    projects: int
+    work_orders: int
+    time_entries: int
+    expenses: int
+
+
+SCALES = {
+    'small': FactoryScale(materials=500, boms=100, components=6, resources=20, calendar_days=28, workflows=4,
+                          workflow_steps=100, workflow_width=3, projects=10, work_orders=1_000, time_entries=20_000,
+                          expenses=2_000),
+    'medium': FactoryScale(materials=20_000, boms=2_000, components=10, resources=100, calendar_days=91, workflows=20,
+                           workflow_steps=1_000, workflow_width=5, projects=100, work_orders=20_000,
+                           time_entries=250_000, expenses=25_000),
+    'large': FactoryScale(materials=200_000, boms=20_000, components=12, resources=500, calendar_days=365,
+                          workflows=50, workflow_steps=5_000, workflow_width=8, projects=1_000, work_orders=200_000,
+                          time_entries=2_000_000, expenses=200_000),
+}
+
+
+@dataclass(slots=True)
+class FactoryDataset:
+    """
+    A synthetic factory. Everything is derived from `seed`, so two datasets of
+    the same scale and seed are identical.
+    """
+    scale: FactoryScale
+    seed: int
+    materials: List[Material]
+    boms: List[BillOfMaterials]
+    resources: List[Resource]
+    workflows: List[Workflow]
+    projects: List[Project]
+    work_orders: List[WorkOrder]
+    _time_entries: Optional[List[TimeEntry]] = field(default=None, repr=False)
+
+    @property
+    def horizon_end(self) -> datetime:
+        return START + timedelta(days=self.scale.calendar_days)
+
+    def bom_index(self) -> Dict[str, BillOfMaterials]:
+        return {bom.id: bom for bom in self.boms}
+
+    @property
+    def time_entries(self) -> List[TimeEntry]:
+        """
+        Built on first use; at the large scale these dominate the dataset's memory.
+        """
+        if self._time_entries is None:
+            self._time_entries = list(self.iter_time_entries())
+        return self._time_entries
+
+    def iter_time_entries(self) -> Iterator[TimeEntry]:
+        rng = random.Random(self.seed * 31 + 1)
+        staff = [resource.id for resource in self.resources if resource.type is ResourceType.HUMAN]
+        horizon = self.scale.calendar_days * 86_400
+        for i in range(self.scale.time_entries):
+            project = self.projects[rng.randrange(len(self.projects))]
+            work_order = project.work_orders[rng.randrange(len(project.work_orders))] if project.work_orders else None
+            began = START + timedelta(seconds=rng.randrange(horizon))
+            yield TimeEntry(id=f"T{i}", resource_id=staff[rng.randrange(len(staff))], project_id=project.id,
+                            work_order_id=work_order.id if work_order else None, start_time=began,
+                            end_time=began + timedelta(minutes=rng.randint(15, 480)),
+                            activity_description=rng.choice(('setup', 'machining', 'assembly', 'inspection')))
+
+    def iter_expenses(self) -> Iterator[ExpenseEntry]:
+        rng = random.Random(self.seed * 31 + 2)
+        for i in range(self.scale.expenses):
+            yield ExpenseEntry(id=f"E{i}", project_id=self.projects[rng.randrange(len(self.projects))].id,
+                               amount=Decimal(rng.randint(500, 500_000)) / 100, description='',
+                               date=START + timedelta(days=rng.randrange(self.scale.calendar_days)),
+                               category=rng.choice(('travel', 'tooling', 'freight', 'subcontract')))
+
+
+def generate(scale: FactoryScale, seed: int = 7) -> FactoryDataset:
+    """
+    Build materials, multi-level BOMs, resources with shift calendars, layered
+    workflow DAGs, projects and their work orders. Time entries and expenses
+    are generated on demand.
+    """
+    rng = random.Random(seed)
+    materials = [Material(id=f"M{i}", name=f"Material {i}", description='',
+                          unit_cost=Decimal(rng.randint(1, 99_999)) / 100, stock_quantity=rng.randint(0, 50_000),
+                          reorder_point=rng.randint(0, 500), lead_time_days=rng.randint(0, 60))
+                 for i in range(scale.materials)]
+    boms = _boms(rng, scale)
+    resources = _resources(rng, scale)
+    workflows = [_workflow(rng, scale, w) for w in range(scale.workflows)]
+    projects, work_orders = _projects(rng, scale, workflows)
+    return FactoryDataset(scale=scale, seed=seed, materials=materials, boms=boms, resources=resources,
+                          workflows=workflows, projects=projects, work_orders=work_orders)
+
+
+def _boms(rng: random.Random, scale: FactoryScale) -> List[BillOfMaterials]:
+    # Three levels: the first 60% are parts built from materials only, the next
+    # 25% are sub-assemblies of parts and the rest are products of both
+    parts, assemblies = int(scale.boms * 0.6), int(scale.boms * 0.85)
+    boms = []
+    for i in range(scale.boms):
+        children = {}
+        if i >= parts:
+            lower = parts if i >= assemblies else 0
+            upper = assemblies if i >= assemblies else parts
+            children = {f"B{child}": rng.randint(1, 4)
+                        for child in rng.sample(range(lower, upper), min(3, upper - lower))}
+        boms.append(BillOfMaterials(
+            id=f"B{i}", product_id=f"P{i}", version='1',
+            components={f"M{m}": rng.randint(1, 10) for m in rng.sample(range(scale.materials), scale.components)},
+            labor_hours=Decimal(rng.randint(5, 80)) / 10, notes='', sub_assemblies=children))
+    return boms
+
+
+def _resources(rng: random.Random, scale: FactoryScale) -> List[Resource]:
+    resources = []
+    for i in range(scale.resources):
+        human = i % 3 == 0
+        shifts = 1 if human else rng.choice((1, 2, 3))
+        windows = []
+        for day in range(scale.calendar_days):
+            midnight = START + timedelta(days=day)
+            if human and midnight.weekday() >= 5:
+                continue
+            windows.append((midnight + timedelta(hours=6), midnight + timedelta(hours=6 + 8 * shifts)))
+        resources.append(Resource(
+            id=f"R{i}", name=f"{'Operator' if human else 'Machine'} {i}",
+            type=ResourceType.HUMAN if human else ResourceType.MACHINE,
+            capacity_per_hour=Decimal(rng.randint(5, 40)), cost_per_hour=Decimal(rng.randint(2_500, 15_000)) / 100,
+            availability_schedule={}, calendar=ResourceCalendar(windows)))
+    return resources
+
+
+def _workflow(rng: random.Random, scale: FactoryScale, number: int) -> Workflow:
+    steps: List[WorkflowStep] = []
+    width = scale.workflow_width
+    for i in range(scale.workflow_steps):
+        layer_start = i - i % width
+        previous = range(max(0, layer_start - width), layer_start)
+        predecessors = [steps[p].id for p in rng.sample(previous, min(len(previous), rng.randint(1, 3)))]
+        if layer_start >= 2 * width and rng.random() < 0.1:
+            predecessors.append(steps[rng.randrange(layer_start - width)].id)  # Occasional long edge
+        steps.append(WorkflowStep(id=f"W{number}S{i}", name=f"Step {i}", description='',
+                                  estimated_duration=rng.randint(30, 480), required_resources=[],
+                                  predecessor_steps=predecessors))
+    return Workflow(id=f"W{number}", name=f"Workflow {number}", steps=steps, total_estimated_duration=0)
+
+
+def _projects(rng: random.Random, scale: FactoryScale, workflows: List[Workflow]):
+    end = START + timedelta(days=scale.calendar_days)
+    projects = [Project(id=f"PR{i}", name=f"Project {i}", description='', start_date=START, end_date=end,
+                        work_orders=[], assigned_workflow=workflows[i % len(workflows)],
+                        budget=Decimal(rng.randint(10_000, 1_000_000)), actual_cost=Decimal('0'))
+                for i in range(scale.projects)]
+    work_orders = []
+    for i in range(scale.work_orders):
+        start = START + timedelta(days=rng.randrange(scale.calendar_days), hours=rng.choice((6, 10, 14)))
+        work_order = WorkOrder(
+            id=f"WO{i}", bom_id=f"B{rng.randrange(scale.boms)}", status=WorkOrderStatus.PLANNED,
+            quantity=rng.randint(1, 40), start_date=start, end_date=start + timedelta(hours=rng.randint(1, 6)),
+            assigned_resources=[], actual_labor_hours=Decimal('0'), actual_material_usage={},
+            priority=rng.randint(0, 3), due_date=start + timedelta(days=rng.randint(1, 21)))
+        work_orders.append(work_order)
+        projects[i % scale.projects].work_orders.append(work_order)
+    return projects, work_orders
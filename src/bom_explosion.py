@@ -0,0 +1,159 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.core_domain_models import BillOfMaterials, Material
+from src.material_registry import MaterialRegistry
+
+# Sparse exploded vector: (material indices, quantity per unit of the parent)
+ExplodedVector = Tuple[np.ndarray, np.ndarray]
+
+
+class BomExplosionEngine:
+    """
+    Flattens multi-level BOMs into leaf material requirements.
+
+    Exploded vectors are memoized per (bom_id, version). Replacing or invalidating
+    a BOM also evicts every parent assembly that includes it. Component ids are
+    resolved, and vectors indexed, through the material registry.
+    """
+
+    def __init__(self, registry: Optional[MaterialRegistry] = None):
+        self.registry = registry if registry is not None else MaterialRegistry()
+        self._boms: Dict[str, BillOfMaterials] = {}
+        self._cache: Dict[Tuple[str, str], ExplodedVector] = {}
+        self._parents: Dict[str, Set[str]] = defaultdict(set)
+
+    @property
+    def materials(self) -> List[Material]:
+        return self.registry.materials
+
+    @property
+    def material_count(self) -> int:
+        return len(self.registry)
+
+    def material_index(self, material: Material) -> int:
+        """
+        Return the dense vector index of a material, registering it if needed.
+        """
+        return self.registry.register(material)
+
+    def bom(self, bom_id: str) -> BillOfMaterials:
+        """
+        Return a registered BOM by id.
+        """
+        bom = self._boms.get(bom_id)
+        if bom is None:
+            raise ValueError(f"Unknown BOM {bom_id}")
+        return bom
+
+    def register_bom(self, bom: BillOfMaterials) -> None:
+        """
+        Add or replace a BOM, evicting cached explosions that depend on it.
+        Registering the instance already held is a no-op.
+        """
+        previous = self._boms.get(bom.id)
+        if previous is bom:
+            return
+        if previous is not None:
+            for child_id in previous.sub_assemblies:
+                self._parents[child_id].discard(bom.id)
+            self.invalidate(bom.id)
+        self._boms[bom.id] = bom
+        for child_id in bom.sub_assemblies:
+            self._parents[child_id].add(bom.id)
+
+    def invalidate(self, bom_id: str) -> None:
+        """
+        Evict the cached explosion of a BOM and of all assemblies above it.
+        """
+        pending = [bom_id]
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            bom = self._boms.get(current)
+            if bom is not None:
+                self._cache.pop((bom.id, bom.version), None)
+            pending.extend(self._parents.get(current, ()))
+
+    def explode(self, bom: BillOfMaterials, quantity: int = 1) -> Dict[str, int]:
+        """
+        Total leaf material requirements for `quantity` units, keyed by material id.
+        """
+        return {material.id: qty for material, qty in self.leaf_requirements(bom, quantity)}
+
+    def leaf_requirements(self, bom: BillOfMaterials, quantity: int = 1) -> List[Tuple[Material, int]]:
+        """
+        Total leaf material requirements for `quantity` units as (material, quantity) pairs.
+        """
+        indices, quantities = self._exploded(bom)
+        return [(self.materials[index], qty * quantity)
+                for index, qty in zip(indices.tolist(), quantities.tolist())]
+
+    def sparse_vector(self, bom: BillOfMaterials) -> ExplodedVector:
+        """
+        Cached (material indices, quantity per unit) explosion of a BOM.
+        """
+        return self._exploded(bom)
+
+    def explode_vector(self, bom: BillOfMaterials, quantity: int = 1) -> np.ndarray:
+        """
+        Dense requirement vector for a single demand, indexed like `materials`.
+        """
+        return self.explode_many([(bom, quantity)])
+
+    def explode_many(self, demands: Iterable[Tuple[BillOfMaterials, int]]) -> np.ndarray:
+        """
+        Sum the exploded requirements of many (bom, quantity) demands into one
+        dense vector indexed like `materials`.
+        """
+        index_parts, qty_parts = [], []
+        for bom, quantity in demands:
+            indices, quantities = self._exploded(bom)
+            index_parts.append(indices)
+            qty_parts.append(quantities * quantity)
+        if not index_parts:
+            return np.zeros(self.material_count, dtype=np.int64)
+        return np.bincount(np.concatenate(index_parts), weights=np.concatenate(qty_parts),
+                           minlength=self.material_count).astype(np.int64)
+
+    def stock_vector(self) -> np.ndarray:
+        """
+        On-hand stock of every known material, indexed like `materials`.
+        """
+        return self.registry.stock_vector()
+
+    def _exploded(self, bom: BillOfMaterials) -> ExplodedVector:
+        registered = self._boms.get(bom.id)
+        if registered is None or registered.version != bom.version:
+            self.register_bom(bom)
+        elif registered is not bom:
+            self._boms[bom.id] = bom
+        return self._explode_cached(bom.id, ())
+
+    def _explode_cached(self, bom_id: str, path: Tuple[str, ...]) -> ExplodedVector:
+        if bom_id in path:
+            raise ValueError(f"Cycle in bill of materials: {' -> '.join(path + (bom_id,))}")
+        bom = self._boms.get(bom_id)
+        if bom is None:
+            raise ValueError(f"Unknown sub-assembly BOM {bom_id}")
+        cached = self._cache.get((bom.id, bom.version))
+        if cached is not None:
+            return cached
+
+        totals: Dict[int, int] = defaultdict(int)
+        for material_id, qty in bom.components.items():
+            totals[self.registry.index(material_id)] += qty
+        for child_id, child_qty in bom.sub_assemblies.items():
+            child_indices, child_quantities = self._explode_cached(child_id, path + (bom_id,))
+            for index, qty in zip(child_indices.tolist(), child_quantities.tolist()):
+                totals[index] += qty * child_qty
+
+        exploded = (np.fromiter(totals.keys(), dtype=np.int64, count=len(totals)),
+                    np.fromiter(totals.values(), dtype=np.int64, count=len(totals)))
+        self._cache[(bom.id, bom.version)] = exploded
+        return exploded
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.core_domain_models import Resource, WorkOrder
+from src.core_services import ProductionPlanningService
+from src.cost_rollup import from_cents, labor_cents, to_rate_millicents
+from src.resource_calendar import to_seconds
+
+# (resource id, start, end)
+Window = Tuple[str, datetime, datetime]
+
+
+def daily_windows(resource_ids: Iterable[str], first_day: datetime, days: int, start: timedelta,
+                  length: timedelta) -> Tuple[Window, ...]:
+    """
+    One window a day per resource, e.g. a second shift from 14:00 for 8 hours.
+    """
+    midnight = first_day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return tuple((resource_id, midnight + timedelta(days=day) + start, midnight + timedelta(days=day) + start + length)
+                 for resource_id in resource_ids for day in range(days))
+
+
+@dataclass(slots=True, frozen=True)
+class Scenario:
+    """
+    Changes to the baseline plan to try out. Nothing here touches live data.
+    """
+    name: str
+    downtime: Tuple[Window, ...] = ()  # Time taken out of a resource's calendar
+    extra_time: Tuple[Window, ...] = ()  # Time added, e.g. overtime or a second shift
+    added_resources: Tuple[Resource, ...] = ()
+    removed_resource_ids: Tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class ScenarioResult:
+    name: str
+    utilisation: Dict[str, float]  # Booked share of each resource's free time in the horizon
+    late_orders: List[str] = field(default_factory=list)
+    unscheduled_orders: List[str] = field(default_factory=list)
+    cost: Decimal = Decimal('0')  # Processing time booked times each resource's cost_per_hour
+    finish: Optional[datetime] = None  # End of the last scheduled order
+
+
+@dataclass(slots=True, frozen=True)
+class PlanSnapshot:
+    """
+    Frozen copy of the resources and backlog that scenarios start from.
+    """
+    resources: Tuple[Resource, ...]
+    work_orders: Tuple[WorkOrder, ...]
+    horizon_start: datetime
+    horizon_end: datetime
+
+    @classmethod
+    def capture(cls, resources: Iterable[Resource], work_orders: Iterable[WorkOrder], horizon_start: datetime,
+                horizon_end: datetime) -> 'PlanSnapshot':
+        return cls(resources=tuple(replace(resource, calendar=resource.calendar.copy()) for resource in resources),
+                   work_orders=tuple(replace(order, assigned_resources=[]) for order in work_orders),
+                   horizon_start=horizon_start, horizon_end=horizon_end)
+
+
+def simulate(snapshot: PlanSnapshot, scenario: Scenario) -> ScenarioResult:
+    """
+    Batch-schedule the snapshot's backlog under one scenario.
+
+    Calendars are copy-on-write clones of the snapshot's, so only those the
+    scenario or the scheduler actually changes are ever copied.
+    """
+    removed = set(scenario.removed_resource_ids)
+    resources = [replace(resource, calendar=resource.calendar.copy())
+                 for resource in snapshot.resources + scenario.added_resources if resource.id not in removed]
+    calendars = {resource.id: resource.calendar for resource in resources}
+    for resource_id, start, end in scenario.extra_time:
+        if resource_id in calendars:
+            calendars[resource_id].add_availability(start, end)
+    for resource_id, start, end in scenario.downtime:
+        if resource_id in calendars:
+            calendars[resource_id].book(start, end)
+
+    horizon = (snapshot.horizon_start, snapshot.horizon_end)
+    free_before = [resource.calendar.free_seconds(*horizon) for resource in resources]
+    work_orders = [replace(order, assigned_resources=[]) for order in snapshot.work_orders]
+    schedule = ProductionPlanningService().schedule_work_orders(work_orders, resources)
+
+    booked = np.zeros(len(resources), dtype=np.int64)
+    positions = {resource.id: position for position, resource in enumerate(resources)}
+    for order in schedule.scheduled:
+        booked[positions[order.assigned_resources[0].id]] += to_seconds(order.end_date) - to_seconds(order.start_date)
+    rates = np.fromiter((to_rate_millicents(resource.cost_per_hour) for resource in resources), dtype=np.int64,
+                        count=len(resources))
+    cost = from_cents(labor_cents(booked, rates).sum())
+    utilisation = {resource.id: (free - resource.calendar.free_seconds(*horizon)) / free if free else 0.0
+                   for resource, free in zip(resources, free_before)}
+    return ScenarioResult(
+        name=scenario.name,
+        utilisation=utilisation,
+        late_orders=[order.id for order in schedule.late],
+        unscheduled_orders=[order.id for order in schedule.unscheduled],
+        cost=cost,
+        finish=max((order.end_date for order in schedule.scheduled), default=None),
+    )
+
+
+_snapshot: Optional[PlanSnapshot] = None  # Set in each worker process
+
+
+def _init_worker(snapshot: PlanSnapshot) -> None:
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _simulate_in_worker(scenario: Scenario) -> ScenarioResult:
+    return simulate(_snapshot, scenario)
+
+
+def _start_method() -> str:
+    """
+    fork only while this process has a single thread: a child forked from a
+    threaded process, such as the API server, inherits locks that other threads
+    held at the fork and can deadlock on them.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+class CapacitySimulator:
+    """
+    What-if capacity planning over a snapshot of resources and backlog.
+
+    Each scenario runs the batch scheduler on its own copies, so live resources,
+    calendars and work orders are never touched. Scenarios are spread across
+    `workers` processes. A single-threaded caller forks them, so they inherit
+    the snapshot copy-on-write; otherwise they are started by forkserver or
+    spawn and receive a pickled copy each. With `workers=0` scenarios run
+    inline, one after another.
+    """
+
+    def __init__(self, snapshot: PlanSnapshot, workers: Optional[int] = None):
+        self.snapshot = snapshot
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+
+    def run(self, scenarios: List[Scenario]) -> List[ScenarioResult]:
+        """
+        Results in the order of `scenarios`.
+        """
+        if self.workers == 0 or len(scenarios) < 2:
+            return [simulate(self.snapshot, scenario) for scenario in scenarios]
+        context = multiprocessing.get_context(_start_method())
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(scenarios)), mp_context=context,
+                                 initializer=_init_worker, initargs=(self.snapshot,)) as pool:
+            return list(pool.map(_simulate_in_worker, scenarios))
@@ -0,0 +1,286 @@
+from array import array
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core_domain_models import BillOfMaterials, Material, Resource, WorkOrder, WorkOrderStatus
+from src.resource_calendar import from_seconds, to_seconds
+from src.time_expense_store import _Codes
+
+COST_SCALE = 100  # Unit costs are stored in integer cents
+HOURS_SCALE = 3600  # Labor hours are stored in whole seconds
+NO_DUE_DATE = -(1 << 62)
+_STATUSES = list(WorkOrderStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+
+def _scaled(value: Decimal, scale: int, what: str) -> int:
+    scaled = value * scale
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{what} {value} is finer than 1/{scale}")
+    return int(scaled)
+
+
+class _Text:
+    """
+    Strings that are read back but never looked up (names, order ids), packed as
+    UTF-8 into one buffer.
+    A replaced value is appended and the old bytes left behind; replacements are rare.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.starts[row]:self.ends[row]].decode()
+
+    def append(self, value: str) -> None:
+        self.starts.append(len(self.data))
+        self.data += value.encode()
+        self.ends.append(len(self.data))
+
+    def replace(self, row: int, value: str) -> None:
+        self.starts[row] = len(self.data)
+        self.data += value.encode()
+        self.ends[row] = len(self.data)
+
+
+class _Slices:
+    """
+    Variable-length (code, quantity) lists of many rows in two flat columns,
+    each row owning the slice between consecutive offsets.
+    """
+
+    def __init__(self):
+        self.offsets = array('q', [0])
+        self.codes = array('l')
+        self.quantities = array('l')
+
+    def append(self, items: Dict[int, int]) -> None:
+        self.codes.extend(items.keys())
+        self.quantities.extend(items.values())
+        self.offsets.append(len(self.codes))
+
+    def items(self, row: int) -> Tuple[array, array]:
+        lo, hi = self.offsets[row], self.offsets[row + 1]
+        return self.codes[lo:hi], self.quantities[lo:hi]
+
+
+class MaterialStore:
+    """
+    Columnar material master data, unit costs in integer cents.
+
+    Rows are dense material indices like MaterialRegistry's, and the BOM and
+    work order stores refer to materials by row instead of holding id strings.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._names = _Text()
+        self._descriptions = _Codes()
+        self._description_col = array('l')
+        self._cost_col = array('q')
+        self._stock_col = array('q')
+        self._reorder_col = array('q')
+        self._lead_time_col = array('l')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, material_id: str) -> bool:
+        return material_id in self._rows
+
+    def register(self, material: Material) -> int:
+        """
+        Add or replace a material, returning its row.
+        """
+        cost = _scaled(material.unit_cost, COST_SCALE, f"Material {material.id} unit cost")
+        description = self._descriptions.code(material.description)
+        row = self._rows.get(material.id)
+        if row is None:
+            row = self._rows[material.id] = len(self.ids)
+            self.ids.append(material.id)
+            self._names.append(material.name)
+            self._description_col.append(description)
+            self._cost_col.append(cost)
+            self._stock_col.append(material.stock_quantity)
+            self._reorder_col.append(material.reorder_point)
+            self._lead_time_col.append(material.lead_time_days)
+        else:
+            self._names.replace(row, material.name)
+            self._description_col[row] = description
+            self._cost_col[row] = cost
+            self._stock_col[row] = material.stock_quantity
+            self._reorder_col[row] = material.reorder_point
+            self._lead_time_col[row] = material.lead_time_days
+        return row
+
+    def index(self, material_id: str) -> int:
+        row = self._rows.get(material_id)
+        if row is None:
+            raise ValueError(f"Unknown material {material_id}")
+        return row
+
+    def get(self, material_id: str) -> Optional[Material]:
+        row = self._rows.get(material_id)
+        return None if row is None else self.material(row)
+
+    def stock_vector(self) -> np.ndarray:
+        """
+        On-hand stock of every material, indexed by row.
+        """
+        return np.array(self._stock_col, dtype=np.int64)
+
+    def material(self, row: int) -> Material:
+        return Material(
+            id=self.ids[row],
+            name=self._names[row],
+            description=self._descriptions.values[self._description_col[row]],
+            unit_cost=Decimal(self._cost_col[row]) / COST_SCALE,
+            stock_quantity=self._stock_col[row],
+            reorder_point=self._reorder_col[row],
+            lead_time_days=self._lead_time_col[row],
+        )
+
+
+class BomStore:
+    """
+    Append-only columnar bills of materials. Components of every BOM share two
+    flat columns of material rows and quantities.
+    """
+
+    def __init__(self, materials: MaterialStore):
+        self.materials = materials
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._products = _Text()
+        self._versions = _Codes()
+        self._notes = _Codes()
+        self._children = _Codes()
+        self._version_col = array('l')
+        self._notes_col = array('l')
+        self._labor_col = array('q')
+        self._components = _Slices()
+        self._sub_assemblies = _Slices()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, bom_id: str) -> bool:
+        return bom_id in self._rows
+
+    def append(self, bom: BillOfMaterials) -> None:
+        if bom.id in self._rows:
+            raise ValueError(f"BOM {bom.id} is already stored")
+        components = {self.materials.index(material_id): qty for material_id, qty in bom.components.items()}
+        labor = _scaled(bom.labor_hours, HOURS_SCALE, f"BOM {bom.id} labor hours")
+        self._rows[bom.id] = len(self._ids)
+        self._ids.append(bom.id)
+        self._products.append(bom.product_id)
+        self._version_col.append(self._versions.code(bom.version))
+        self._notes_col.append(self._notes.code(bom.notes))
+        self._labor_col.append(labor)
+        self._components.append(components)
+        self._sub_assemblies.append({self._children.code(child_id): qty
+                                     for child_id, qty in bom.sub_assemblies.items()})
+
+    def components(self, bom_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (material rows, quantity per unit) of a BOM's direct components.
+        """
+        rows, quantities = self._components.items(self._row(bom_id))
+        return np.array(rows, dtype=np.int64), np.array(quantities, dtype=np.int64)
+
+    def bom(self, bom_id: str) -> BillOfMaterials:
+        row = self._row(bom_id)
+        rows, quantities = self._components.items(row)
+        children, child_quantities = self._sub_assemblies.items(row)
+        return BillOfMaterials(
+            id=self._ids[row],
+            product_id=self._products[row],
+            version=self._versions.values[self._version_col[row]],
+            components={self.materials.ids[material]: qty for material, qty in zip(rows, quantities)},
+            labor_hours=Decimal(self._labor_col[row]) / HOURS_SCALE,
+            notes=self._notes.values[self._notes_col[row]],
+            sub_assemblies={self._children.values[child]: qty for child, qty in zip(children, child_quantities)},
+        )
+
+    def _row(self, bom_id: str) -> int:
+        row = self._rows.get(bom_id)
+        if row is None:
+            raise ValueError(f"Unknown BOM {bom_id}")
+        return row
+
+
+class WorkOrderStore:
+    """
+    Append-only columnar work orders, for holding the open order book in memory.
+    Dates are epoch seconds, labor hours whole seconds and material usage flat
+    columns sliced per order. The few orders with assigned resources keep their
+    resource ids aside.
+    """
+
+    def __init__(self, materials: MaterialStore, resources: Optional[Dict[str, Resource]] = None):
+        self.materials = materials
+        self.resources = resources if resources is not None else {}
+        self._ids = _Text()
+        self._boms = _Codes()
+        self._bom_col = array('l')
+        self._status_col = array('b')
+        self._quantity_col = array('l')
+        self._start_col = array('q')
+        self._end_col = array('q')
+        self._labor_col = array('q')
+        self._priority_col = array('l')
+        self._due_col = array('q')
+        self._usage = _Slices()
+        self._assigned: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._bom_col)
+
+    def append(self, work_order: WorkOrder) -> None:
+        row = len(self._bom_col)
+        usage = {self.materials.index(material_id): qty
+                 for material_id, qty in work_order.actual_material_usage.items()}
+        labor = _scaled(work_order.actual_labor_hours, HOURS_SCALE, f"Work order {work_order.id} labor hours")
+        self._ids.append(work_order.id)
+        self._bom_col.append(self._boms.code(work_order.bom_id))
+        self._status_col.append(_STATUS_CODES[work_order.status])
+        self._quantity_col.append(work_order.quantity)
+        self._start_col.append(to_seconds(work_order.start_date))
+        self._end_col.append(to_seconds(work_order.end_date))
+        self._labor_col.append(labor)
+        self._priority_col.append(work_order.priority)
+        self._due_col.append(NO_DUE_DATE if work_order.due_date is None else to_seconds(work_order.due_date))
+        self._usage.append(usage)
+        if work_order.assigned_resources:
+            self._assigned[row] = [resource.id for resource in work_order.assigned_resources]
+
+    def planning_columns(self) -> Tuple[array, List[Optional[str]], array, array, array]:
+        """
+        Raw columns for vectorized planning: (BOM codes, BOM id per code,
+        status codes indexing WorkOrderStatus, quantities, start seconds).
+        """
+        return self._bom_col, self._boms.values, self._status_col, self._quantity_col, self._start_col
+
+    def work_order(self, row: int) -> WorkOrder:
+        materials, quantities = self._usage.items(row)
+        due = self._due_col[row]
+        return WorkOrder(
+            id=self._ids[row],
+            bom_id=self._boms.values[self._bom_col[row]],
+            status=_STATUSES[self._status_col[row]],
+            quantity=self._quantity_col[row],
+            start_date=from_seconds(self._start_col[row]),
+            end_date=from_seconds(self._end_col[row]),
+            assigned_resources=[self.resources[resource_id] for resource_id in self._assigned.get(row, [])],
+            actual_labor_hours=Decimal(self._labor_col[row]) / HOURS_SCALE,
+            actual_material_usage={self.materials.ids[material]: qty for material, qty in zip(materials, quantities)},
+            priority=self._priority_col[row],
+            due_date=None if due == NO_DUE_DATE else from_seconds(due),
+        )
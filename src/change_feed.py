@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, FrozenSet, Iterable, List, Optional, Set
+
+WORK_ORDER = 'work_order'
+RESERVATION = 'reservation'
+WORKFLOW_STEP = 'workflow_step'
+
+
+@dataclass(slots=True, frozen=True)
+class ChangeEvent:
+    id: int  # Position in the feed; clients resume after the last id they saw
+    topic: str
+    type: str
+    data: dict
+    at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_sse(self) -> str:
+        payload = json.dumps({'topic': self.topic, 'type': self.type, 'at': self.at.isoformat(), **self.data},
+                             default=str)
+        return f"id: {self.id}\nevent: {self.topic}.{self.type}\ndata: {payload}\n\n"
+
+
+class ResyncRequired(Exception):
+    """
+    Events after the client's cursor are no longer in the replay buffer; it has
+    to reload current state before following the feed again.
+    """
+
+
+class Subscription:
+    """
+    One client's view of the feed: a bounded queue filled by the hub and drained
+    by iterating the subscription. A client that falls `max_queue` events behind
+    is caught up from the replay buffer, or told to resync once events it
+    missed have left the buffer.
+    """
+
+    def __init__(self, hub: 'ChangeFeedHub', topics: Optional[FrozenSet[str]], max_queue: int,
+                 loop: asyncio.AbstractEventLoop):
+        self.hub = hub
+        self.topics = topics
+        self.max_queue = max_queue
+        self.last_id = 0
+        self.lagged = False
+        self.closed = False
+        self._queue: Deque[ChangeEvent] = deque()
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def wants(self, event: ChangeEvent) -> bool:
+        return self.topics is None or event.topic in self.topics
+
+    def close(self) -> None:
+        self.closed = True
+        self.hub._unsubscribe(self)
+        self._wake(_running_loop())
+
+    def __aiter__(self) -> AsyncIterator[ChangeEvent]:
+        return self._events()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[ChangeEvent]:
+        """
+        Events queued since the last call, waiting up to `timeout` seconds for
+        one to arrive. Raises ResyncRequired if events were lost.
+        """
+        if not self._queue and not self.lagged and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        with self.hub._lock:
+            if self.lagged:
+                self.lagged = False
+                self._queue = deque(self.hub._replay_after(self.last_id, self.topics))
+            batch = list(self._queue)
+            self._queue.clear()
+        if batch:
+            self.last_id = batch[-1].id
+        return batch
+
+    async def _events(self) -> AsyncIterator[ChangeEvent]:
+        while not self.closed:
+            for event in await self.next_batch():
+                yield event
+
+    def _wake(self, running: Optional[asyncio.AbstractEventLoop]) -> None:
+        if running is self._loop:
+            self._ready.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+
+class ChangeFeedHub:
+    """
+    In-process publish/subscribe hub for state changes.
+
+    Publishing never blocks: each subscriber has a bounded queue, and one that
+    overflows is dropped back onto the replay buffer of the last `replay_size`
+    events instead of slowing the publisher down. Event ids increase by one per
+    event, so a reconnecting client resumes from its last id. Safe to publish
+    from any thread.
+    """
+
+    def __init__(self, replay_size: int = 10_000, max_queue: int = 1_000):
+        self.replay_size = replay_size
+        self.max_queue = max_queue
+        self._events: Deque[ChangeEvent] = deque(maxlen=replay_size)
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.published = 0
+        self.overflows = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, topic: str, type: str, data: dict) -> ChangeEvent:
+        with self._lock:
+            event = ChangeEvent(id=self._next_id, topic=topic, type=type, data=data)
+            self._next_id += 1
+            self._events.append(event)
+            self.published += 1
+            woken = []
+            for subscription in self._subscriptions:
+                if subscription.lagged or not subscription.wants(event):
+                    continue
+                if len(subscription._queue) >= subscription.max_queue:
+                    # Stop queueing for a slow client; it catches up from the replay buffer
+                    subscription._queue.clear()
+                    subscription.lagged = True
+                    self.overflows += 1
+                else:
+                    subscription._queue.append(event)
+                woken.append(subscription)
+        running = _running_loop()
+        for subscription in woken:
+            subscription._wake(running)
+        return event
+
+    def subscribe(self, after: Optional[int] = None, topics: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Follow the feed from now, or replay everything after event id `after`
+        first. Raises ResyncRequired if `after` is older than the replay buffer.
+        Must be called from the event loop that will consume the subscription.
+        """
+        topics = frozenset(topics) if topics is not None else None
+        subscription = Subscription(self, topics, self.max_queue, asyncio.get_running_loop())
+        with self._lock:
+            if after is None:
+                subscription.last_id = self.last_id
+            else:
+                subscription.last_id = after
+                subscription._queue.extend(self._replay_after(after, topics))
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'subscribers': len(self._subscriptions),
+            'published': self.published,
+            'last_id': self.last_id,
+            'buffered': len(self._events),
+            'overflows': self.overflows,
+        }
+
+    def _replay_after(self, after: int, topics: Optional[FrozenSet[str]]) -> List[ChangeEvent]:
+        # Called with the lock held
+        if after > self.last_id:
+            return []
+        oldest = self._events[0].id if self._events else self._next_id
+        if after + 1 < oldest:
+            raise ResyncRequired(f"Events after {after} are no longer buffered")
+        return [event for event in islice(self._events, after + 1 - oldest, None)
+                if topics is None or event.topic in topics]
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+# The process-wide feed the API streams; the API's ERPSystem is built to publish to it
+shared_hub = ChangeFeedHub(
+    replay_size=int(os.environ.get("CHANGE_FEED_REPLAY_SIZE", "10000")),
+    max_queue=int(os.environ.get("CHANGE_FEED_QUEUE_SIZE", "1000")),
+)
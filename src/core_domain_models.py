@@ -1,9 +1,11 @@
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
 
+from src.resource_calendar import ResourceCalendar
+
 class WorkOrderStatus(Enum):
     PLANNED = "PLANNED"
     IN_PROGRESS = "IN_PROGRESS"
@@ -15,7 +17,7 @@ class ResourceType(Enum):
     HUMAN = "HUMAN"
     TOOL = "TOOL"
 
-@dataclass
+@dataclass(slots=True)
 class Material:
     id: str
     name: str
@@ -25,25 +27,34 @@ class Material:
     reorder_point: int
     lead_time_days: int
 
-@dataclass
+    def __hash__(self):
+        return hash(self.id)
+
+@dataclass(slots=True)
 class BillOfMaterials:
     id: str
     product_id: str
     version: str
-    components: Dict[Material, int]  # Material to quantity mapping
+    components: Dict[str, int]  # Material id to quantity mapping
     labor_hours: Decimal
     notes: str
+    sub_assemblies: Dict[str, int] = field(default_factory=dict)  # Child BOM id to quantity mapping
 
-@dataclass
+@dataclass(slots=True)
 class Resource:
     id: str
     name: str
     type: ResourceType
     capacity_per_hour: Decimal
     cost_per_hour: Decimal
-    availability_schedule: Dict[datetime, bool]
+    availability_schedule: Dict[datetime, bool]  # Legacy hourly slots, seeds the calendar
+    calendar: Optional[ResourceCalendar] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.calendar is None:
+            self.calendar = ResourceCalendar.from_schedule(self.availability_schedule)
 
-@dataclass
+@dataclass(slots=True)
 class WorkOrder:
     id: str
     bom_id: str
@@ -53,9 +64,32 @@ class WorkOrder:
     end_date: datetime
     assigned_resources: List[Resource]
     actual_labor_hours: Decimal
-    actual_material_usage: Dict[Material, int]
+    actual_material_usage: Dict[str, int]  # Material id to quantity used
+    priority: int = 0  # Higher runs first in batch scheduling
+    due_date: Optional[datetime] = None
+
+@dataclass(slots=True)
+class BatchScheduleResult:
+    scheduled: List[WorkOrder] = field(default_factory=list)
+    unscheduled: List[WorkOrder] = field(default_factory=list)
+    late: List[WorkOrder] = field(default_factory=list)  # Scheduled, but ending after due_date
+
+@dataclass(slots=True, frozen=True)
+class AssignmentConflict:
+    resource_id: str
+    assignment_id: str
+    conflicting_id: str  # Already booked, or starting no later in the same batch
+    overlap_start: datetime
+    overlap_end: datetime
 
-@dataclass
+@dataclass(slots=True, frozen=True)
+class PlannedPurchaseOrder:
+    material_id: str
+    quantity: int
+    release_date: datetime
+    due_date: datetime
+
+@dataclass(slots=True)
 class WorkflowStep:
     id: str
     name: str
@@ -64,14 +98,14 @@ class WorkflowStep:
     required_resources: List[Resource]
     predecessor_steps: List[str]  # List of step IDs
 
-@dataclass
+@dataclass(slots=True)
 class Workflow:
     id: str
     name: str
     steps: List[WorkflowStep]
     total_estimated_duration: int
 
-@dataclass
+@dataclass(slots=True)
 class Project:
     id: str
     name: str
@@ -83,7 +117,7 @@ class Project:
     budget: Decimal
     actual_cost: Decimal
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TimeEntry:
     id: str
     resource_id: str
@@ -93,11 +127,26 @@ class TimeEntry:
     end_time: datetime
     activity_description: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExpenseEntry:
     id: str
     project_id: str
     amount: Decimal
     description: str
     date: datetime
-    category: str
\ No newline at end of file
+    category: str
+
+@dataclass(slots=True)
+class ProjectMetrics:
+    # Running aggregates, updated as time, expenses, material usage and step completions are logged
+    project_id: str
+    labor_hours: Decimal = Decimal('0')
+    labor_cost: Decimal = Decimal('0')
+    material_cost: Decimal = Decimal('0')
+    expense_total: Decimal = Decimal('0')
+    completed_step_ids: Set[str] = field(default_factory=set)
+
+    @property
+    def total_cost(self) -> Decimal:
+        return self.labor_cost + self.material_cost + self.expense_total
+
@@ -1,11 +1,27 @@
+import heapq
+import math
+from dataclasses import replace
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
 
-from src.core_domain_models import WorkOrder, Resource, BillOfMaterials, Project, Workflow, TimeEntry, ExpenseEntry
+from src.assignment_index import AssignmentIndex
+from src.bom_explosion import BomExplosionEngine
+from src.change_feed import RESERVATION, ChangeFeedHub
+from src.core_domain_models import WorkOrder, Resource, BillOfMaterials, Project, Workflow, TimeEntry, ExpenseEntry, \
+    BatchScheduleResult, WorkflowStep, Material, ProjectMetrics
+from src.cost_rollup import labor_cost
+from src.material_registry import MaterialRegistry
+from src.reservation_ledger import MaterialReservationLedger
+from src.resource_calendar import to_seconds, from_seconds
+from src.time_expense_store import TimeEntryStore, ExpenseEntryStore
+from src.workflow_engine import CriticalPathEngine
 
 
 class ProductionPlanningService:
+    def __init__(self, assignments: Optional[AssignmentIndex] = None):
+        self.assignments = assignments if assignments is not None else AssignmentIndex()
+
     def schedule_work_order(self, work_order: WorkOrder, resources: List[Resource]) -> bool:
         """
         Schedule a work order based on resource availability and capacity constraints.
@@ -13,103 +29,355 @@ class ProductionPlanningService:
         """
         # Check resource availability
         for resource in resources:
-            if not self._check_resource_availability(resource, work_order.start_date, work_order.end_date):
+            if not self.is_resource_available(resource, work_order.start_date, work_order.end_date):
                 return False
 
-        # Assign resources to work order
+        # Assign resources to work order and block their calendars
+        for resource in resources:
+            resource.calendar.book(work_order.start_date, work_order.end_date)
+            self.assignments.add(resource.id, work_order.id, work_order.start_date, work_order.end_date)
         work_order.assigned_resources = resources
         return True
 
-    def _check_resource_availability(self, resource: Resource, start_date: datetime, end_date: datetime) -> bool:
-        current_date = start_date
-        while current_date <= end_date:
-            if not resource.availability_schedule.get(current_date, False):
-                return False
-            current_date += timedelta(hours=1)
-        return True
+    def release_work_order(self, work_order: WorkOrder) -> None:
+        """
+        Undo the assignments of a scheduled work order and free its calendar time.
+        """
+        for resource in work_order.assigned_resources:
+            if self.assignments.remove(resource.id, work_order.id):
+                resource.calendar.add_availability(work_order.start_date, work_order.end_date)
+        work_order.assigned_resources = []
+
+    def is_resource_available(self, resource: Resource, start_date: datetime, end_date: datetime) -> bool:
+        """
+        Whether the resource's calendar is free over [start_date, end_date) and no
+        recorded assignment overlaps it.
+        """
+        return (resource.calendar.is_available(start_date, end_date)
+                and self.assignments.is_free(resource.id, start_date, end_date))
+
+    def find_earliest_start(self, resources: List[Resource], earliest: datetime,
+                            duration: timedelta) -> Optional[datetime]:
+        """
+        Find the earliest start at or after `earliest` when all resources are free
+        for `duration`. Returns None if no common window exists.
+        """
+        candidate = earliest
+        while True:
+            moved = False
+            for resource in resources:
+                window = resource.calendar.find_next_window(candidate, duration)
+                if window is None:
+                    return None
+                if window > candidate:
+                    candidate = window
+                    moved = True
+            if not moved:
+                return candidate
+
+    def schedule_work_orders(self, work_orders: List[WorkOrder], resources: List[Resource]) -> BatchScheduleResult:
+        """
+        Schedule a backlog of work orders against shared resources in a single pass.
+        Orders are placed by descending priority, then due date, each on the resource
+        that can finish it first, for quantity / capacity_per_hour hours.
+        """
+        result = BatchScheduleResult()
+        candidates = [index for index, resource in enumerate(resources) if resource.capacity_per_hour > 0]
+        backlog = sorted(work_orders, key=lambda order: (
+            -order.priority, order.due_date or datetime.max, order.start_date))
+        for work_order in backlog:
+            earliest = to_seconds(work_order.start_date)
+            # Each resource's first calendar window from the order's earliest start bounds its
+            # finish from below; assignments can only push it later, so check those best bound
+            # first and stop once no bound can beat the best finish found
+            bounds = []
+            for index in candidates:
+                duration = self._processing_seconds(work_order, resources[index])
+                start = resources[index].calendar.find_window_seconds(earliest, duration)
+                if start is not None:
+                    bounds.append((start + duration, index, duration))
+            heapq.heapify(bounds)
+            best: Optional[Tuple[int, int, int]] = None  # (end, index, start)
+            while bounds and (best is None or bounds[0][:2] < best[:2]):
+                _, index, duration = heapq.heappop(bounds)
+                start = self._find_start(resources[index], earliest, duration)
+                if start is not None and (best is None or (start + duration, index) < best[:2]):
+                    best = (start + duration, index, start)
+
+            if best is None:
+                result.unscheduled.append(work_order)
+                continue
+            end, chosen, start = best
+            resource = resources[chosen]
+            resource.calendar.book_seconds(start, end)
+            work_order.start_date = from_seconds(start)
+            work_order.end_date = from_seconds(end)
+            work_order.assigned_resources = [resource]
+            self.assignments.add(resource.id, work_order.id, work_order.start_date, work_order.end_date)
+            result.scheduled.append(work_order)
+            if work_order.due_date is not None and work_order.end_date > work_order.due_date:
+                result.late.append(work_order)
+        return result
+
+    def _find_start(self, resource: Resource, earliest: int, duration: int) -> Optional[int]:
+        """
+        Earliest start of a window that is free in the calendar and clashes with no
+        recorded assignment, skipping past each clash.
+        """
+        start = resource.calendar.find_window_seconds(earliest, duration)
+        while start is not None:
+            blocked_until = self.assignments.blocked_until(resource.id, start, start + duration)
+            if blocked_until is None:
+                return start
+            start = resource.calendar.find_window_seconds(blocked_until, duration)
+        return None
+
+    def _processing_seconds(self, work_order: WorkOrder, resource: Resource) -> int:
+        return math.ceil(Decimal(work_order.quantity) / resource.capacity_per_hour * 3600)
 
 class InventoryManagementService:
+    def __init__(self, bom_explosion: Optional[BomExplosionEngine] = None,
+                 ledger: Optional[MaterialReservationLedger] = None, feed: Optional[ChangeFeedHub] = None):
+        self.bom_explosion = bom_explosion or BomExplosionEngine()
+        self.ledger = ledger or MaterialReservationLedger(self.bom_explosion.registry)
+        self.feed = feed  # Receives reservation changes when set
+
     def check_material_availability(self, bom: BillOfMaterials, quantity: int) -> bool:
         """
         Check if there are sufficient materials available for production.
+        Nested sub-assemblies are exploded down to leaf materials.
         """
-        for material, required_qty in bom.components.items():
-            if material.stock_quantity < (required_qty * quantity):
+        for material, required_qty in self.bom_explosion.leaf_requirements(bom, quantity):
+            if material.stock_quantity < required_qty:
                 return False
         return True
 
+    def try_reserve_materials(self, bom: BillOfMaterials, quantity: int, work_order_id: Optional[str] = None) -> bool:
+        """
+        Atomically check and reserve all materials for a work order.
+        Returns False, reserving nothing, if any material is short.
+        """
+        requirements = self.bom_explosion.leaf_requirements(bom, quantity)
+        reserved = self.ledger.try_reserve(requirements, key=work_order_id)
+        if reserved:
+            self._publish_reserved(work_order_id, requirements)
+        return reserved
+
+    def reserve_work_orders(self, orders: List[Tuple[str, BillOfMaterials, int]]) -> Dict[str, bool]:
+        """
+        Reserve materials for many (work_order_id, bom, quantity) requests in one call.
+        """
+        requests = [(work_order_id, self.bom_explosion.leaf_requirements(bom, quantity))
+                    for work_order_id, bom, quantity in orders]
+        results = self.ledger.reserve_many(requests)
+        for work_order_id, requirements in requests:
+            if results.get(work_order_id):
+                self._publish_reserved(work_order_id, requirements)
+        return results
+
+    def release_work_orders(self, work_order_ids: List[str]) -> int:
+        """
+        Release the reservations held by the given work orders.
+        """
+        released = self.ledger.release_many(work_order_ids)
+        if self.feed is not None and released:
+            self.feed.publish(RESERVATION, 'released', {'work_order_ids': list(work_order_ids)})
+        return released
+
     def reserve_materials(self, bom: BillOfMaterials, quantity: int) -> None:
         """
         Reserve materials for a work order.
         """
-        for material, required_qty in bom.components.items():
-            material.stock_quantity -= (required_qty * quantity)
+        self.ledger.consume(self.bom_explosion.leaf_requirements(bom, quantity))
 
     def release_materials(self, bom: BillOfMaterials, quantity: int) -> None:
         """
         Release reserved materials if work order is cancelled.
         """
-        for material, required_qty in bom.components.items():
-            material.stock_quantity += (required_qty * quantity)
+        self.ledger.release(self.bom_explosion.leaf_requirements(bom, quantity))
+
+    def _publish_reserved(self, work_order_id: Optional[str], requirements: List[Tuple[Material, int]]) -> None:
+        if self.feed is not None:
+            self.feed.publish(RESERVATION, 'reserved', {
+                'work_order_id': work_order_id,
+                'materials': {material.id: quantity for material, quantity in requirements},
+            })
 
 class WorkflowManagementService:
+    """
+    Workflow instances of projects. Each project runs its own copy of the
+    template's steps with its own critical path engine, so completions and
+    estimate changes never reach the template or other projects.
+    """
+
+    def __init__(self):
+        # By project id
+        self._engines: Dict[str, CriticalPathEngine] = {}
+        self._steps: Dict[str, Dict[str, WorkflowStep]] = {}
+
     def create_workflow_instance(self, workflow: Workflow, project: Project) -> None:
         """
-        Create a new workflow instance for a project.
+        Create a new workflow instance for a project from a workflow template.
         """
-        project.assigned_workflow = workflow
-        self._initialize_workflow_steps(workflow)
+        project.assigned_workflow = _workflow_instance(workflow)
+        self._initialize_workflow_steps(project)
 
-    def _initialize_workflow_steps(self, workflow: Workflow) -> None:
+    def _initialize_workflow_steps(self, project: Project) -> None:
         """
         Initialize workflow steps and calculate critical path.
+        Raises ValueError if the step dependencies contain a cycle.
         """
-        # Implementation of critical path calculation
-        pass
+        workflow = project.assigned_workflow
+        engine = CriticalPathEngine(workflow.steps)
+        self._engines[project.id] = engine
+        self._steps[project.id] = {step.id: step for step in workflow.steps}
+        workflow.total_estimated_duration = engine.total_duration
 
-    def update_step_status(self, workflow: Workflow, step_id: str, completed: bool) -> None:
+    def update_step_status(self, project: Project, step_id: str, completed: bool,
+                           actual_duration: Optional[int] = None) -> None:
         """
         Update the status of a workflow step and manage dependencies.
+        An actual duration (in minutes) replaces the step estimate in the schedule.
         """
-        # Implementation of step status update
-        pass
+        engine = self.get_schedule(project)
+        engine.mark_completed(step_id, completed, actual_duration)
+        project.assigned_workflow.total_estimated_duration = engine.total_duration
+
+    def update_step_estimate(self, project: Project, step_id: str, estimated_duration: int) -> None:
+        """
+        Change a step's estimated duration and recompute the affected part of the schedule.
+        """
+        engine = self.get_schedule(project)
+        self._steps[project.id][step_id].estimated_duration = estimated_duration
+        engine.set_duration(step_id, estimated_duration)
+        project.assigned_workflow.total_estimated_duration = engine.total_duration
+
+    def get_schedule(self, project: Project) -> CriticalPathEngine:
+        """
+        Return the critical path schedule of a project's workflow, building it on
+        first use, e.g. for a project loaded from the database.
+        """
+        if project.id not in self._engines:
+            self._initialize_workflow_steps(project)
+        return self._engines[project.id]
+
+
+def _workflow_instance(template: Workflow) -> Workflow:
+    """
+    A copy of a workflow template with its own steps. Required resources stay
+    shared: they are the live resources, not part of the template.
+    """
+    steps = [replace(step, required_resources=list(step.required_resources),
+                     predecessor_steps=list(step.predecessor_steps)) for step in template.steps]
+    return replace(template, steps=steps)
 
 class ProjectManagementService:
+    LABOR_RATE = Decimal('100.00')  # Hourly rate for time logged by resources without a known cost_per_hour
+
+    def __init__(self, materials: Optional[MaterialRegistry] = None, resources: Optional[Dict[str, Resource]] = None):
+        self.materials = materials if materials is not None else MaterialRegistry()
+        self.resources = resources if resources is not None else {}
+        self._metrics: Dict[str, ProjectMetrics] = {}
+
     def calculate_project_metrics(self, project: Project) -> Dict:
         """
         Calculate key project metrics including costs, progress, and schedule variance.
+        Reads the running aggregates, so the cost is independent of project size.
         """
+        aggregate = self.get_aggregate(project.id)
         metrics = {
             'total_cost': self._calculate_total_cost(project),
+            'labor_hours': aggregate.labor_hours,
+            'material_cost': aggregate.material_cost,
+            'expense_total': aggregate.expense_total,
             'progress_percentage': self._calculate_progress(project),
             'schedule_variance': self._calculate_schedule_variance(project)
         }
         return metrics
 
-    def _calculate_total_cost(self, project: Project) -> Decimal:
+    def get_aggregate(self, project_id: str) -> ProjectMetrics:
         """
-        Calculate total project cost including labor, materials, and expenses.
+        Return the running aggregates of a project, creating empty ones on first use.
+        """
+        aggregate = self._metrics.get(project_id)
+        if aggregate is None:
+            aggregate = self._metrics[project_id] = ProjectMetrics(project_id=project_id)
+        return aggregate
+
+    def record_time_entry(self, entry: TimeEntry) -> None:
+        """
+        Add a logged time entry to its project's labor totals.
+        """
+        seconds = self._entry_seconds(entry)
+        aggregate = self.get_aggregate(entry.project_id)
+        aggregate.labor_hours += seconds / 3600
+        aggregate.labor_cost += labor_cost(int(seconds), self._labor_rate(entry.resource_id))
+
+    def record_expense(self, entry: ExpenseEntry) -> None:
+        """
+        Add a logged expense to its project's expense total.
+        """
+        self.get_aggregate(entry.project_id).expense_total += entry.amount
+
+    def record_material_usage(self, project_id: str, work_order: WorkOrder, material: Material, quantity: int) -> None:
+        """
+        Book material consumption against a work order and its project's material cost.
         """
-        labor_cost = sum(
-            entry.end_time.hour - entry.start_time.hour
-            for entry in project.time_entries
-        ) * Decimal('100.00')  # Assuming $100/hour rate
+        self.materials.register(material)
+        usage = work_order.actual_material_usage
+        usage[material.id] = usage.get(material.id, 0) + quantity
+        self.get_aggregate(project_id).material_cost += material.unit_cost * quantity
 
-        material_cost = sum(
-            sum(material.unit_cost * usage
-                for material, usage in work_order.actual_material_usage.items())
-            for work_order in project.work_orders
-        )
+    def record_step_status(self, project_id: str, step_id: str, completed: bool) -> None:
+        """
+        Track workflow step completion for progress reporting.
+        """
+        completed_steps = self.get_aggregate(project_id).completed_step_ids
+        if completed:
+            completed_steps.add(step_id)
+        else:
+            completed_steps.discard(step_id)
 
-        return labor_cost + material_cost
+    def rebuild_project_metrics(self, project: Project, time_entries: List[TimeEntry],
+                                expense_entries: List[ExpenseEntry], completed_step_ids: Set[str]) -> ProjectMetrics:
+        """
+        Recompute a project's aggregates from its full history, for reconciliation.
+        """
+        aggregate = ProjectMetrics(project_id=project.id, completed_step_ids=set(completed_step_ids))
+        self._metrics[project.id] = aggregate
+        for entry in time_entries:
+            self.record_time_entry(entry)
+        for entry in expense_entries:
+            self.record_expense(entry)
+        aggregate.material_cost = sum(
+            (self.materials[material_id].unit_cost * usage
+             for work_order in project.work_orders
+             for material_id, usage in work_order.actual_material_usage.items()),
+            Decimal('0'))
+        return aggregate
+
+    def _entry_seconds(self, entry: TimeEntry) -> Decimal:
+        return Decimal(int((entry.end_time - entry.start_time).total_seconds()))
+
+    def _labor_rate(self, resource_id: Optional[str]) -> Decimal:
+        resource = self.resources.get(resource_id)
+        return resource.cost_per_hour if resource is not None else self.LABOR_RATE
+
+    def _calculate_total_cost(self, project: Project) -> Decimal:
+        """
+        Calculate total project cost including labor, materials, and expenses.
+        """
+        return self.get_aggregate(project.id).total_cost
 
     def _calculate_progress(self, project: Project) -> float:
         """
         Calculate project progress as percentage.
         """
-        completed_steps = sum(1 for step in project.assigned_workflow.steps
-                            if step.id in project.completed_step_ids)
-        return (completed_steps / len(project.assigned_workflow.steps)) * 100
+        steps = project.assigned_workflow.steps if project.assigned_workflow else []
+        if not steps:
+            return 0.0
+        completed_steps = len(self.get_aggregate(project.id).completed_step_ids)
+        return (completed_steps / len(steps)) * 100
 
     def _calculate_schedule_variance(self, project: Project) -> int:
         """
@@ -120,23 +388,32 @@ class ProjectManagementService:
         return planned_duration - actual_duration
 
 class TimeAndExpenseService:
+    def __init__(self):
+        self.time_entries = TimeEntryStore()
+        self.expense_entries = ExpenseEntryStore()
+
     def log_time_entry(self, entry: TimeEntry) -> None:
         """
         Log a time entry for a resource.
         """
-        # Implementation of time entry logging
-        pass
+        self.time_entries.append(entry)
 
     def log_expense_entry(self, entry: ExpenseEntry) -> None:
         """
         Log an expense entry for a project.
         """
-        # Implementation of expense entry logging
-        pass
+        self.expense_entries.append(entry)
 
     def generate_time_report(self, project_id: str, start_date: datetime, end_date: datetime) -> List[TimeEntry]:
         """
         Generate a time report for a specific project and date range.
+        Includes entries starting in [start_date, end_date), ordered by start time.
+        """
+        return self.time_entries.entries_between(project_id, start_date, end_date)
+
+    def generate_expense_report(self, project_id: str, start_date: datetime, end_date: datetime) -> List[ExpenseEntry]:
+        """
+        Generate an expense report for a specific project and date range.
+        Includes expenses dated in [start_date, end_date), ordered by date.
         """
-        # Implementation of time report generation
-        pass
\ No newline at end of file
+        return self.expense_entries.entries_between(project_id, start_date, end_date)
@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.core_domain_models import Resource, WorkOrder
+from src.material_registry import MaterialRegistry
+from src.time_expense_store import AMOUNT_SCALE, TimeEntryStore
+
+SECONDS_PER_HOUR = 3600
+CENT = Decimal('0.01')
+MILLICENTS_PER_CENT = 1000  # Hourly rates are applied in integer milli-cents
+RATE_UNIT = Decimal('0.00001')
+
+
+def to_cents(amount: Decimal) -> int:
+    """
+    Exact integer cents of a money amount; sub-cent amounts are rejected.
+    """
+    scaled = amount * AMOUNT_SCALE
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"Amount {amount} has sub-cent precision")
+    return int(scaled)
+
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def to_rate_millicents(rate: Decimal) -> int:
+    """
+    Hourly rate in integer milli-cents, rounded half-even. Rates such as 37.125
+    are exact; finer ones are rounded, the same way labor_cost rounds them.
+    """
+    return int((rate * AMOUNT_SCALE * MILLICENTS_PER_CENT).to_integral_value(ROUND_HALF_EVEN))
+
+
+def labor_cents(seconds: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """
+    labor_cost in integer cents for arrays of seconds and milli-cent hourly rates.
+    """
+    return divide_half_even(seconds * rates, SECONDS_PER_HOUR * MILLICENTS_PER_CENT)
+
+
+def divide_half_even(numerators: np.ndarray, divisor: int) -> np.ndarray:
+    """
+    Integer division rounded half to even, like Decimal.quantize(ROUND_HALF_EVEN).
+    """
+    quotients, remainders = np.divmod(numerators, divisor)
+    twice = remainders * 2
+    return quotients + ((twice > divisor) | ((twice == divisor) & (quotients % 2 == 1)))
+
+
+def labor_cost(seconds: int, rate: Decimal) -> Decimal:
+    """
+    Cost of one time entry at an hourly rate, rounded half-even to the cent.
+    Every labor total is a sum of these, so the running project metrics, the
+    weekly rollups and CostRollupEngine agree to the cent. The rate is taken
+    to the milli-cent first, as to_rate_millicents does.
+    """
+    rate = rate.quantize(RATE_UNIT, ROUND_HALF_EVEN)
+    return (Decimal(seconds) * rate / SECONDS_PER_HOUR).quantize(CENT, ROUND_HALF_EVEN)
+
+
+@dataclass(slots=True)
+class CostRollup:
+    # Arrays are indexed like work_order_ids and hold integer cents
+    work_order_ids: List[str]
+    labor_cents: np.ndarray
+    material_cents: np.ndarray
+
+    @property
+    def total_cents(self) -> np.ndarray:
+        return self.labor_cents + self.material_cents
+
+    def total(self) -> Decimal:
+        return from_cents(self.total_cents.sum())
+
+    def costs(self) -> Dict[str, Decimal]:
+        """
+        Total cost per work order, converted to Decimal for the API boundary.
+        """
+        return {work_order_id: from_cents(cents)
+                for work_order_id, cents in zip(self.work_order_ids, self.total_cents.tolist())}
+
+
+class CostRollupEngine:
+    """
+    Costs work orders in integer cents with NumPy.
+
+    Labor is the seconds worked times the resource's cost_per_hour, rounded
+    half-even to cents per time entry as labor_cost does and summed per work
+    order, so results match the Decimal reference to the cent. Material cost is
+    quantity used times unit cost from the shared material registry.
+    """
+
+    def __init__(self, materials: MaterialRegistry, resources: Dict[str, Resource],
+                 default_rate: Decimal = Decimal('100.00')):
+        self.materials = materials
+        self.resources = resources
+        self.default_rate = default_rate  # For time logged by resources without a known rate
+
+    def rollup(self, work_orders: List[WorkOrder], time_entries: Optional[TimeEntryStore] = None) -> CostRollup:
+        work_order_ids = [work_order.id for work_order in work_orders]
+        labor = (self._labor_cents(work_order_ids, time_entries) if time_entries is not None
+                 else np.zeros(len(work_orders), dtype=np.int64))
+        return CostRollup(work_order_ids=work_order_ids, labor_cents=labor,
+                          material_cents=self._material_cents(work_orders))
+
+    def _labor_cents(self, work_order_ids: List[str], time_entries: TimeEntryStore) -> np.ndarray:
+        resource_codes, resource_ids, order_codes, order_ids, starts, ends = time_entries.labor_columns()
+        positions = {work_order_id: position for position, work_order_id in enumerate(work_order_ids)}
+        code_positions = np.fromiter((positions.get(order_id, -1) for order_id in order_ids),
+                                     dtype=np.int64, count=len(order_ids))
+        rates = np.fromiter((to_rate_millicents(self._rate(resource_id)) for resource_id in resource_ids),
+                            dtype=np.int64, count=len(resource_ids))
+
+        rows = code_positions[np.asarray(order_codes, dtype=np.int64)] if len(order_codes) else np.empty(0, np.int64)
+        booked = rows >= 0
+        seconds = np.asarray(ends, dtype=np.int64)[booked] - np.asarray(starts, dtype=np.int64)[booked]
+        cents = labor_cents(seconds, rates[np.asarray(resource_codes, dtype=np.int64)[booked]])
+        totals = np.zeros(len(work_order_ids), dtype=np.int64)
+        np.add.at(totals, rows[booked], cents)
+        return totals
+
+    def _material_cents(self, work_orders: List[WorkOrder]) -> np.ndarray:
+        unit_cents = np.fromiter((to_cents(material.unit_cost) for material in self.materials.materials),
+                                 dtype=np.int64, count=len(self.materials))
+        rows, indices, quantities = [], [], []
+        for position, work_order in enumerate(work_orders):
+            for material_id, quantity in work_order.actual_material_usage.items():
+                rows.append(position)
+                indices.append(self.materials.index(material_id))
+                quantities.append(quantity)
+        totals = np.zeros(len(work_orders), dtype=np.int64)
+        if rows:
+            np.add.at(totals, np.array(rows), np.array(quantities, dtype=np.int64) * unit_cents[np.array(indices)])
+        return totals
+
+    def _rate(self, resource_id: Optional[str]) -> Decimal:
+        resource = self.resources.get(resource_id)
+        return resource.cost_per_hour if resource is not None else self.default_rate
+
+
+def reference_costs(work_orders: Iterable[WorkOrder], time_entries: TimeEntryStore, materials: MaterialRegistry,
+                    resources: Dict[str, Resource], default_rate: Decimal = Decimal('100.00')) -> Dict[str, Decimal]:
+    """
+    The same rollup in Decimal, one object at a time, to check the engine against.
+    """
+    labor: Dict[Optional[str], Decimal] = {}
+    for row in range(len(time_entries)):
+        entry = time_entries.entry(row)
+        resource = resources.get(entry.resource_id)
+        rate = resource.cost_per_hour if resource is not None else default_rate
+        seconds = int((entry.end_time - entry.start_time).total_seconds())
+        labor[entry.work_order_id] = labor.get(entry.work_order_id, Decimal('0')) + labor_cost(seconds, rate)
+    costs = {}
+    for work_order in work_orders:
+        material_cost = sum((materials[material_id].unit_cost * quantity
+                             for material_id, quantity in work_order.actual_material_usage.items()), Decimal('0'))
+        costs[work_order.id] = labor.get(work_order.id, Decimal('0')) + material_cost
+    return costs
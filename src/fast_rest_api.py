@@ -1,21 +1,89 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import DateTime, and_, event, func, insert, inspect, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, object_session, selectinload
+from typing import AsyncIterator, Generic, List, Optional, Tuple, TypeVar
 from datetime import datetime, timedelta
+from decimal import Decimal
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
 import jwt
-from pydantic import BaseModel
-from passlib.context import CryptContext
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
 
-app = FastAPI(title="ERP System API")
+from src import analytics_rollups
+from src.analytics_rollups import RollupRefresher
+from src.assignment_index import AssignmentIndex
+from src.auth_cache import Principal, TokenCache
+from src.change_feed import WORK_ORDER, ResyncRequired, Subscription, shared_hub
+from src.instrumentation import Metrics, MetricsMiddleware, SamplingProfiler, instrument_engine
+from src.main import ERPSystem
+from src.password_hashing import PasswordHasher
+from src.repository import BATCH_SIZE
+from src.database_models import (
+    User, UserRole, Project, WorkOrder, TimeEntry, ExpenseEntry, Resource, ResourceAssignment, AsyncSessionLocal,
+    init_async_db, maintain_partitions
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    engine = await init_async_db()
+    instrument_engine(engine, metrics)
+    jobs = []
+    if ROLLUP_REFRESH_SECONDS > 0:
+        jobs.append(asyncio.create_task(_refresh_rollups_periodically()))
+    if PARTITION_MAINTENANCE_SECONDS > 0:
+        jobs.append(asyncio.create_task(_maintain_partitions_periodically(engine)))
+    yield
+    for job in jobs:
+        job.cancel()
+        with suppress(asyncio.CancelledError):
+            await job
+    await engine.dispose()
+
+app = FastAPI(title="ERP System API", lifespan=lifespan)
 
 # Security
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+MAX_BULK_ROWS = 50_000
+MAX_PAGE_SIZE = 1_000
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get("PASSWORD_HASH_ROUNDS", "12")),
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "4")),
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+token_cache = TokenCache(
+    max_entries=int(os.environ.get("TOKEN_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "60")),
+)
+change_feed = shared_hub
+# Planning services of this process; their reservation and workflow step changes are streamed with the work orders'
+erp = ERPSystem(change_feed=change_feed)
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.environ.get("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+rollups = RollupRefresher(batch_size=int(os.environ.get("ROLLUP_BATCH_SIZE", "20000")))
+ROLLUP_REFRESH_SECONDS = float(os.environ.get("ROLLUP_REFRESH_SECONDS", "60"))
+# Monthly partitions are created this often, ahead of the rows that need them (PostgreSQL only)
+PARTITION_MAINTENANCE_SECONDS = float(os.environ.get("PARTITION_MAINTENANCE_SECONDS", "21600"))
+logger = logging.getLogger(__name__)
+metrics = Metrics(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+# Requests sent with an X-Profile header are sampled only while this is enabled
+profiler = SamplingProfiler(
+    interval=float(os.environ.get("PROFILER_INTERVAL_SECONDS", "0.001")),
+    enabled=os.environ.get("PROFILING_ENABLED", "0") == "1",
+)
+app.add_middleware(MetricsMiddleware, metrics=metrics, profiler=profiler)
+metrics.add_collector(lambda: {f"erp_token_cache_{key}": value for key, value in token_cache.stats().items()})
+metrics.add_collector(lambda: {f"erp_change_feed_{key}": value for key, value in change_feed.stats().items()})
 
 # Pydantic models for request/response
 class UserCreate(BaseModel):
@@ -30,19 +98,249 @@ class UserResponse(BaseModel):
     email: str
     role: UserRole
 
+class RoleUpdate(BaseModel):
+    role: UserRole
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class ProjectCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    start_date: datetime
+    end_date: datetime
+    budget: Decimal
+    workflow_id: Optional[int] = None
+
+class WorkOrderCreate(BaseModel):
+    bom_id: int
+    project_id: Optional[int] = None
+    status: str
+    quantity: int
+    start_date: datetime
+    end_date: datetime
+
+class WorkOrderStatusUpdate(BaseModel):
+    status: str
+
+class TimeEntryCreate(BaseModel):
+    project_id: int
+    work_order_id: Optional[int] = None
+    resource_id: Optional[int] = None
+    start_time: datetime
+    end_time: datetime
+    activity_description: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_interval(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class BulkRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class BulkInsertResponse(BaseModel):
+    inserted: int
+    errors: List[BulkRowError]
+
+class ResourceAssignmentCreate(BaseModel):
+    work_order_id: int
+    resource_id: int
+    start_time: datetime
+    end_time: datetime
+
+    @model_validator(mode='after')
+    def check_interval(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class AssignmentConflictResponse(BaseModel):
+    resource_id: int
+    row: int
+    conflicting_row: Optional[int] = None  # Another row of the same request
+    conflicting_assignment_id: Optional[int] = None  # Already stored
+    overlap_start: datetime
+    overlap_end: datetime
+
+class ResourceAssignmentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    work_order_id: Optional[int]
+    resource_id: Optional[int]
+    start_time: datetime
+    end_time: datetime
+
+class MaterialUsageResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    material_id: Optional[int]
+    quantity_used: int
+
+class WorkOrderSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    bom_id: Optional[int]
+    project_id: Optional[int]
+    status: str
+    quantity: int
+    start_date: datetime
+    end_date: datetime
+    actual_labor_hours: Optional[Decimal]
+
+class WorkOrderDetail(WorkOrderSummary):
+    resource_assignments: List[ResourceAssignmentResponse]
+    material_usage: List[MaterialUsageResponse]
+
+class TimeEntryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: Optional[int]
+    project_id: int
+    work_order_id: Optional[int]
+    resource_id: Optional[int]
+    start_time: datetime
+    end_time: datetime
+    activity_description: Optional[str]
+
+class ExpenseEntryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    amount: Decimal
+    description: Optional[str]
+    date: datetime
+    category: Optional[str]
+
+class ProjectSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    description: Optional[str]
+    start_date: datetime
+    end_date: datetime
+    budget: Decimal
+    actual_cost: Optional[Decimal]
+    workflow_id: Optional[int]
+    work_order_count: int = 0
+    time_entry_count: int = 0
+    expense_total: Decimal = Decimal('0')
+
+class ProjectDetail(ProjectSummary):
+    work_orders: List[WorkOrderDetail]
+    time_entries: List[TimeEntryResponse]
+    expense_entries: List[ExpenseEntryResponse]
+
+    @model_validator(mode='after')
+    def derive_totals(self):
+        self.work_order_count = len(self.work_orders)
+        self.time_entry_count = len(self.time_entries)
+        self.expense_total = sum((entry.amount for entry in self.expense_entries), Decimal('0'))
+        return self
+
+T = TypeVar('T')
+
+class ProjectRollup(BaseModel):
+    project_id: int
+    name: str
+    budget: Decimal
+    total_cost: Decimal
+    labor_hours: Decimal
+    labor_cost: Decimal
+    material_cost: Decimal
+    expense_total: Decimal
+    cost_variance: Decimal  # Budget left, negative when over budget
+    budget_used: Optional[float]
+    schedule_variance: int  # Days
+    work_orders_completed: int
+    work_orders_late: int
+    days_late: int
+
+class Portfolio(BaseModel):
+    refreshed_at: Optional[datetime]  # Oldest source watermark; rows logged since may be missing
+    projects: List[ProjectRollup]
+
+class WeeklyCost(BaseModel):
+    week_start: datetime
+    labor_cost: Decimal
+    material_cost: Decimal
+    expense_total: Decimal
+    total_cost: Decimal
+    work_orders_completed: int
+    work_orders_late: int
+
+class WeeklyUtilisation(BaseModel):
+    department: Optional[str] = None
+    resource: Optional[int] = None
+    week_start: datetime
+    logged_hours: Decimal
+    capacity_hours: Decimal
+    utilisation: Optional[float]
+    labor_cost: Decimal
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# Loader options for a whole project aggregate: one SELECT per relationship
+# (batched by primary key) instead of one per row
+PROJECT_AGGREGATE = (
+    selectinload(Project.work_orders).selectinload(WorkOrder.resource_assignments),
+    selectinload(Project.work_orders).selectinload(WorkOrder.material_usage),
+    selectinload(Project.time_entries),
+    selectinload(Project.expense_entries),
+)
+
 # Dependencies
-def get_db():
-    db = Session()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _encode_cursor(values: list) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str, keys: tuple) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if isinstance(key.type, DateTime) else int(value)
+                for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def keyset_page(db: AsyncSession, query, keys: tuple, cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    """
+    One page of `query` ordered by the unique column tuple `keys`, starting after
+    `cursor`. Seeking past the last key keeps every page as cheap as the first,
+    provided an index leads with the filter columns followed by `keys`.
+    """
+    if cursor:
+        query = query.where(tuple_(*keys) > tuple_(*_decode_cursor(cursor, keys)))
+    rows = (await db.execute(query.order_by(*keys).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1][0]
+    return rows[:limit], _encode_cursor([getattr(last, key.key) for key in keys])
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    return jwt.encode({**data, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -53,23 +351,79 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal(id=user.id, username=user.username, role=user.role)
+    token_cache.put(token, principal, token_expires_in=payload["exp"] - time.time() if "exp" in payload else None)
+    return principal
+
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return current_user
+
+# Cached principals of changed users are evicted only once the change commits,
+# so a request in between cannot cache the old role again for the whole TTL
+@event.listens_for(User, "after_update")
+def _queue_changed_user(mapper, connection, target):
+    # Role is part of the cached principal; anything else does not affect authorization
+    if inspect(target).attrs.role.history.has_changes():
+        object_session(target).info.setdefault("invalidated_users", set()).add(target.id)
+
+@event.listens_for(User, "after_delete")
+def _queue_deleted_user(mapper, connection, target):
+    object_session(target).info.setdefault("invalidated_users", set()).add(target.id)
+
+# Work order changes are queued on the session and published to the change
+# feed only once the transaction commits
+def _queue_change(target, type: str, data: dict) -> None:
+    object_session(target).info.setdefault("change_feed", []).append((WORK_ORDER, type, data))
+
+@event.listens_for(WorkOrder, "after_insert")
+def _queue_created_work_order(mapper, connection, target):
+    _queue_change(target, "created", {"id": target.id, "project_id": target.project_id, "status": target.status})
+
+@event.listens_for(WorkOrder, "after_update")
+def _queue_work_order_status(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if history.has_changes():
+        _queue_change(target, "status_changed", {
+            "id": target.id, "project_id": target.project_id, "status": target.status,
+            "previous_status": history.deleted[0] if history.deleted else None,
+        })
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_changes(session):
+    for user_id in session.info.pop("invalidated_users", ()):
+        token_cache.invalidate_user(user_id)
+    for topic, type, data in session.info.pop("change_feed", ()):
+        change_feed.publish(topic, type, data)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session):
+    session.info.pop("invalidated_users", None)
+    session.info.pop("change_feed", None)
 
 # Auth routes
 @app.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not pwd_context.verify(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used another work factor; upgrade it transparently
+        user.password_hash = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -78,87 +432,527 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 
 # User routes
 @app.post("/users/", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=pwd_context.hash(user.password),
+        password_hash=await password_hasher.hash(user.password),
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+@app.put("/users/{user_id}/role", response_model=UserResponse)
+async def update_user_role(
+    user_id: int,
+    update: RoleUpdate,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    db_user = await db.get(User, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_user.role = update.role
+    await db.commit()
     return db_user
 
+@app.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_user(
+    user_id: int,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    db_user = await db.get(User, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.delete(db_user)
+    await db.commit()
+
+@app.get("/auth/cache-stats")
+async def get_auth_cache_stats(current_user: Principal = Depends(require_admin)):
+    return token_cache.stats()
+
 # Project routes
 @app.post("/projects/")
 async def create_project(
     project: ProjectCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     db_project = Project(**project.dict())
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
-@app.get("/projects/{project_id}")
+@app.get("/projects/", response_model=Page[ProjectSummary])
+async def list_projects(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Projects with child counts and expense totals, computed by correlated
+    subqueries in the same statement rather than by loading the children.
+    """
+    work_order_count = (select(func.count(WorkOrder.id)).where(WorkOrder.project_id == Project.id)
+                        .correlate(Project).scalar_subquery())
+    time_entry_count = (select(func.count(TimeEntry.id)).where(TimeEntry.project_id == Project.id)
+                        .correlate(Project).scalar_subquery())
+    expense_total = (select(func.coalesce(func.sum(ExpenseEntry.amount), 0))
+                     .where(ExpenseEntry.project_id == Project.id).correlate(Project).scalar_subquery())
+    query = select(Project, work_order_count, time_entry_count, expense_total)
+    if start_from is not None:
+        query = query.where(Project.start_date >= start_from)
+    if start_to is not None:
+        query = query.where(Project.start_date < start_to)
+    rows, next_cursor = await keyset_page(db, query, (Project.id,), cursor, limit)
+    return Page[ProjectSummary](items=[
+        ProjectSummary.model_validate(project).model_copy(update={
+            'work_order_count': work_orders, 'time_entry_count': time_entries,
+            'expense_total': Decimal(str(expenses)),
+        })
+        for project, work_orders, time_entries, expenses in rows
+    ], next_cursor=next_cursor)
+
+@app.get("/projects/{project_id}", response_model=ProjectDetail)
 async def get_project(
     project_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id, options=PROJECT_AGGREGATE)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return ProjectDetail.model_validate(project)
 
 # Work Order routes
 @app.post("/work-orders/")
 async def create_work_order(
     work_order: WorkOrderCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     db_work_order = WorkOrder(**work_order.dict())
     db.add(db_work_order)
-    db.commit()
-    db.refresh(db_work_order)
+    await db.commit()
+    await db.refresh(db_work_order)
     return db_work_order
 
+@app.put("/work-orders/{work_order_id}/status", response_model=WorkOrderSummary)
+async def update_work_order_status(
+    work_order_id: int,
+    update: WorkOrderStatusUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    work_order = await db.get(WorkOrder, work_order_id)
+    if not work_order:
+        raise HTTPException(status_code=404, detail="Work order not found")
+    work_order.status = update.status
+    await db.commit()
+    return work_order
+
+@app.get("/work-orders/", response_model=Page[WorkOrderSummary])
+async def list_work_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    status: Optional[str] = None,
+    project_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Work orders by start date; `start_from`/`start_to` bound `start_date` as a half-open range.
+    """
+    query = select(WorkOrder)
+    if status is not None:
+        query = query.where(WorkOrder.status == status)
+    if project_id is not None:
+        query = query.where(WorkOrder.project_id == project_id)
+    if start_from is not None:
+        query = query.where(WorkOrder.start_date >= start_from)
+    if start_to is not None:
+        query = query.where(WorkOrder.start_date < start_to)
+    rows, next_cursor = await keyset_page(db, query, (WorkOrder.start_date, WorkOrder.id), cursor, limit)
+    return Page[WorkOrderSummary](items=[row[0] for row in rows], next_cursor=next_cursor)
+
+# Resource assignment routes
+@app.get("/resources/{resource_id}/assignments", response_model=List[ResourceAssignmentResponse])
+async def list_resource_assignments(
+    resource_id: int,
+    start: datetime,
+    end: datetime,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Assignments of a resource that overlap [start, end).
+    """
+    result = await db.scalars(
+        select(ResourceAssignment)
+        .where(ResourceAssignment.resource_id == resource_id,
+               ResourceAssignment.start_time < end, ResourceAssignment.end_time > start)
+        .order_by(ResourceAssignment.start_time, ResourceAssignment.id)
+    )
+    return result.all()
+
+@app.post("/resource-assignments/", response_model=List[ResourceAssignmentResponse])
+async def create_resource_assignments(
+    assignments: List[ResourceAssignmentCreate],
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Book a batch of assignments, all or nothing. Responds 409 with every
+    conflict if any row overlaps a stored assignment or another row.
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    conflicts = await _assignment_conflicts(db, assignments)
+    if conflicts:
+        raise HTTPException(status_code=409, detail=[conflict.model_dump(mode='json') for conflict in conflicts])
+    rows = [ResourceAssignment(**assignment.model_dump()) for assignment in assignments]
+    db.add_all(rows)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent booking won the race past the database exclusion constraint
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicts with a concurrent booking")
+    return rows
+
+async def _assignment_conflicts(db: AsyncSession,
+                                assignments: List[ResourceAssignmentCreate]) -> List[AssignmentConflictResponse]:
+    """
+    Load the stored assignments inside each resource's time envelope in one
+    query, then check the batch against them and itself with an AssignmentIndex.
+    """
+    if not assignments:
+        return []
+    envelopes = {}
+    for assignment in assignments:
+        lo, hi = envelopes.get(assignment.resource_id, (assignment.start_time, assignment.end_time))
+        envelopes[assignment.resource_id] = (min(lo, assignment.start_time), max(hi, assignment.end_time))
+    stored = await db.execute(
+        select(ResourceAssignment.id, ResourceAssignment.resource_id,
+               ResourceAssignment.start_time, ResourceAssignment.end_time)
+        .where(or_(*(and_(ResourceAssignment.resource_id == resource_id,
+                          ResourceAssignment.start_time < hi, ResourceAssignment.end_time > lo)
+                     for resource_id, (lo, hi) in envelopes.items())))
+    )
+    index = AssignmentIndex()
+    for assignment_id, resource_id, start_time, end_time in stored:
+        index.add(resource_id, ('stored', assignment_id), start_time, end_time)
+
+    conflicts = index.conflicts(
+        (assignment.resource_id, ('row', row), assignment.start_time, assignment.end_time)
+        for row, assignment in enumerate(assignments)
+    )
+    return [
+        AssignmentConflictResponse(
+            resource_id=conflict.resource_id, row=conflict.assignment_id[1],
+            conflicting_row=conflict.conflicting_id[1] if conflict.conflicting_id[0] == 'row' else None,
+            conflicting_assignment_id=conflict.conflicting_id[1] if conflict.conflicting_id[0] == 'stored' else None,
+            overlap_start=conflict.overlap_start, overlap_end=conflict.overlap_end,
+        )
+        for conflict in conflicts
+    ]
+
 # Time Entry routes
+@app.get("/time-entries/", response_model=Page[TimeEntryResponse])
+async def list_time_entries(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    project_id: Optional[int] = None,
+    resource_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Time entries by start time; `start_from`/`start_to` bound `start_time` as a half-open range.
+    """
+    query = select(TimeEntry)
+    if project_id is not None:
+        query = query.where(TimeEntry.project_id == project_id)
+    if resource_id is not None:
+        query = query.where(TimeEntry.resource_id == resource_id)
+    if start_from is not None:
+        query = query.where(TimeEntry.start_time >= start_from)
+    if start_to is not None:
+        query = query.where(TimeEntry.start_time < start_to)
+    rows, next_cursor = await keyset_page(db, query, (TimeEntry.start_time, TimeEntry.id), cursor, limit)
+    return Page[TimeEntryResponse](items=[row[0] for row in rows], next_cursor=next_cursor)
+
 @app.post("/time-entries/")
 async def create_time_entry(
     time_entry: TimeEntryCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     db_time_entry = TimeEntry(
         **time_entry.dict(),
         user_id=current_user.id
     )
     db.add(db_time_entry)
-    db.commit()
-    db.refresh(db_time_entry)
+    await db.commit()
+    await db.refresh(db_time_entry)
     return db_time_entry
 
-# Analytics routes
-@app.get("/analytics/project-metrics/{project_id}")
+@app.post("/time-entries/bulk", response_model=BulkInsertResponse)
+async def create_time_entries_bulk(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Insert many time entries from a JSON array or NDJSON body in one statement.
+    Invalid rows, including ones naming a project, work order or resource that
+    does not exist, are skipped and reported by position; valid rows are still inserted.
+    """
+    rows, positions, errors = [], [], []
+    for index, raw in enumerate(_parse_bulk_body(await request.body(), request.headers.get("content-type", ""))):
+        try:
+            if isinstance(raw, ValueError):
+                raise raw
+            entry = TimeEntryCreate.model_validate(raw)
+        except ValidationError as exc:
+            errors.append(BulkRowError(row=index, errors=[
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+            ]))
+            continue
+        except ValueError as exc:
+            errors.append(BulkRowError(row=index, errors=[str(exc)]))
+            continue
+        rows.append({**entry.model_dump(), "user_id": current_user.id})
+        positions.append(index)
+
+    unknown = await _unknown_references(db, rows)
+    if unknown:
+        kept = []
+        for index, row in zip(positions, rows):
+            problems = [f"{column}: no {model.__tablename__} row with id {row[column]}"
+                        for column, (model, ids) in unknown.items() if row[column] in ids]
+            if problems:
+                errors.append(BulkRowError(row=index, errors=problems))
+            else:
+                kept.append(row)
+        rows = kept
+        errors.sort(key=lambda error: error.row)
+
+    if rows:
+        await db.execute(insert(TimeEntry), rows)
+        await db.commit()
+    return BulkInsertResponse(inserted=len(rows), errors=errors)
+
+# Foreign keys of a time entry and the model each one points at
+TIME_ENTRY_REFERENCES = (("project_id", Project), ("work_order_id", WorkOrder), ("resource_id", Resource))
+
+async def _unknown_references(db: AsyncSession, rows: list) -> dict:
+    """
+    Referenced ids among `rows` with no row to point at, by column, checked with
+    IN queries of at most BATCH_SIZE ids so a bad id is a row error rather than a
+    failed insert, and a large payload stays under the driver's bind parameter limit.
+    """
+    unknown = {}
+    for column, model in TIME_ENTRY_REFERENCES:
+        ids = sorted({row[column] for row in rows if row[column] is not None})
+        found = set()
+        for offset in range(0, len(ids), BATCH_SIZE):
+            found.update(await db.scalars(select(model.id).where(model.id.in_(ids[offset:offset + BATCH_SIZE]))))
+        ids = set(ids) - found
+        if ids:
+            unknown[column] = (model, ids)
+    return unknown
+
+def _parse_bulk_body(body: bytes, content_type: str) -> list:
+    """
+    Split a bulk payload into raw rows. NDJSON lines that fail to parse become
+    ValueError rows so they are reported alongside validation errors.
+    """
+    if "ndjson" in content_type:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                rows.append(ValueError(f"invalid JSON: {exc.msg}"))
+    else:
+        try:
+            rows = json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {exc.msg}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of time entries")
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} rows per request")
+    return rows
+
+# Change feed
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Comma-separated topics, e.g. work_order,reservation"),
+    after: Optional[int] = Query(None, description="Replay events after this id"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Server-sent events for work order, reservation and workflow step changes.
+    Reconnecting clients resume after the `Last-Event-ID` header or `after`.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if after is None and last_event_id:
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    try:
+        subscription = change_feed.subscribe(after, topics.split(",") if topics else None)
+    except ResyncRequired as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    return StreamingResponse(_sse_events(subscription), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _sse_events(subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Frames queued events as SSE, one write per batch, with a comment line as
+    heartbeat when idle. A client that fell out of the replay buffer gets a
+    `resync` event and is disconnected so it reloads state.
+    """
+    try:
+        while True:
+            try:
+                batch = await subscription.next_batch(timeout=CHANGE_FEED_HEARTBEAT_SECONDS)
+            except ResyncRequired:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            yield "".join(event.to_sse() for event in batch) if batch else ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+@app.get("/events/stats")
+async def get_change_feed_stats(current_user: Principal = Depends(require_admin)):
+    return change_feed.stats()
+
+# Instrumentation
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: request, span and query latency histograms
+    plus cache and change feed gauges.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/slowest")
+async def get_slowest_traces(current_user: Principal = Depends(require_admin)):
+    return metrics.slowest_traces()
+
+@app.get("/metrics/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int, current_user: Principal = Depends(require_admin)):
+    """
+    Collapsed stacks of a profiled request, one `frame;frame count` per line.
+    """
+    if profile_id not in profiler.profiles:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profiler.collapsed(profile_id)
+
+# Partition maintenance
+async def _maintain_partitions_periodically(engine: AsyncEngine):
+    while True:
+        await asyncio.sleep(PARTITION_MAINTENANCE_SECONDS)
+        try:
+            async with engine.begin() as connection:
+                created = await connection.run_sync(maintain_partitions)
+            if created:
+                logger.info("Created partitions %s", ", ".join(created))
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+# Analytics routes, served from the weekly rollups
+async def _refresh_rollups_periodically():
+    while True:
+        await asyncio.sleep(ROLLUP_REFRESH_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(rollups.refresh)
+                await db.commit()
+        except Exception:
+            logger.exception("Rollup refresh failed")
+
+@app.get("/analytics/project-metrics/{project_id}", response_model=ProjectRollup)
 async def get_project_metrics(
     project_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+    totals = await db.run_sync(analytics_rollups.project_totals, [project_id])
+    if not totals:
         raise HTTPException(status_code=404, detail="Project not found")
+    return totals[0]
 
-    metrics = calculate_project_metrics(project, db)
-    return metrics
\ No newline at end of file
+@app.get("/analytics/portfolio", response_model=Portfolio)
+async def get_portfolio(
+    first_week: Optional[datetime] = None,
+    last_week: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Cost against budget and schedule variance for every project, optionally
+    limited to the weeks from `first_week` to `last_week`.
+    """
+    projects = await db.run_sync(analytics_rollups.project_totals, None, first_week, last_week)
+    return {"refreshed_at": await db.run_sync(analytics_rollups.last_refreshed), "projects": projects}
+
+@app.get("/analytics/portfolio/weekly", response_model=List[WeeklyCost])
+async def get_portfolio_weekly(
+    first_week: Optional[datetime] = None,
+    last_week: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await db.run_sync(analytics_rollups.weekly_project_costs, first_week, last_week)
+
+@app.get("/analytics/utilisation", response_model=List[WeeklyUtilisation])
+async def get_utilisation(
+    by: str = Query("department", pattern="^(department|resource)$"),
+    first_week: Optional[datetime] = None,
+    last_week: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await db.run_sync(analytics_rollups.utilisation, by, first_week, last_week)
+
+@app.post("/analytics/rollups/refresh")
+async def refresh_rollups(
+    rebuild: bool = False,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Fold new rows into the rollups now, or recompute them from scratch with
+    `rebuild`. Returns the number of source rows applied.
+    """
+    applied = await db.run_sync(rollups.rebuild if rebuild else rollups.refresh)
+    await db.commit()
+    return applied
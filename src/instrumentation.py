@@ -0,0 +1,381 @@
+import functools
+import heapq
+import inspect
+import itertools
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from half a millisecond to ten seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+_QUERY_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.IGNORECASE)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th observation, as Prometheus'
+        histogram_quantile would place it.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, seen in zip(self.buckets + (float('inf'),), itertools.accumulate(self.counts)):
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Span:
+    """
+    One timed stage. Spans opened inside another are named after it, e.g.
+    `create_work_order/reserve_materials`, so each stage has its own histogram.
+    """
+    __slots__ = ('metrics', 'name', 'labels', 'parent', 'stages', 'started', '_token')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: Labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.stages: Dict[str, float] = {}
+
+    def __enter__(self) -> 'Span':
+        self.parent = _current_span.get()
+        if self.parent is not None:
+            self.name = f"{self.parent.name}/{self.name}"
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        self.metrics.observe('erp_span_seconds', elapsed, span=self.name, **dict(self.labels))
+        if self.parent is not None:
+            stages = self.parent.stages
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+            for stage, seconds in self.stages.items():
+                stages[stage] = stages.get(stage, 0.0) + seconds
+        else:
+            self.metrics._record_trace(self.name, elapsed, self.stages)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Counters and latency histograms rendered in the Prometheus text format.
+
+    Spans time a block and record the stages nested inside it, keeping the
+    `slowest` root spans with their per-stage breakdown so a tail latency can
+    be pinned on one stage. When disabled, `span` hands back a shared no-op
+    and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, slowest: int = 20):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.slowest = slowest
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self._traces: List[Tuple[float, int, str, Dict[str, float]]] = []  # Min-heap on duration
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **labels: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, tuple(sorted(labels.items())))
+
+    def timed(self, name: str) -> Callable:
+        """
+        Decorator running the function inside a span.
+        """
+        def decorate(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name, ()):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def instrument(self, service: object, prefix: str) -> None:
+        """
+        Time every public method of `service` as `<prefix>.<method>`. Wraps the
+        instance's attributes, so the class and other instances are untouched.
+        """
+        for attribute in dir(type(service)):
+            method = getattr(service, attribute)
+            if not attribute.startswith('_') and inspect.isroutine(method):
+                setattr(service, attribute, self.timed(f"{prefix}.{attribute}")(method))
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """
+        Register a callable returning gauge values, read on every render.
+        """
+        self._collectors.append(collector)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def slowest_traces(self) -> List[Dict]:
+        """
+        The slowest root spans seen, slowest first, with time spent per stage.
+        """
+        with self._lock:
+            traces = sorted(self._traces, reverse=True)
+        return [{'span': name, 'seconds': seconds, 'stages': stages} for seconds, _, name, stages in traces]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._traces.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        previous = None
+        for (name, labels), histogram in histograms:
+            if name != previous:
+                lines.append(f"# TYPE {name} histogram")
+                previous = name
+            for bound, seen in zip(histogram.buckets + (float('inf'),), itertools.accumulate(histogram.counts)):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {seen}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            if name != previous:
+                lines.append(f"# TYPE {name} counter")
+                previous = name
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for collector in self._collectors:
+            for name, value in sorted(collector().items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _record_trace(self, name: str, seconds: float, stages: Dict[str, float]) -> None:
+        trace = (seconds, next(self._sequence), name, stages)
+        with self._lock:
+            if len(self._traces) < self.slowest:
+                heapq.heappush(self._traces, trace)
+            elif seconds > self._traces[0][0]:
+                heapq.heapreplace(self._traces, trace)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def instrument_engine(engine, metrics: Metrics) -> None:
+    """
+    Time every statement run on a SQLAlchemy engine (the sync engine behind
+    an AsyncEngine) as `erp_db_query_seconds` by operation and table.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if metrics.enabled:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        table = _QUERY_TABLE.search(statement)
+        metrics.observe('erp_db_query_seconds', elapsed, operation=statement.lstrip().split(None, 1)[0].lower(),
+                        table=table.group(1) if table else '')
+        span = _current_span.get()
+        if span is not None:
+            span.stages['db'] = span.stages.get('db', 0.0) + elapsed
+
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler: a background thread samples one thread's
+    stack every `interval` seconds and counts collapsed stacks, ready for a
+    flame graph. Async handlers share the event loop thread, so concurrent
+    requests show up in each other's profiles. The last `keep` profiles are
+    kept by id.
+    """
+
+    def __init__(self, interval: float = 0.001, keep: int = 32, enabled: bool = True):
+        self.enabled = enabled  # Off, requests asking to be profiled run unprofiled
+        self.interval = interval
+        self.profiles: Dict[int, Counter] = {}
+        self._order: Deque[int] = deque()
+        self._ids = itertools.count(1)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def start(self, thread_id: Optional[int] = None) -> 'Sampling':
+        return Sampling(self, thread_id if thread_id is not None else threading.get_ident())
+
+    def collapsed(self, profile_id: int) -> str:
+        """
+        One `frame;frame;frame count` line per distinct stack, outermost first.
+        """
+        samples = self.profiles[profile_id]
+        return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+    def _store(self, samples: Counter) -> int:
+        with self._lock:
+            profile_id = next(self._ids)
+            self.profiles[profile_id] = samples
+            self._order.append(profile_id)
+            while len(self._order) > self.keep:
+                del self.profiles[self._order.popleft()]
+        return profile_id
+
+
+class Sampling:
+    __slots__ = ('profiler', 'thread_id', 'samples', '_stop', '_thread')
+
+    def __init__(self, profiler: SamplingProfiler, thread_id: int):
+        self.profiler = profiler
+        self.thread_id = thread_id
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        """
+        Stop sampling and store the profile, returning its id.
+        """
+        self._stop.set()
+        self._thread.join()
+        return self.profiler._store(self.samples)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.profiler.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each request as `erp_http_request_seconds` by
+    method, route template and status. Requests carrying the `profile_header`
+    are sampled while the profiler is enabled; the response then names the stored
+    profile in `X-Profile-Id`.
+    """
+
+    def __init__(self, app, metrics: Metrics, profiler: Optional[SamplingProfiler] = None,
+                 profile_header: str = 'x-profile'):
+        self.app = app
+        self.metrics = metrics
+        self.profiler = profiler
+        self.profile_header = profile_header.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        sampling = None
+        profiling = self.profiler is not None and self.profiler.enabled
+        if profiling and any(name == self.profile_header and value not in (b'', b'0')
+                             for name, value in scope['headers']):
+            sampling = self.profiler.start()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if sampling is not None:
+                    # Profile covers the handler; streaming bodies are not sampled
+                    profile_id = sampling.stop()
+                    message['headers'] = list(message.get('headers', [])) + [
+                        (b'x-profile-id', str(profile_id).encode())]
+            await send(message)
+
+        # Collects the time spent in spans and queries under this request
+        request = Span(self.metrics, 'request', ())
+        request.parent = None
+        token = _current_span.set(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_span.reset(token)
+            if sampling is not None and not sampling._stop.is_set():
+                sampling.stop()
+            route = scope.get('route')
+            route = route.path if route is not None else 'unmatched'
+            self.metrics.observe('erp_http_request_seconds', elapsed, method=scope['method'], route=route,
+                                 status=str(status))
+            self.metrics._record_trace(f"{scope['method']} {route}", elapsed, request.stages)
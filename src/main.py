@@ -1,65 +1,130 @@
-import uuid
+import itertools
+import math
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Dict
+from typing import Callable, Iterable, Iterator, List, Optional, Dict
 
-from src.core_domain_models import TimeEntry, BillOfMaterials, Resource, Workflow, Project, WorkOrder, WorkOrderStatus
+from sqlalchemy.orm import Session
+
+from src.core_domain_models import TimeEntry, BillOfMaterials, Resource, Workflow, Project, WorkOrder, WorkOrderStatus, \
+    BatchScheduleResult, ExpenseEntry, Material
+from src.bom_explosion import BomExplosionEngine
+from src.capacity_simulation import CapacitySimulator, PlanSnapshot, Scenario, ScenarioResult
+from src.change_feed import WORK_ORDER, WORKFLOW_STEP, ChangeFeedHub
 from src.core_services import ProductionPlanningService, InventoryManagementService, WorkflowManagementService, \
     ProjectManagementService, TimeAndExpenseService
+from src.cost_rollup import CostRollupEngine
+from src.instrumentation import Metrics
+from src.material_registry import MaterialRegistry
+from src.mrp import MaterialRequirementsPlanningService, MrpResult
+from src.reference_cache import ReadThroughCache, SharedCacheTier
+from src.repository import UnitOfWork
 
 
 class ERPSystem:
-    def __init__(self):
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 shared_cache: Optional[SharedCacheTier] = None, change_feed: Optional[ChangeFeedHub] = None,
+                 metrics: Optional[Metrics] = None):
+        self.session_factory = session_factory  # Without one, BOMs and projects live only in memory
+        self._unit_of_work: Optional[UnitOfWork] = None
+        self._ids = itertools.count(1)  # Ids of objects created without a unit of work
+        # Work order, reservation and step changes are published here when set, e.g. to the hub the API streams
+        self.change_feed = change_feed
+        self.materials = MaterialRegistry()  # Shared by BOM explosion, MRP and project costing
+        self.resources: Dict[str, Resource] = {}  # Shared with project costing for per-resource rates
         self.production_planning = ProductionPlanningService()
-        self.inventory_management = InventoryManagementService()
+        self.inventory_management = InventoryManagementService(BomExplosionEngine(self.materials), feed=change_feed)
         self.workflow_management = WorkflowManagementService()
-        self.project_management = ProjectManagementService()
+        self.project_management = ProjectManagementService(self.materials, self.resources)
         self.time_and_expense = TimeAndExpenseService()
+        self.material_planning = MaterialRequirementsPlanningService(self.inventory_management.bom_explosion)
+        self.cost_rollup = CostRollupEngine(self.materials, self.resources, ProjectManagementService.LABOR_RATE)
+        self.workflow_templates: Dict[str, Workflow] = {}
+        # Reference data read on every work order and project creation
+        self.bom_cache = ReadThroughCache(self._fetch_bom, 'bom', version=lambda bom: bom.version,
+                                          shared=shared_cache, value_type=BillOfMaterials)
+        self.material_cache = ReadThroughCache(self._fetch_material, 'material', shared=shared_cache,
+                                               value_type=Material)
+        self.workflow_template_cache = ReadThroughCache(self.workflow_templates.get, 'workflow_template',
+                                                        shared=shared_cache, value_type=Workflow)
+        # Service calls and create_work_order stages are timed when enabled
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        if metrics is not None:
+            for prefix in ('production_planning', 'inventory_management', 'workflow_management',
+                           'project_management', 'time_and_expense', 'material_planning', 'cost_rollup'):
+                self.metrics.instrument(getattr(self, prefix), prefix)
 
     def create_work_order(self, bom_id: str, quantity: int, start_date: datetime) -> Optional[WorkOrder]:
         """
         Create and schedule a new work order.
         """
-        # Get BOM and check material availability
-        bom = self._get_bom(bom_id)
-        if not self.inventory_management.check_material_availability(bom, quantity):
-            return None
-
-        # Create work order
-        work_order = WorkOrder(
-            id=str(uuid.uuid4()),
-            bom_id=bom_id,
-            status=WorkOrderStatus.PLANNED,
-            quantity=quantity,
-            start_date=start_date,
-            end_date=self._calculate_end_date(bom, quantity, start_date),
-            assigned_resources=[],
-            actual_labor_hours=Decimal('0'),
-            actual_material_usage={}
-        )
+        with self.metrics.span('create_work_order'):
+            # Get BOM and atomically check and reserve materials
+            with self.metrics.span('get_bom'):
+                bom = self._get_bom(bom_id)
+            work_order_id = self._new_id(WorkOrder)
+            with self.metrics.span('reserve_materials'):
+                if not self.inventory_management.try_reserve_materials(bom, quantity, work_order_id):
+                    return None
 
-        # Schedule resources
-        available_resources = self._get_available_resources(work_order.start_date, work_order.end_date)
-        if not self.production_planning.schedule_work_order(work_order, available_resources):
-            return None
+            # Any failure from here on must hand the reserved stock back
+            work_order = None
+            try:
+                # Create work order
+                with self.metrics.span('calculate_end_date'):
+                    end_date = self._calculate_end_date(bom, quantity, start_date)
+                work_order = WorkOrder(
+                    id=work_order_id,
+                    bom_id=bom_id,
+                    status=WorkOrderStatus.PLANNED,
+                    quantity=quantity,
+                    start_date=start_date,
+                    end_date=end_date,
+                    assigned_resources=[],
+                    actual_labor_hours=Decimal('0'),
+                    actual_material_usage={}
+                )
 
-        # Reserve materials
-        self.inventory_management.reserve_materials(bom, quantity)
+                # Schedule resources
+                with self.metrics.span('schedule_resources'):
+                    resources = self._select_resources(bom, work_order)
+                    if resources is None or not self.production_planning.schedule_work_order(work_order, resources):
+                        self.inventory_management.release_work_orders([work_order_id])
+                        return None
 
-        return work_order
+                with self.metrics.span('publish'):
+                    self._publish(WORK_ORDER, 'scheduled', {'id': work_order.id, 'bom_id': bom_id,
+                                                            'status': work_order.status.value,
+                                                            'start_date': work_order.start_date,
+                                                            'end_date': work_order.end_date})
+                if self._unit_of_work is not None:
+                    self._unit_of_work.add(work_order)
+            except Exception:
+                if work_order is not None:
+                    self.production_planning.release_work_order(work_order)
+                self.inventory_management.release_work_orders([work_order_id])
+                raise
+            return work_order
+
+    def schedule_backlog(self, work_orders: List[WorkOrder]) -> BatchScheduleResult:
+        """
+        Assign resources and time slots to a whole backlog of work orders at once.
+        """
+        return self.production_planning.schedule_work_orders(work_orders, list(self.resources.values()))
 
     def create_project(self, name: str, description: str, start_date: datetime, workflow_template_id: str) -> Project:
         """
-        Create a new project with associated workflow.
+        Create a new project running its own copy of a workflow template.
         """
         workflow_template = self._get_workflow_template(workflow_template_id)
 
         project = Project(
-            id=str(uuid.uuid4()),
+            id=self._new_id(Project),
             name=name,
             description=description,
             start_date=start_date,
-            end_date=start_date + timedelta(days=workflow_template.total_estimated_duration),
+            end_date=start_date,
             work_orders=[],
             assigned_workflow=None,
             budget=Decimal('0'),
@@ -67,6 +132,10 @@ class ERPSystem:
         )
 
         self.workflow_management.create_workflow_instance(workflow_template, project)
+        # Step durations, and so the critical path total, are in minutes
+        project.end_date = start_date + timedelta(minutes=project.assigned_workflow.total_estimated_duration)
+        if self._unit_of_work is not None:
+            self._unit_of_work.add(project)
         return project
 
     def update_project_progress(self, project_id: str) -> Dict:
@@ -82,7 +151,7 @@ class ERPSystem:
         Log time entry for a resource.
         """
         entry = TimeEntry(
-            id=str(uuid.uuid4()),
+            id=self._new_id(TimeEntry),
             resource_id=resource_id,
             project_id=project_id,
             work_order_id=work_order_id,
@@ -91,19 +160,194 @@ class ERPSystem:
             activity_description=description
         )
         self.time_and_expense.log_time_entry(entry)
+        self.project_management.record_time_entry(entry)
+
+    def log_expense(self, project_id: str, amount: Decimal, description: str, date: datetime,
+                    category: str) -> None:
+        """
+        Log an expense entry against a project.
+        """
+        entry = ExpenseEntry(
+            id=self._new_id(ExpenseEntry),
+            project_id=project_id,
+            amount=amount,
+            description=description,
+            date=date,
+            category=category
+        )
+        self.time_and_expense.log_expense_entry(entry)
+        self.project_management.record_expense(entry)
+
+    def record_material_usage(self, project_id: str, work_order: WorkOrder, material: Material,
+                              quantity: int) -> None:
+        """
+        Record material consumed by a work order.
+        """
+        self.project_management.record_material_usage(project_id, work_order, material, quantity)
+
+    def cost_work_orders(self, work_orders: List[WorkOrder]) -> Dict[str, Decimal]:
+        """
+        Labor plus material cost of each work order, from all logged time.
+        """
+        return self.cost_rollup.rollup(work_orders, self.time_and_expense.time_entries).costs()
+
+    def simulate_capacity(self, scenarios: List[Scenario], work_orders: List[WorkOrder], horizon_start: datetime,
+                          horizon_end: datetime, workers: Optional[int] = None) -> List[ScenarioResult]:
+        """
+        Schedule a backlog under each what-if scenario without touching live resources.
+        """
+        snapshot = PlanSnapshot.capture(self.resources.values(), work_orders, horizon_start, horizon_end)
+        return CapacitySimulator(snapshot, workers).run(scenarios)
+
+    def plan_materials(self, work_orders: List[WorkOrder], horizon_start: datetime, buckets: int = 52) -> MrpResult:
+        """
+        Run MRP over open work orders, loading all of their BOMs up front.
+        """
+        self._load_boms({work_order.bom_id for work_order in work_orders})
+        return self.material_planning.run(work_orders, self.materials.materials, horizon_start, buckets=buckets)
+
+    def update_bom(self, bom: BillOfMaterials) -> None:
+        """
+        Make a BOM revision current, evicting cached copies of other versions.
+        """
+        self.inventory_management.bom_explosion.register_bom(bom)
+        self.bom_cache.invalidate(bom.id, bom.version)
+
+    def update_material(self, material: Material) -> None:
+        """
+        Replace a material's master data and evict its cached copy.
+        """
+        self.materials.register(material)
+        self.material_cache.invalidate(material.id)
+
+    def register_workflow_template(self, workflow: Workflow) -> None:
+        self.workflow_templates[workflow.id] = workflow
+        self.workflow_template_cache.invalidate(workflow.id)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Hit rate and memory use of the reference data caches, for sizing them.
+        """
+        return {cache.namespace: cache.stats()
+                for cache in (self.bom_cache, self.material_cache, self.workflow_template_cache)}
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWork]:
+        """
+        Scope database access: BOMs and projects are loaded once through an
+        identity map, and all changes are written in bulk when the block exits.
+        """
+        if self.session_factory is None:
+            raise RuntimeError("ERPSystem has no database session factory")
+        if self._unit_of_work is not None:
+            yield self._unit_of_work
+            return
+        with UnitOfWork(self.session_factory(), self.materials) as unit_of_work:
+            self._unit_of_work = unit_of_work
+            try:
+                yield unit_of_work
+            finally:
+                self._unit_of_work = None
+
+    def update_step_status(self, project: Project, step_id: str, completed: bool,
+                           actual_duration: Optional[int] = None) -> None:
+        """
+        Update a workflow step of a project and its progress metrics.
+        """
+        self.workflow_management.update_step_status(project, step_id, completed, actual_duration)
+        self.project_management.record_step_status(project.id, step_id, completed)
+        self._publish(WORKFLOW_STEP, 'completed' if completed else 'reopened',
+                      {'project_id': project.id, 'step_id': step_id,
+                       'total_estimated_duration': project.assigned_workflow.total_estimated_duration})
+
+    def _new_id(self, kind: type) -> str:
+        """
+        Ids are decimal strings throughout: row ids from the open unit of work,
+        or a local sequence for objects that only live in memory.
+        """
+        if self._unit_of_work is not None:
+            return self._unit_of_work.new_id(kind)
+        return str(next(self._ids))
+
+    def _publish(self, topic: str, type: str, data: dict) -> None:
+        if self.change_feed is not None:
+            self.change_feed.publish(topic, type, data)
 
     # Helper methods would be implemented here
     def _get_bom(self, bom_id: str) -> BillOfMaterials:
-        pass
+        bom = self.bom_cache.get(bom_id)
+        if bom is None:
+            raise ValueError(f"Unknown BOM {bom_id}")
+        # A copy from the shared tier may name materials this process has not seen
+        for material_id in bom.components:
+            if material_id not in self.materials:
+                material = self.material_cache.get(material_id)
+                if material is not None:
+                    self.materials.register(material)
+        self.inventory_management.bom_explosion.register_bom(bom)
+        return bom
 
-    def _calculate_end_date(self, bom: BillOfMaterials, quantity: int, start_date: datetime) -> datetime:
-        pass
+    def _fetch_bom(self, bom_id: str) -> Optional[BillOfMaterials]:
+        if self._unit_of_work is not None:
+            bom = self._unit_of_work.get_boms([bom_id]).get(bom_id)
+        else:
+            try:
+                bom = self.inventory_management.bom_explosion.bom(bom_id)
+            except ValueError:
+                return None
+        if bom is not None:
+            # Publish the components too, so workers reading the BOM from the shared tier find them
+            for material_id in bom.components:
+                self.material_cache.get(material_id)
+        return bom
 
-    def _get_available_resources(self, start_date: datetime, end_date: datetime) -> List[Resource]:
-        pass
+    def _fetch_material(self, material_id: str) -> Optional[Material]:
+        if self._unit_of_work is not None:
+            return self._unit_of_work.get_materials([material_id]).get(material_id)
+        return self.materials.get(material_id)
+
+    def _load_boms(self, bom_ids: Iterable[str]) -> None:
+        """
+        Register the given BOMs with the explosion engine, from the open unit of work if any.
+        """
+        if self._unit_of_work is None:
+            return
+        for bom in self._unit_of_work.get_boms(bom_ids).values():
+            self.inventory_management.bom_explosion.register_bom(bom)
+
+    def _calculate_end_date(self, bom: BillOfMaterials, quantity: int, start_date: datetime,
+                            resource: Optional[Resource] = None) -> datetime:
+        """
+        End of a run of `quantity` units: the BOM's labor hours per unit, or the
+        resource's throughput in units per hour if that is slower.
+        """
+        hours = bom.labor_hours * quantity
+        if resource is not None and resource.capacity_per_hour > 0:
+            hours = max(hours, Decimal(quantity) / resource.capacity_per_hour)
+        return start_date + timedelta(seconds=math.ceil(hours * 3600))
+
+    def _select_resources(self, bom: BillOfMaterials, work_order: WorkOrder) -> Optional[List[Resource]]:
+        """
+        The first registered resource free for the whole run, moving the work
+        order's end date to suit its throughput. None if every resource is busy;
+        with no resources registered at all the order is left unassigned.
+        """
+        if not self.resources:
+            return []
+        for resource in self.resources.values():
+            end_date = self._calculate_end_date(bom, work_order.quantity, work_order.start_date, resource)
+            if self.production_planning.is_resource_available(resource, work_order.start_date, end_date):
+                work_order.end_date = end_date
+                return [resource]
+        return None
 
     def _get_workflow_template(self, workflow_id: str) -> Workflow:
-        pass
+        workflow = self.workflow_template_cache.get(workflow_id)
+        if workflow is None:
+            raise ValueError(f"Unknown workflow template {workflow_id}")
+        return workflow
 
     def _get_project(self, project_id: str) -> Project:
-        pass
\ No newline at end of file
+        if self._unit_of_work is None:
+            raise ValueError(f"Unknown project {project_id}")
+        return self._unit_of_work.get_project(project_id)
\ No newline at end of file
@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.core_domain_models import Material
+
+
+class MaterialRegistry:
+    """
+    Shared catalogue of materials by id. BOM components and material usage
+    refer to materials by id and resolve them here, so each material exists
+    once however many maps mention it.
+
+    Every material also gets a dense, stable index for vector arithmetic.
+    """
+
+    def __init__(self, materials: Iterable[Material] = ()):
+        self.materials: List[Material] = []
+        self._index: Dict[str, int] = {}
+        for material in materials:
+            self.register(material)
+
+    def __len__(self) -> int:
+        return len(self.materials)
+
+    def __contains__(self, material_id: str) -> bool:
+        return material_id in self._index
+
+    def __getitem__(self, material_id: str) -> Material:
+        return self.materials[self.index(material_id)]
+
+    def get(self, material_id: str) -> Optional[Material]:
+        index = self._index.get(material_id)
+        return None if index is None else self.materials[index]
+
+    def register(self, material: Material) -> int:
+        """
+        Add or replace a material, returning its index.
+        """
+        index = self._index.get(material.id)
+        if index is None:
+            index = len(self.materials)
+            self._index[material.id] = index
+            self.materials.append(material)
+        else:
+            self.materials[index] = material
+        return index
+
+    def canonical_id(self, material_id: str) -> str:
+        """
+        The registered material's own id string, so maps keyed by material id
+        share one string per material instead of holding a copy per entry.
+        """
+        index = self._index.get(material_id)
+        return material_id if index is None else self.materials[index].id
+
+    def index(self, material_id: str) -> int:
+        index = self._index.get(material_id)
+        if index is None:
+            raise ValueError(f"Unknown material {material_id}")
+        return index
+
+    def stock_vector(self) -> np.ndarray:
+        """
+        On-hand stock of every material, indexed like `materials`.
+        """
+        return np.fromiter((material.stock_quantity for material in self.materials),
+                           dtype=np.int64, count=len(self.materials))
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+
+from src.bom_explosion import BomExplosionEngine
+from src.core_domain_models import Material, PlannedPurchaseOrder, WorkOrder, WorkOrderStatus
+
+OPEN_STATUSES = (WorkOrderStatus.PLANNED, WorkOrderStatus.IN_PROGRESS)
+
+
+@dataclass
+class MrpResult:
+    materials: List[Material]
+    bucket_starts: List[datetime]
+    bucket_length: timedelta
+    # All arrays are (material, bucket) shaped and indexed like `materials`
+    gross_requirements: np.ndarray
+    net_requirements: np.ndarray
+    projected_on_hand: np.ndarray
+    planned_order_releases: np.ndarray
+
+    def planned_purchase_orders(self) -> List[PlannedPurchaseOrder]:
+        """
+        Planned order releases as purchase orders, due lead_time_days after release.
+        """
+        rows, buckets = np.nonzero(self.planned_order_releases)
+        orders = []
+        for row, bucket in zip(rows.tolist(), buckets.tolist()):
+            material = self.materials[row]
+            release_date = self.bucket_starts[bucket]
+            orders.append(PlannedPurchaseOrder(
+                material_id=material.id,
+                quantity=int(self.planned_order_releases[row, bucket]),
+                release_date=release_date,
+                due_date=release_date + timedelta(days=material.lead_time_days),
+            ))
+        return orders
+
+
+class MaterialRequirementsPlanningService:
+    def __init__(self, bom_explosion: BomExplosionEngine):
+        self.bom_explosion = bom_explosion
+
+    def run(self, work_orders: List[WorkOrder], materials: List[Material], horizon_start: datetime,
+            buckets: int = 52, bucket_length: timedelta = timedelta(weeks=1)) -> MrpResult:
+        """
+        Net time-phased gross requirements of open work orders against on-hand stock.
+
+        Lot-for-lot: each bucket receives exactly the quantity that keeps projected
+        on-hand at or above the reorder point, released lead_time_days earlier.
+        Releases that would fall before the horizon are due in the first bucket.
+        """
+        for material in materials:
+            self.bom_explosion.material_index(material)
+        gross = self._gross_requirements(work_orders, horizon_start, buckets, bucket_length)
+        known = self.bom_explosion.materials
+
+        on_hand = np.fromiter((m.stock_quantity for m in known), dtype=np.int64, count=len(known))
+        safety = np.fromiter((m.reorder_point for m in known), dtype=np.int64, count=len(known))
+        lead_days = np.fromiter((m.lead_time_days for m in known), dtype=np.int64, count=len(known))
+
+        # With lot-for-lot sizing the cumulative receipts are just the cumulative shortage
+        cumulative_gross = np.cumsum(gross, axis=1)
+        cumulative_shortage = np.maximum(cumulative_gross + (safety - on_hand)[:, None], 0)
+        net = np.diff(cumulative_shortage, axis=1, prepend=0)
+        projected = on_hand[:, None] + cumulative_shortage - cumulative_gross
+
+        lead_buckets = np.ceil(lead_days / (bucket_length / timedelta(days=1))).astype(np.int64)
+        rows, due_buckets = np.nonzero(net)
+        release_buckets = np.maximum(due_buckets - lead_buckets[rows], 0)
+        releases = np.zeros_like(net)
+        np.add.at(releases, (rows, release_buckets), net[rows, due_buckets])
+
+        return MrpResult(
+            materials=list(known),
+            bucket_starts=[horizon_start + bucket_length * i for i in range(buckets)],
+            bucket_length=bucket_length,
+            gross_requirements=gross,
+            net_requirements=net,
+            projected_on_hand=projected,
+            planned_order_releases=releases,
+        )
+
+    def _gross_requirements(self, work_orders: List[WorkOrder], horizon_start: datetime,
+                            buckets: int, bucket_length: timedelta) -> np.ndarray:
+        index_parts, bucket_parts, qty_parts = [], [], []
+        for work_order in work_orders:
+            if work_order.status not in OPEN_STATUSES:
+                continue
+            bucket = max((work_order.start_date - horizon_start) // bucket_length, 0)
+            if bucket >= buckets:
+                continue
+            indices, quantities = self.bom_explosion.sparse_vector(self.bom_explosion.bom(work_order.bom_id))
+            index_parts.append(indices)
+            bucket_parts.append(np.full(len(indices), bucket, dtype=np.int64))
+            qty_parts.append(quantities * work_order.quantity)
+
+        material_count = self.bom_explosion.material_count
+        if not index_parts:
+            return np.zeros((material_count, buckets), dtype=np.int64)
+        flat = np.concatenate(index_parts) * buckets + np.concatenate(bucket_parts)
+        gross = np.bincount(flat, weights=np.concatenate(qty_parts), minlength=material_count * buckets)
+        return gross.astype(np.int64).reshape(material_count, buckets)
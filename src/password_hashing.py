@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing off the event loop.
+
+    Work runs on a pool of `workers` threads (bcrypt releases the GIL), which
+    caps how many hashes run at once; further requests wait in the pool queue
+    without blocking the loop. Hashes with a cost other than `rounds` are
+    rehashed on the next successful login. With `workers=0` hashing runs
+    inline, which blocks the event loop.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, executor: Optional[Executor] = None):
+        self.rounds = rounds
+        self.workers = workers
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self._executor = executor
+        if self._executor is None and workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self.context.verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password; on success also return a new hash if the stored one
+        was made with a different work factor, else None.
+        """
+        return await self._run(self.context.verify_and_update, password, password_hash)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
@@ -0,0 +1,262 @@
+import dataclasses
+import json
+import threading
+import typing
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def encode(value) -> bytes:
+    """
+    JSON bytes of a value built from dataclasses, lists, dicts, enums, Decimals,
+    datetimes and JSON scalars. Fields declared with compare=False hold derived
+    state, like a resource's calendar, and are left out.
+    """
+    return json.dumps(_to_json(value), separators=(',', ':')).encode()
+
+
+def decode(payload: bytes, value_type: Optional[type] = None):
+    """
+    Rebuild a value from `encode` output, guided by the type it was stored as.
+    Only the declared field types are ever constructed, whatever the payload says.
+    """
+    data = json.loads(payload)
+    return data if value_type is None else _from_json(data, value_type)
+
+
+def _to_json(value) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {item.name: _to_json(getattr(value, item.name)) for item in dataclasses.fields(value) if item.compare}
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {_to_json(key): _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot encode {type(value).__name__} for the shared cache")
+
+
+def _from_json(data, hint) -> Any:
+    if data is None:
+        return None
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin is typing.Union:  # Optional[X]
+        return _from_json(data, next(arg for arg in args if arg is not type(None)))
+    if origin is list:
+        return [_from_json(item, args[0]) for item in data]
+    if origin is dict:
+        return {_from_json(key, args[0]): _from_json(item, args[1]) for key, item in data.items()}
+    if dataclasses.is_dataclass(hint):
+        hints = typing.get_type_hints(hint)
+        return hint(**{item.name: _from_json(data[item.name], hints[item.name])
+                       for item in dataclasses.fields(hint) if item.compare})
+    if hint is datetime:
+        return datetime.fromisoformat(data)
+    if isinstance(hint, type) and issubclass(hint, (Enum, Decimal)):
+        return hint(data)
+    return data
+
+
+class SharedCacheTier(ABC):
+    """
+    Second cache tier shared by every worker, e.g. Redis or memcached.
+    Values are opaque bytes; implementations may drop entries at any time.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LocalSharedTier(SharedCacheTier):
+    """
+    In-process stand-in for a shared tier, for tests and single-worker deployments.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._values.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._values[key] = value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class ReadThroughCache(Generic[T]):
+    """
+    Bounded LRU read-through cache for rarely changing reference data.
+
+    Misses go to the shared tier, if any, and then to `loader`; what is found is
+    kept locally and published to the shared tier. Entries remember the version
+    they were loaded at, so invalidating with the current version only evicts
+    stale copies. Sizes are the encoded JSON size of each value, which is also
+    what the shared tier stores; `value_type` says what to decode it back into.
+    Cached values are shared: treat them as read-only.
+
+    An invalidation while loads of the key are in flight bumps its generation, and
+    those loads are returned to their callers but not stored in either tier. The
+    generation is dropped with the last of them, so keys no longer being loaded
+    cost nothing. Invalidation reaches the local and shared tiers only; other
+    workers keep their local copies until they evict them or are told to
+    invalidate too.
+    """
+
+    def __init__(self, loader: Callable[[Hashable], Optional[T]], namespace: str, max_entries: int = 4096,
+                 max_bytes: int = 64 * 2 ** 20, version: Callable[[T], Optional[str]] = lambda value: None,
+                 shared: Optional[SharedCacheTier] = None, value_type: Optional[type] = None):
+        self.loader = loader
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = version
+        self.shared = shared
+        self.value_type = value_type
+        self._entries: 'OrderedDict[Hashable, Tuple[T, Optional[str], int]]' = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[Hashable, int] = {}  # Only for keys with loads in flight
+        self._loading: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generations.get(key, 0)
+            self._loading[key] = self._loading.get(key, 0) + 1
+
+        try:
+            payload = self.shared.get(self._shared_key(key)) if self.shared is not None else None
+            if payload is not None:
+                value = decode(payload, self.value_type)
+                with self._lock:
+                    self.shared_hits += 1
+            else:
+                value = self.loader(key)
+                if value is None:
+                    return None
+                payload = encode(value)
+                if self.shared is not None:
+                    self._publish(key, payload, generation)
+            self._store(key, value, len(payload), generation)
+            return value
+        finally:
+            self._finish_load(key)
+
+    def invalidate(self, key: Hashable, version: Optional[str] = None) -> bool:
+        """
+        Evict a key locally and from the shared tier. With `version`, a copy
+        already at that version is kept. Returns whether anything was evicted.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[1] == version:
+                return False
+            self._discard(key)
+            if key in self._loading:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self.invalidations += 1
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _publish(self, key: Hashable, payload: bytes, generation: int) -> None:
+        if not self._is_current(key, generation):
+            return
+        self.shared.set(self._shared_key(key), payload)
+        # An invalidation between the check and the set deleted the key before it was written
+        if not self._is_current(key, generation):
+            self.shared.delete(self._shared_key(key))
+
+    def _finish_load(self, key: Hashable) -> None:
+        with self._lock:
+            remaining = self._loading.pop(key) - 1
+            if remaining:
+                self._loading[key] = remaining
+            else:
+                self._generations.pop(key, None)
+
+    def _is_current(self, key: Hashable, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(key, 0) == generation
+
+    def _store(self, key: Hashable, value: T, size: int, generation: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return  # Loaded before an invalidation, so possibly stale
+            self._discard(key)
+            self._entries[key] = (value, self.version(value), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key}"
@@ -0,0 +1,409 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from src import database_models as orm
+from src.change_feed import WORK_ORDER
+from src.core_domain_models import BillOfMaterials, ExpenseEntry, Material, Project, Resource, ResourceType, \
+    TimeEntry, Workflow, WorkOrder, WorkOrderStatus
+from src.material_registry import MaterialRegistry
+
+BATCH_SIZE = 500  # Ids per IN (...) list, well under every driver's bind parameter limit
+_ZERO = Decimal('0')  # Shared by every loaded work order without logged labor
+# Table each domain type's ids are allocated from
+_MODELS = {Material: orm.Material, BillOfMaterials: orm.BillOfMaterials, Resource: orm.Resource,
+           WorkOrder: orm.WorkOrder, Project: orm.Project, TimeEntry: orm.TimeEntry, ExpenseEntry: orm.ExpenseEntry}
+
+
+# Spellings of free-form statuses stored through the API, beyond the status names themselves
+_STATUS_ALIASES = {'COMPLETE': WorkOrderStatus.COMPLETED, 'DONE': WorkOrderStatus.COMPLETED,
+                   'CANCELED': WorkOrderStatus.CANCELLED, 'STARTED': WorkOrderStatus.IN_PROGRESS}
+
+
+def _chunks(keys: List[int]) -> Iterator[List[int]]:
+    for offset in range(0, len(keys), BATCH_SIZE):
+        yield keys[offset:offset + BATCH_SIZE]
+
+
+def _key(domain_id: str) -> int:
+    """
+    Primary key of a domain id; domain objects use the decimal string of their row id.
+    """
+    try:
+        return int(domain_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Id {domain_id!r} is not a database row id") from None
+
+
+def _status(stored: str) -> WorkOrderStatus:
+    """
+    Domain status of a stored one. The API stores statuses as given, so names
+    match case-insensitively with spaces or hyphens for underscores, the usual
+    aliases are accepted, and anything else reads as planned.
+    """
+    name = stored.strip().upper().replace(' ', '_').replace('-', '_')
+    if name in WorkOrderStatus.__members__:
+        return WorkOrderStatus[name]
+    return _STATUS_ALIASES.get(name, WorkOrderStatus.PLANNED)
+
+
+def _material_row(material: Material) -> dict:
+    return {'id': _key(material.id), 'name': material.name, 'description': material.description,
+            'unit_cost': material.unit_cost, 'stock_quantity': material.stock_quantity,
+            'reorder_point': material.reorder_point, 'lead_time_days': material.lead_time_days}
+
+
+def _bom_row(bom: BillOfMaterials) -> dict:
+    return {'id': _key(bom.id), 'product_id': bom.product_id, 'version': bom.version,
+            'labor_hours': bom.labor_hours, 'notes': bom.notes}
+
+
+def _resource_row(resource: Resource) -> dict:
+    return {'id': _key(resource.id), 'name': resource.name, 'type': resource.type.value,
+            'capacity_per_hour': resource.capacity_per_hour, 'cost_per_hour': resource.cost_per_hour}
+
+
+def _work_order_row(work_order: WorkOrder, project_id: Optional[int]) -> dict:
+    return {'id': _key(work_order.id), 'bom_id': _key(work_order.bom_id), 'project_id': project_id,
+            'status': work_order.status.value, 'quantity': work_order.quantity,
+            'start_date': work_order.start_date, 'end_date': work_order.end_date,
+            'actual_labor_hours': work_order.actual_labor_hours}
+
+
+def _project_row(project: Project) -> dict:
+    workflow = project.assigned_workflow
+    return {'id': _key(project.id), 'name': project.name, 'description': project.description,
+            'start_date': project.start_date, 'end_date': project.end_date, 'budget': project.budget,
+            'actual_cost': project.actual_cost, 'workflow_id': _key(workflow.id) if workflow is not None else None}
+
+
+class UnitOfWork:
+    """
+    Maps domain objects to and from the database for one session.
+
+    Every BOM, material, resource, work order and project is loaded at most once
+    and kept in an identity map, so repeated lookups cost nothing and all callers
+    share one instance. Loads take whole id lists per query. `flush` compares
+    each loaded object with the row it came from and writes new and changed
+    objects with one executemany per table, however many there are.
+
+    Calendars, workflow steps and BOM sub-assemblies have no tables yet, so
+    loaded objects come back without them. Domain ids are row ids as strings;
+    new objects take theirs from `new_id`.
+    """
+
+    def __init__(self, session: Session, materials: Optional[MaterialRegistry] = None):
+        self.session = session
+        self.materials = materials if materials is not None else MaterialRegistry()
+        self.boms: Dict[str, BillOfMaterials] = {}
+        self.resources: Dict[str, Resource] = {}
+        self.work_orders: Dict[str, WorkOrder] = {}
+        self.projects: Dict[str, Project] = {}
+        self._loaded_materials: Set[str] = set()
+        self._new: Dict[type, list] = defaultdict(list)
+        # Rows as last read or written, to find what changed
+        self._rows: Dict[type, Dict[str, dict]] = defaultdict(dict)
+        self._components: Dict[str, Dict[str, int]] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._project_of: Dict[str, Optional[int]] = {}
+        # Status of each work order as stored, with the domain status it was read as
+        self._stored_status: Dict[str, Tuple[WorkOrderStatus, str]] = {}
+        self._next_ids: Dict[type, int] = {}
+
+    def __enter__(self) -> 'UnitOfWork':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.session.rollback()
+        self.session.close()
+
+    def commit(self) -> None:
+        self.flush()
+        self.session.commit()
+
+    def get_materials(self, material_ids: Iterable[str]) -> Dict[str, Material]:
+        """
+        Materials by id, loading those not seen yet in one query per batch.
+        """
+        material_ids = set(material_ids)
+        missing = [_key(material_id) for material_id in material_ids - self._loaded_materials]
+        table = orm.Material.__table__
+        for chunk in _chunks(missing):
+            for row in self.session.execute(select(table).where(table.c.id.in_(chunk))).mappings():
+                material = Material(id=str(row['id']), name=row['name'], description=row['description'] or '',
+                                    unit_cost=row['unit_cost'], stock_quantity=row['stock_quantity'] or 0,
+                                    reorder_point=row['reorder_point'] or 0, lead_time_days=row['lead_time_days'] or 0)
+                self._track(Material, material, _material_row(material))
+                self._loaded_materials.add(material.id)
+                self.materials.register(material)
+        return {material_id: self.materials[material_id] for material_id in material_ids
+                if material_id in self.materials}
+
+    def get_boms(self, bom_ids: Iterable[str]) -> Dict[str, BillOfMaterials]:
+        """
+        BOMs by id with their components, and every component material, in three
+        queries per batch whatever the number of BOMs.
+        """
+        bom_ids = set(bom_ids)
+        missing = [_key(bom_id) for bom_id in bom_ids - self.boms.keys()]
+        boms, entries = orm.BillOfMaterials.__table__, orm.BOMEntry.__table__
+        for chunk in _chunks(missing):
+            components: Dict[str, Dict[str, int]] = defaultdict(dict)
+            for row in self.session.execute(select(entries).where(entries.c.bom_id.in_(chunk))).mappings():
+                components[str(row['bom_id'])][str(row['material_id'])] = row['quantity']
+            self.get_materials({material_id for parts in components.values() for material_id in parts})
+            canonical_id = self.materials.canonical_id
+            for row in self.session.execute(select(boms).where(boms.c.id.in_(chunk))).mappings():
+                parts = {canonical_id(material_id): quantity
+                         for material_id, quantity in components[str(row['id'])].items()}
+                bom = BillOfMaterials(id=str(row['id']), product_id=row['product_id'], version=row['version'],
+                                      components=parts, labor_hours=row['labor_hours'], notes=row['notes'] or '')
+                self.boms[bom.id] = bom
+                self._track(BillOfMaterials, bom, _bom_row(bom))
+                self._components[bom.id] = dict(bom.components)
+        return {bom_id: self.boms[bom_id] for bom_id in bom_ids if bom_id in self.boms}
+
+    def get_resources(self, resource_ids: Optional[Iterable[str]] = None) -> Dict[str, Resource]:
+        """
+        Resources by id, or all of them when no ids are given.
+        """
+        table = orm.Resource.__table__
+        if resource_ids is None:
+            queries = [select(table).where(table.c.id.not_in([_key(key) for key in self.resources]))]
+        else:
+            resource_ids = set(resource_ids)
+            queries = [select(table).where(table.c.id.in_(chunk))
+                       for chunk in _chunks([_key(key) for key in resource_ids - self.resources.keys()])]
+        for query in queries:
+            for row in self.session.execute(query).mappings():
+                resource = Resource(id=str(row['id']), name=row['name'], type=ResourceType(row['type']),
+                                    capacity_per_hour=row['capacity_per_hour'], cost_per_hour=row['cost_per_hour'],
+                                    availability_schedule={})
+                self.resources[resource.id] = resource
+                self._track(Resource, resource, _resource_row(resource))
+        if resource_ids is None:
+            return dict(self.resources)
+        return {key: self.resources[key] for key in resource_ids if key in self.resources}
+
+    def get_work_orders(self, work_order_ids: Iterable[str]) -> Dict[str, WorkOrder]:
+        """
+        Work orders by id with their material usage summed per material.
+        """
+        table = orm.WorkOrder.__table__
+        work_order_ids = set(work_order_ids)
+        for chunk in _chunks([_key(key) for key in work_order_ids - self.work_orders.keys()]):
+            self._load_work_orders(select(table).where(table.c.id.in_(chunk)))
+        return {key: self.work_orders[key] for key in work_order_ids if key in self.work_orders}
+
+    def get_project(self, project_id: str) -> Project:
+        """
+        A project with its work orders and workflow header.
+        """
+        project = self.projects.get(project_id)
+        if project is not None:
+            return project
+        projects, workflows = orm.Project.__table__, orm.Workflow.__table__
+        row = self.session.execute(
+            select(projects, workflows.c.name.label('workflow_name'),
+                   workflows.c.total_estimated_duration.label('workflow_duration'))
+            .outerjoin(workflows, projects.c.workflow_id == workflows.c.id)
+            .where(projects.c.id == _key(project_id))
+        ).mappings().first()
+        if row is None:
+            raise ValueError(f"Unknown project {project_id}")
+        orders = self._load_work_orders(
+            select(orm.WorkOrder.__table__).where(orm.WorkOrder.__table__.c.project_id == row['id']))
+        workflow = None
+        if row['workflow_id'] is not None:
+            workflow = Workflow(id=str(row['workflow_id']), name=row['workflow_name'], steps=[],
+                                total_estimated_duration=row['workflow_duration'] or 0)
+        project = Project(id=str(row['id']), name=row['name'], description=row['description'] or '',
+                          start_date=row['start_date'], end_date=row['end_date'], work_orders=orders,
+                          assigned_workflow=workflow, budget=row['budget'], actual_cost=row['actual_cost'] or 0)
+        self.projects[project.id] = project
+        self._track(Project, project, _project_row(project))
+        return project
+
+    def new_id(self, kind: type) -> str:
+        """
+        A fresh id for a new object of a domain type, allocated by the database.
+        On PostgreSQL it is taken from the id column's sequence, so the API's own
+        inserts and concurrent units of work never get the same id. Databases
+        without sequences, i.e. SQLite in tests and development, fall back to one
+        past the highest id in the table or handed out here, which is only safe
+        with a single writer.
+        """
+        if kind not in _MODELS:
+            raise ValueError(f"Cannot allocate ids for {kind.__name__}")
+        table = _MODELS[kind].__table__
+        if self.session.get_bind().dialect.name == 'postgresql':
+            sequence = func.pg_get_serial_sequence(table.name, table.c.id.name)
+            return str(self.session.execute(select(func.nextval(sequence))).scalar_one())
+        next_id = self._next_ids.get(kind)
+        if next_id is None:
+            highest = self.session.execute(select(func.max(table.c.id))).scalar() or 0
+            next_id = max([highest] + [_key(entity.id) for entity in self._new[kind]]) + 1
+        self._next_ids[kind] = next_id + 1
+        return str(next_id)
+
+    def add(self, entity) -> None:
+        """
+        Register a new domain object to be inserted on the next flush.
+        """
+        maps = {Material: None, BillOfMaterials: self.boms, Resource: self.resources,
+                WorkOrder: self.work_orders, Project: self.projects}
+        if type(entity) not in maps:
+            raise ValueError(f"Cannot persist {type(entity).__name__}")
+        key = _key(entity.id)
+        if type(entity) in self._next_ids:
+            self._next_ids[type(entity)] = max(self._next_ids[type(entity)], key + 1)
+        if type(entity) is Material:
+            self.materials.register(entity)
+            self._loaded_materials.add(entity.id)
+        else:
+            maps[type(entity)][entity.id] = entity
+        self._new[type(entity)].append(entity)
+
+    def flush(self) -> None:
+        """
+        Write every new and changed object in a fixed number of bulk statements.
+        """
+        for project in self.projects.values():
+            for work_order in project.work_orders:
+                self._project_of[work_order.id] = _key(project.id)
+
+        # Parents before children so foreign keys resolve
+        self._write(orm.Material, Material, _material_row,
+                    [self.materials[material_id] for material_id in self._loaded_materials])
+        self._write(orm.BillOfMaterials, BillOfMaterials, _bom_row, self.boms.values())
+        self._write(orm.Resource, Resource, _resource_row, self.resources.values())
+        self._write(orm.Project, Project, _project_row, self.projects.values())
+        self._log_work_order_changes(
+            self._write(orm.WorkOrder, WorkOrder, self._work_order_row, self.work_orders.values()))
+        self._write_components()
+        self._write_usage()
+        self._new.clear()
+
+    def _track(self, kind: type, entity, row: dict) -> None:
+        self._rows[kind][entity.id] = row
+
+    def _write(self, model, kind: type, to_row, entities: Iterable) -> List[Tuple[dict, Optional[dict]]]:
+        """
+        Insert new and update changed rows; returns each written row with the
+        row it replaced, or None for inserts.
+        """
+        snapshots = self._rows[kind]
+        new_ids = {entity.id for entity in self._new[kind]}
+        inserts, updates, written = [], [], []
+        for entity in entities:
+            row = to_row(entity)
+            if entity.id in new_ids:
+                inserts.append(row)
+            elif snapshots.get(entity.id) != row:
+                updates.append(row)
+            else:
+                continue
+            written.append((row, snapshots.get(entity.id) if entity.id not in new_ids else None))
+            snapshots[entity.id] = row
+        if inserts:
+            self.session.execute(insert(model), inserts)
+        if updates:
+            self.session.execute(update(model), updates)
+        return written
+
+    def _work_order_row(self, work_order: WorkOrder) -> dict:
+        row = _work_order_row(work_order, self._project_of.get(work_order.id))
+        stored = self._stored_status.get(work_order.id)
+        if stored is not None and stored[0] is work_order.status:
+            row['status'] = stored[1]  # Unchanged, so keep the stored spelling
+        return row
+
+    def _log_work_order_changes(self, written: List[Tuple[dict, Optional[dict]]]) -> None:
+        """
+        Bulk writes bypass the ORM's work order listeners, so log status
+        transitions for the rollups here, and queue the change events the API
+        publishes once the session commits.
+        """
+        transitions, events, now = [], self.session.info.setdefault('change_feed', []), datetime.utcnow()
+        for row, previous in written:
+            if previous is not None and previous['status'] == row['status']:
+                continue
+            from_status = previous['status'] if previous is not None else None
+            transitions.append({'work_order_id': row['id'], 'from_status': from_status, 'to_status': row['status'],
+                                'at': now})
+            data = {'id': row['id'], 'project_id': row['project_id'], 'status': row['status']}
+            if previous is None:
+                events.append((WORK_ORDER, 'created', data))
+            else:
+                events.append((WORK_ORDER, 'status_changed', {**data, 'previous_status': from_status}))
+            self._stored_status[str(row['id'])] = (WorkOrderStatus(row['status']), row['status'])
+        if transitions:
+            self.session.execute(insert(orm.WorkOrderTransition), transitions)
+
+    def _write_components(self) -> None:
+        changed = [bom for bom in self.boms.values() if self._components.get(bom.id) != bom.components]
+        if not changed:
+            return
+        entries = orm.BOMEntry.__table__
+        replaced = [_key(bom.id) for bom in changed if bom.id in self._components]
+        for chunk in _chunks(replaced):
+            self.session.execute(delete(entries).where(entries.c.bom_id.in_(chunk)))
+        rows = [{'bom_id': _key(bom.id), 'material_id': _key(material_id), 'quantity': quantity}
+                for bom in changed for material_id, quantity in bom.components.items()]
+        if rows:
+            self.session.execute(insert(entries), rows)
+        for bom in changed:
+            self._components[bom.id] = dict(bom.components)
+
+    def _write_usage(self) -> None:
+        """
+        Usage is an append-only log, so growth in a work order's totals is
+        written as new rows for the difference.
+        """
+        rows = []
+        for work_order in self.work_orders.values():
+            recorded = self._usage.get(work_order.id, {})
+            for material_id, quantity in work_order.actual_material_usage.items():
+                delta = quantity - recorded.get(material_id, 0)
+                if delta:
+                    rows.append({'work_order_id': _key(work_order.id), 'material_id': _key(material_id),
+                                 'quantity_used': delta})
+            self._usage[work_order.id] = dict(work_order.actual_material_usage)
+        if rows:
+            self.session.execute(insert(orm.MaterialUsage.__table__), rows)
+
+    def _load_work_orders(self, query) -> List[WorkOrder]:
+        rows = [row for row in self.session.execute(query).mappings()]
+        fresh = [row['id'] for row in rows if str(row['id']) not in self.work_orders]
+        usage: Dict[str, Dict[str, int]] = defaultdict(dict)
+        table = orm.MaterialUsage.__table__
+        for chunk in _chunks(fresh):
+            totals = self.session.execute(
+                select(table.c.work_order_id, table.c.material_id, func.sum(table.c.quantity_used))
+                .where(table.c.work_order_id.in_(chunk))
+                .group_by(table.c.work_order_id, table.c.material_id))
+            for work_order_id, material_id, quantity in totals:
+                usage[str(work_order_id)][self.materials.canonical_id(str(material_id))] = int(quantity)
+        orders = []
+        for row in rows:
+            work_order = self.work_orders.get(str(row['id']))
+            if work_order is None:
+                work_order = WorkOrder(id=str(row['id']), bom_id=str(row['bom_id']),
+                                       status=_status(row['status']), quantity=row['quantity'],
+                                       start_date=row['start_date'], end_date=row['end_date'], assigned_resources=[],
+                                       actual_labor_hours=row['actual_labor_hours'] or _ZERO,
+                                       actual_material_usage=usage[str(row['id'])])
+                self.work_orders[work_order.id] = work_order
+                self._project_of[work_order.id] = row['project_id']
+                self._usage[work_order.id] = dict(work_order.actual_material_usage)
+                self._stored_status[work_order.id] = (work_order.status, row['status'])
+                self._track(WorkOrder, work_order, self._work_order_row(work_order))
+            orders.append(work_order)
+        return orders
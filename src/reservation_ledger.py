@@ -0,0 +1,189 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+
+from src.core_domain_models import Material
+from src.database_models import Material as MaterialRecord
+from src.material_registry import MaterialRegistry
+
+Requirements = List[Tuple[Material, int]]
+
+
+class MaterialReservationLedger:
+    """
+    Atomic check-and-reserve of in-memory stock.
+
+    Each material maps to one of a fixed set of lock stripes, so reservations
+    on unrelated SKUs never contend. Stripes are always taken in index order to
+    avoid deadlocks between overlapping reservations.
+
+    Keyed reservations are recorded by material id and released through the
+    material registry, so stock goes back to the current material even if its
+    master data was replaced in the meantime.
+    """
+
+    def __init__(self, materials: Optional[MaterialRegistry] = None, stripes: int = 64):
+        self.materials = materials if materials is not None else MaterialRegistry()
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._reservations: Dict[Hashable, Optional[List[Tuple[str, int]]]] = {}  # None while being reserved
+        self._reservations_lock = threading.Lock()
+
+    def try_reserve(self, requirements: Requirements, key: Optional[Hashable] = None) -> bool:
+        """
+        Reserve every requirement or none of them. Returns False if any material is short.
+        """
+        return self.reserve_many([(key, requirements)])[key]
+
+    def consume(self, requirements: Requirements) -> None:
+        """
+        Take quantities out of stock without checking availability.
+        """
+        self._adjust(requirements, -1)
+
+    def release(self, requirements: Requirements) -> None:
+        """
+        Return reserved quantities to stock.
+        """
+        self._adjust(requirements, 1)
+
+    def reserve_many(self, requests: List[Tuple[Hashable, Requirements]]) -> Dict[Hashable, bool]:
+        """
+        Reserve many independent requests under a single lock acquisition.
+        Each request is all-or-nothing; the result maps request key to success.
+        Raises ValueError, reserving nothing, if a key repeats or already holds
+        a reservation.
+        """
+        keys = [key for key, _ in requests if key is not None]
+        with self._reservations_lock:
+            taken = sorted({repr(key) for key, count in Counter(keys).items()
+                            if count > 1 or key in self._reservations})
+            if taken:
+                raise ValueError(f"Reservations already held or requested twice: {', '.join(taken)}")
+            self._reservations.update(dict.fromkeys(keys))
+            for material, _ in (item for key, requirements in requests if key is not None for item in requirements):
+                if material.id not in self.materials:
+                    self.materials.register(material)
+        results = {}
+        with self._striped(material for _, requirements in requests for material, _ in requirements):
+            for key, requirements in requests:
+                if any(material.stock_quantity < qty for material, qty in requirements):
+                    results[key] = False
+                    continue
+                for material, qty in requirements:
+                    material.stock_quantity -= qty
+                results[key] = True
+        with self._reservations_lock:
+            for key, requirements in requests:
+                if key is None:
+                    continue
+                if results[key]:
+                    self._reservations[key] = [(material.id, qty) for material, qty in requirements]
+                else:
+                    del self._reservations[key]
+        return results
+
+    def release_many(self, keys: Iterable[Hashable]) -> int:
+        """
+        Release the reservations recorded under the given keys. Returns how many were found.
+        """
+        with self._reservations_lock:
+            released = [self._reservations.pop(key) for key in keys if self._reservations.get(key) is not None]
+        self.release([(self.materials[material_id], qty)
+                      for requirements in released for material_id, qty in requirements])
+        return len(released)
+
+    def _adjust(self, requirements: Requirements, sign: int) -> None:
+        with self._striped(material for material, _ in requirements):
+            for material, qty in requirements:
+                material.stock_quantity += sign * qty
+
+    def _striped(self, materials: Iterable[Material]) -> '_StripeGuard':
+        stripes = sorted({hash(material.id) % len(self._locks) for material in materials})
+        return _StripeGuard([self._locks[stripe] for stripe in stripes])
+
+
+class _StripeGuard:
+    def __init__(self, locks: List[threading.Lock]):
+        self._locks = locks
+
+    def __enter__(self):
+        for lock in self._locks:
+            lock.acquire()
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self._locks):
+            lock.release()
+
+
+class SqlReservationLedger:
+    """
+    Database-side reservations as conditional bulk UPDATEs.
+
+    Stock is decremented with `UPDATE materials ... WHERE stock_quantity >= n`
+    so the check and the reserve happen in the same statement, without loading
+    any rows into the ORM.
+    """
+
+    def __init__(self, session: Session, batch_size: int = 500):
+        self.session = session
+        self.batch_size = batch_size
+
+    def reserve_many(self, requests: Dict[Hashable, Dict[int, int]]) -> Dict[Hashable, bool]:
+        """
+        Reserve material_id -> quantity maps, each all-or-nothing. One statement
+        covers a whole batch when every request fits; otherwise the batch is
+        retried request by request under savepoints.
+        """
+        results = {}
+        items = list(requests.items())
+        for offset in range(0, len(items), self.batch_size):
+            batch = items[offset:offset + self.batch_size]
+            combined: Dict[int, int] = defaultdict(int)
+            for _, requirements in batch:
+                for material_id, qty in requirements.items():
+                    combined[material_id] += qty
+            if self._apply_all_or_nothing(combined):
+                results.update((key, True) for key, _ in batch)
+                continue
+            for key, requirements in batch:
+                results[key] = self._apply_all_or_nothing(requirements)
+        return results
+
+    def release_many(self, requests: Iterable[Dict[int, int]]) -> None:
+        """
+        Add reserved quantities back to stock in a single statement per batch.
+        """
+        combined: Dict[int, int] = defaultdict(int)
+        for requirements in requests:
+            for material_id, qty in requirements.items():
+                combined[material_id] += qty
+        items = list(combined.items())
+        table = MaterialRecord.__table__
+        for offset in range(0, len(items), self.batch_size):
+            quantities = dict(items[offset:offset + self.batch_size])
+            delta = case(quantities, value=table.c.id)
+            self.session.execute(
+                update(table)
+                .where(table.c.id.in_(quantities))
+                .values(stock_quantity=table.c.stock_quantity + delta)
+            )
+
+    def _apply_all_or_nothing(self, requirements: Dict[int, int]) -> bool:
+        if not requirements:
+            return True
+        table = MaterialRecord.__table__
+        delta = case(requirements, value=table.c.id)
+        savepoint = self.session.begin_nested()
+        result = self.session.execute(
+            update(table)
+            .where(table.c.id.in_(requirements), table.c.stock_quantity >= delta)
+            .values(stock_quantity=table.c.stock_quantity - delta)
+        )
+        if result.rowcount != len(requirements):
+            savepoint.rollback()
+            return False
+        savepoint.commit()
+        return True
@@ -0,0 +1,202 @@
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.segment_tree import MaxSegmentTree
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(moment: datetime) -> int:
+    """
+    Convert a datetime to integer seconds since the epoch (naive UTC).
+    """
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _EPOCH) // timedelta(seconds=1)
+
+
+def from_seconds(seconds: int) -> datetime:
+    """
+    Convert integer seconds since the epoch back to a naive datetime.
+    """
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+class ResourceCalendar:
+    """
+    Free time of a resource as sorted, disjoint, half-open [start, end) intervals.
+
+    Interval bounds are kept as int64 epoch seconds in two parallel arrays so
+    range lookups are a single binary search instead of an hour-by-hour walk.
+    """
+
+    def __init__(self, intervals: Optional[List[Tuple[datetime, datetime]]] = None):
+        self._starts = array('q')
+        self._ends = array('q')
+        self._tree: Optional[MaxSegmentTree] = None  # Built on the first search, then kept up to date
+        self._shared = False  # Arrays and tree may be shared with copies; copy them before writing
+        for start, end in intervals or []:
+            self.add_availability(start, end)
+
+    @classmethod
+    def from_schedule(cls, schedule: Dict[datetime, bool],
+                      slot: timedelta = timedelta(hours=1)) -> 'ResourceCalendar':
+        """
+        Build a calendar from a legacy slot -> available mapping.
+        """
+        calendar = cls()
+        step = slot // timedelta(seconds=1)
+        for slot_start in sorted(to_seconds(moment) for moment, free in schedule.items() if free):
+            calendar._add(slot_start, slot_start + step)
+        return calendar
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Tuple[datetime, datetime]]:
+        for start, end in zip(self._starts, self._ends):
+            yield from_seconds(start), from_seconds(end)
+
+    def copy(self) -> 'ResourceCalendar':
+        """
+        Copy-on-write clone: both calendars share interval arrays and the search tree
+        until either changes.
+        """
+        clone = ResourceCalendar()
+        clone._starts, clone._ends, clone._tree = self._starts, self._ends, self._tree
+        self._shared = clone._shared = True
+        return clone
+
+    def add_availability(self, start: datetime, end: datetime) -> None:
+        """
+        Mark [start, end) as free, merging with adjacent or overlapping intervals.
+        """
+        self._add(to_seconds(start), to_seconds(end))
+
+    def book(self, start: datetime, end: datetime) -> None:
+        """
+        Remove [start, end) from the free time of the resource.
+        """
+        self._remove(to_seconds(start), to_seconds(end))
+
+    def is_available(self, start: datetime, end: datetime) -> bool:
+        """
+        Check whether the whole range [start, end) lies in a single free interval.
+        """
+        return self._covers(to_seconds(start), to_seconds(end))
+
+    def find_next_window(self, earliest: datetime, duration: timedelta) -> Optional[datetime]:
+        """
+        Return the earliest start >= earliest at which a free window of the given
+        duration begins, or None if the calendar has no such window.
+        """
+        found = self._find(to_seconds(earliest), duration // timedelta(seconds=1))
+        return None if found is None else from_seconds(found)
+
+    def free_seconds(self, start: datetime, end: datetime) -> int:
+        """
+        Total free time inside [start, end), in seconds.
+        """
+        lo, hi = to_seconds(start), to_seconds(end)
+        index = max(bisect_right(self._starts, lo) - 1, 0)
+        total = 0
+        while index < len(self._starts) and self._starts[index] < hi:
+            total += max(0, min(self._ends[index], hi) - max(self._starts[index], lo))
+            index += 1
+        return total
+
+    # The same operations in integer epoch seconds, for schedulers that avoid datetimes.
+
+    def find_window_seconds(self, earliest: int, duration: int) -> Optional[int]:
+        """
+        find_next_window with both arguments and the result in epoch seconds.
+        """
+        return self._find(earliest, duration)
+
+    def book_seconds(self, start: int, end: int) -> None:
+        """
+        book with epoch-second bounds.
+        """
+        self._remove(start, end)
+
+    def _covers(self, start: int, end: int) -> bool:
+        index = bisect_right(self._starts, start) - 1
+        return index >= 0 and self._ends[index] >= end
+
+    def _add(self, start: int, end: int) -> None:
+        if end <= start:
+            return
+        lo = bisect_right(self._ends, start - 1)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._own()
+        self._starts[lo:hi] = array('q', [start])
+        self._ends[lo:hi] = array('q', [end])
+        if self._tree is not None:
+            self._tree.replace(lo, hi, [end - start])
+
+    def _remove(self, start: int, end: int) -> None:
+        if end <= start:
+            return
+        lo = bisect_right(self._ends, start)
+        hi = bisect_right(self._starts, end - 1)
+        if lo >= hi:
+            return
+        keep_starts, keep_ends = array('q'), array('q')
+        if self._starts[lo] < start:
+            keep_starts.append(self._starts[lo])
+            keep_ends.append(start)
+        if self._ends[hi - 1] > end:
+            keep_starts.append(end)
+            keep_ends.append(self._ends[hi - 1])
+        self._own()
+        self._starts[lo:hi] = keep_starts
+        self._ends[lo:hi] = keep_ends
+        if self._tree is not None:
+            self._tree.replace(lo, hi, [keep_end - keep_start for keep_start, keep_end in zip(keep_starts, keep_ends)])
+
+    def _own(self) -> None:
+        if self._shared:
+            self._starts, self._ends = array('q', self._starts), array('q', self._ends)
+            self._tree = None if self._tree is None else self._tree.copy()
+            self._shared = False
+
+    def _find(self, earliest: int, duration: int) -> Optional[int]:
+        count = len(self._starts)
+        index = bisect_right(self._starts, earliest) - 1
+        if index >= 0 and self._ends[index] - earliest >= duration:
+            return earliest
+        index = self._first_long_enough(index + 1, duration)
+        return None if index >= count else self._starts[index]
+
+    def _first_long_enough(self, lo: int, duration: int) -> int:
+        """
+        Index of the first interval at or after lo with length >= duration, using a
+        max segment tree over interval lengths (O(log n) per query). Bookings update
+        the tree in place, so searches between bookings do not rebuild it.
+        """
+        count = len(self._starts)
+        if lo >= count:
+            return count
+        if self._tree is None:
+            self._tree = MaxSegmentTree([end - start for start, end in zip(self._starts, self._ends)], -1)
+        tree, size = self._tree.tree, self._tree.size
+        node = lo + size
+        # Climb until a right-hand subtree can hold the answer.
+        if tree[node] >= duration:
+            return lo
+        while True:
+            if node == 1:
+                return count
+            if node % 2 == 0 and tree[node + 1] >= duration:
+                node += 1
+                break
+            node //= 2
+        # Descend to the leftmost qualifying leaf.
+        while node < size:
+            node = 2 * node if tree[2 * node] >= duration else 2 * node + 1
+        return node - size
@@ -0,0 +1,70 @@
+from array import array
+from typing import Sequence
+
+import numpy as np
+
+
+class MaxSegmentTree:
+    """
+    Max segment tree over a sequence of int64 values, for the interval searches
+    of ResourceCalendar and ResourceIntervalIndex. `tree` is laid out heap-style
+    with the leaves at [size, size + count) and unused leaves set to `empty`.
+
+    `replace` mirrors a slice assignment on the underlying sequence. A change
+    that keeps the count updates the leaves and their ancestors in place; an
+    insert or delete shifts the leaves after it and recomputes only their
+    ancestors, one NumPy slice per level, so the Python work stays O(log n).
+    """
+
+    def __init__(self, values: Sequence[int], empty: int):
+        self.empty = empty
+        self._build(np.array(values, dtype=np.int64))  # A copy: an array view would pin the caller's array size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def copy(self) -> 'MaxSegmentTree':
+        clone = MaxSegmentTree.__new__(MaxSegmentTree)
+        clone.empty, clone.size, clone.count, clone.tree = self.empty, self.size, self.count, array('q', self.tree)
+        return clone
+
+    def replace(self, lo: int, hi: int, values: Sequence[int]) -> None:
+        """
+        Replace the values at [lo, hi) with `values`, like `sequence[lo:hi] = values`.
+        """
+        tree, size = self.tree, self.size
+        if len(values) == hi - lo:
+            for node, value in enumerate(values, size + lo):
+                tree[node] = value
+                node //= 2
+                while node:
+                    tree[node] = max(tree[2 * node], tree[2 * node + 1])
+                    node //= 2
+            return
+        count = self.count - (hi - lo) + len(values)
+        view = np.frombuffer(tree, dtype=np.int64)
+        leaves = view[size:size + self.count]
+        if count > size:
+            self._build(np.concatenate((leaves[:lo], np.asarray(values, dtype=np.int64), leaves[hi:])))
+            return
+        tail = leaves[hi:].copy()
+        view[size + lo:size + lo + len(values)] = values
+        view[size + lo + len(values):size + count] = tail
+        view[size + count:size + self.count] = self.empty
+        first, last = size + lo, size + max(count, self.count)
+        self.count = count
+        while first > 1:
+            first, last = first // 2, (last - 1) // 2 + 1
+            view[first:last] = np.maximum(view[2 * first:2 * last:2], view[2 * first + 1:2 * last:2])
+
+    def _build(self, leaves: np.ndarray) -> None:
+        size = 1
+        while size < max(len(leaves), 1):
+            size *= 2
+        tree = np.full(2 * size, self.empty, dtype=np.int64)
+        tree[size:size + len(leaves)] = leaves
+        level = size // 2
+        while level:
+            tree[level:2 * level] = np.maximum(tree[2 * level:4 * level:2], tree[2 * level + 1:4 * level:2])
+            level //= 2
+        self.size, self.count, self.tree = size, len(leaves), array('q', tree.tobytes())
@@ -0,0 +1,131 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src import database_models as orm
+from src.analytics_rollups import RollupRefresher, project_totals, utilisation, week_start, weekly_project_costs
+from src.database_models import create_schema
+
+MONDAY = datetime(2025, 3, 3)
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        with self.engine.begin() as connection:
+            create_schema(connection)
+        self.session = Session(self.engine)
+        self.session.add_all([
+            orm.Project(id=1, name='Line 1', start_date=MONDAY, end_date=MONDAY + timedelta(days=60),
+                        budget=Decimal('5000')),
+            orm.Project(id=2, name='Line 2', start_date=MONDAY, end_date=MONDAY + timedelta(days=30),
+                        budget=Decimal('100')),
+            orm.Resource(id=1, name='Lathe', type='MACHINE', capacity_per_hour=1, cost_per_hour=Decimal('60'),
+                         department='machining', weekly_capacity_hours=40),
+            orm.Resource(id=2, name='Mill', type='MACHINE', capacity_per_hour=1, cost_per_hour=Decimal('90'),
+                         department='machining', weekly_capacity_hours=40),
+            orm.Material(id=1, name='Bar stock', unit_cost=Decimal('2.50')),
+            orm.WorkOrder(id=1, project_id=1, status='planned', quantity=1, start_date=MONDAY,
+                          end_date=MONDAY + timedelta(days=1)),
+        ])
+        self.session.commit()
+        self.refresher = RollupRefresher(batch_size=2)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _hours(self, resource_id: int, start: datetime, hours: int, entry_id=None, project_id: int = 1):
+        self.session.add(orm.TimeEntry(id=entry_id, project_id=project_id, resource_id=resource_id, start_time=start,
+                                       end_time=start + timedelta(hours=hours)))
+
+    def test_refresh_folds_in_only_new_rows(self):
+        self._hours(1, MONDAY + timedelta(hours=8), 10)
+        self._hours(1, MONDAY + timedelta(days=7, hours=8), 5)
+        self._hours(None, MONDAY + timedelta(hours=8), 1, project_id=2)
+        self.session.add(orm.ExpenseEntry(project_id=1, amount=Decimal('40.00'), date=MONDAY + timedelta(days=2)))
+        self.session.add(orm.MaterialUsage(work_order_id=1, material_id=1, quantity_used=4,
+                                           used_at=MONDAY + timedelta(days=1)))
+        self.session.commit()
+        work_order = self.session.get(orm.WorkOrder, 1)
+        work_order.status = 'completed'  # Logged now, well after its end date
+        self.session.commit()
+
+        applied = self.refresher.refresh(self.session)
+        self.session.commit()
+        self.assertEqual(applied, {'time_entries': 3, 'material_usage': 1, 'expense_entries': 1,
+                                   'work_order_transitions': 2})
+        self.assertEqual(self.refresher.refresh(self.session)['time_entries'], 0)
+
+        line1, line2 = project_totals(self.session, now=MONDAY + timedelta(days=10))
+        self.assertEqual(line1['labor_cost'], Decimal('900.00'))
+        self.assertEqual(line1['material_cost'], Decimal('10.00'))
+        self.assertEqual(line1['total_cost'], Decimal('950.00'))
+        self.assertEqual(line1['cost_variance'], Decimal('4050.00'))
+        self.assertEqual(line1['schedule_variance'], 50)
+        self.assertEqual((line1['work_orders_completed'], line1['work_orders_late']), (1, 1))
+        self.assertEqual(line2['labor_cost'], Decimal('100.00'))  # Default rate without a resource
+        self.assertEqual(line2['budget_used'], 1.0)
+
+        first_week, = project_totals(self.session, [1], last_week=MONDAY + timedelta(days=6))
+        self.assertEqual(first_week['labor_hours'], 10)
+        weeks = weekly_project_costs(self.session, MONDAY, MONDAY + timedelta(days=7))
+        self.assertEqual([(week['week_start'], week['labor_cost']) for week in weeks],
+                         [(MONDAY, Decimal('700.00')), (MONDAY + timedelta(days=7), Decimal('300.00'))])
+
+        self._hours(1, MONDAY + timedelta(hours=20), 2)
+        self.session.commit()
+        self.assertEqual(self.refresher.refresh(self.session)['time_entries'], 1)
+        self.assertEqual(project_totals(self.session, [1])[0]['labor_cost'], Decimal('1020.00'))
+
+    def test_department_utilisation_counts_idle_capacity(self):
+        self._hours(1, MONDAY + timedelta(hours=8), 20)
+        self.session.commit()
+        self.refresher.refresh(self.session)
+        by_department, = utilisation(self.session)
+        self.assertEqual(by_department['department'], 'machining')
+        self.assertEqual(by_department['week_start'], MONDAY)
+        self.assertEqual(by_department['capacity_hours'], 80)
+        self.assertEqual(by_department['utilisation'], 0.25)
+        self.assertEqual([row['resource'] for row in utilisation(self.session, by='resource')], [1])
+        with self.assertRaises(ValueError):
+            utilisation(self.session, by='shift')
+
+    def test_rows_committing_out_of_id_order_are_picked_up(self):
+        for entry_id in (1, 2, 4):
+            self._hours(1, MONDAY, 1, entry_id=entry_id)
+        self.session.commit()
+        self.refresher.refresh(self.session, now=MONDAY)
+        mark = self.session.get(orm.RollupWatermark, 'time_entries')
+        self.assertEqual((mark.last_id, list(json.loads(mark.gaps))), (4, ['3']))
+
+        self._hours(1, MONDAY, 1, entry_id=3)
+        self._hours(1, MONDAY, 1, entry_id=6)
+        self.session.commit()
+        self.assertEqual(self.refresher.refresh(self.session, now=MONDAY)['time_entries'], 2)
+        self.assertEqual(json.loads(mark.gaps), {'5': MONDAY.isoformat()})
+        self.refresher.refresh(self.session, now=MONDAY + timedelta(hours=1))
+        self.assertEqual(json.loads(mark.gaps), {})
+        self.assertEqual(project_totals(self.session, [1])[0]['labor_hours'], 5)
+
+    def test_rebuild_matches_incremental_refresh(self):
+        for day in range(10):
+            self._hours(day % 2 + 1, MONDAY + timedelta(days=day), 3)
+            self.session.commit()
+            self.refresher.refresh(self.session)
+        incremental = self.session.execute(select(orm.ResourceWeekRollup.resource_id, orm.ResourceWeekRollup.week_start,
+                                                  orm.ResourceWeekRollup.logged_seconds)).all()
+        self.refresher.rebuild(self.session)
+        self.session.commit()
+        rebuilt = self.session.execute(select(orm.ResourceWeekRollup.resource_id, orm.ResourceWeekRollup.week_start,
+                                              orm.ResourceWeekRollup.logged_seconds)).all()
+        self.assertEqual(sorted(rebuilt), sorted(incremental))
+        self.assertEqual(week_start(datetime(2025, 3, 9, 23, 59)), MONDAY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.assignment_index import AssignmentIndex, ResourceIntervalIndex
+from src.core_domain_models import Resource, ResourceType, WorkOrder, WorkOrderStatus
+from src.core_services import ProductionPlanningService
+from src.resource_calendar import ResourceCalendar
+from src.segment_tree import MaxSegmentTree
+
+DAY = datetime(2025, 3, 3)
+
+
+def _hours(start: float, end: float):
+    return DAY + timedelta(hours=start), DAY + timedelta(hours=end)
+
+
+class TestAssignmentIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AssignmentIndex()
+        self.index.add('M1', 'WO1', *_hours(8, 10))
+        self.index.add('M1', 'WO2', *_hours(12, 16))
+        self.index.add('M2', 'WO3', *_hours(8, 18))
+
+    def test_overlapping_is_half_open_and_per_resource(self):
+        self.assertEqual(self.index.overlapping('M1', *_hours(9, 13)), ['WO1', 'WO2'])
+        self.assertEqual(self.index.overlapping('M1', *_hours(10, 12)), [])
+        self.assertEqual(self.index.overlapping('M3', *_hours(0, 24)), [])
+        self.assertTrue(self.index.remove('M1', 'WO1'))
+        self.assertEqual(self.index.overlapping('M1', *_hours(9, 13)), ['WO2'])
+        self.assertFalse(self.index.remove('M1', 'WO1'))
+
+    def test_batch_conflicts_against_index_and_each_other(self):
+        conflicts = self.index.conflicts([
+            ('M1', 'a', *_hours(10, 12)),
+            ('M1', 'b', *_hours(11, 13)),
+            ('M1', 'c', *_hours(11.5, 12)),
+            ('M2', 'd', *_hours(17, 19)),
+        ])
+        found = {(c.resource_id, c.assignment_id, c.conflicting_id): (c.overlap_start, c.overlap_end)
+                 for c in conflicts}
+        self.assertEqual(set(found), {('M1', 'b', 'WO2'), ('M1', 'b', 'a'), ('M1', 'c', 'a'), ('M1', 'c', 'b'),
+                                      ('M2', 'd', 'WO3')})
+        self.assertEqual(found[('M1', 'b', 'WO2')], _hours(12, 13))
+        self.assertEqual(found[('M2', 'd', 'WO3')], _hours(17, 18))
+        self.assertEqual(len(self.index), 3)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        index = AssignmentIndex()
+        booked = []
+        for key in range(400):
+            start = rng.randrange(0, 1000)
+            interval = (key, start, start + rng.randint(1, 40))
+            booked.append(interval)
+            index.add('M', key, *_hours(interval[1], interval[2]))
+        for _ in range(200):
+            lo = rng.randrange(0, 1000)
+            hi = lo + rng.randint(1, 60)
+            expected = sorted(key for key, start, end in booked if start < hi and end > lo)
+            self.assertEqual(sorted(index.overlapping('M', *_hours(lo, hi))), expected)
+
+    def test_queries_between_changes_update_the_tree_in_place(self):
+        rng = random.Random(5)
+        index = ResourceIntervalIndex()
+        booked = {}
+        build = unittest.mock.patch.object(MaxSegmentTree, '_build', autospec=True, side_effect=MaxSegmentTree._build)
+        with build as rebuilds:
+            for key in range(600):
+                if booked and rng.random() < 0.3:
+                    removed = rng.choice(sorted(booked))
+                    del booked[removed]
+                    self.assertTrue(index.remove(removed))
+                start = rng.randrange(0, 10000)
+                booked[key] = (start, start + rng.randint(1, 200))
+                index.add(key, *booked[key])
+                lo = rng.randrange(0, 10000)
+                hi = lo + rng.randint(1, 300)
+                self.assertEqual(sorted(index.overlapping(lo, hi)),
+                                 sorted(k for k, (start, end) in booked.items() if start < hi and end > lo))
+        self.assertLess(rebuilds.call_count, 12)  # The first query, then only when the tree outgrows its leaves
+
+
+class TestPlanningRespectsAssignments(unittest.TestCase):
+    def _resource(self) -> Resource:
+        return Resource(id='M1', name='M1', type=ResourceType.MACHINE, capacity_per_hour=Decimal('1'),
+                        cost_per_hour=Decimal('50'), availability_schedule={},
+                        calendar=ResourceCalendar([_hours(0, 24)]))
+
+    def _order(self, order_id: str, start: float, end: float) -> WorkOrder:
+        return WorkOrder(id=order_id, bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=2,
+                         start_date=_hours(start, end)[0], end_date=_hours(start, end)[1], assigned_resources=[],
+                         actual_labor_hours=Decimal('0'), actual_material_usage={})
+
+    def test_assignments_block_a_second_calendar_copy(self):
+        # Two planners holding separate calendar copies still share the assignment index
+        index = AssignmentIndex()
+        first, second = ProductionPlanningService(index), ProductionPlanningService(index)
+        self.assertTrue(first.schedule_work_order(self._order('WO1', 8, 12), [self._resource()]))
+        self.assertFalse(second.schedule_work_order(self._order('WO2', 10, 14), [self._resource()]))
+
+        result = second.schedule_work_orders([self._order('WO3', 8, 8)], [self._resource()])
+        self.assertEqual(result.scheduled[0].start_date, _hours(12, 12)[0])
+        self.assertEqual(index.overlapping('M1', *_hours(0, 24)), ['WO1', 'WO3'])
+
+    def test_release_frees_calendar_and_index(self):
+        service = ProductionPlanningService()
+        resource = self._resource()
+        order = self._order('WO1', 8, 12)
+        self.assertTrue(service.schedule_work_order(order, [resource]))
+        service.release_work_order(order)
+        self.assertTrue(service.assignments.is_free('M1', *_hours(8, 12)))
+        self.assertTrue(service.schedule_work_order(self._order('WO2', 8, 12), [resource]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from dataclasses import replace
+from decimal import Decimal
+
+from src.bom_explosion import BomExplosionEngine
+from src.core_domain_models import BillOfMaterials, Material
+from src.core_services import InventoryManagementService
+from src.material_registry import MaterialRegistry
+
+
+def _material(material_id: str, stock: int = 0) -> Material:
+    return Material(id=material_id, name=material_id, description='', unit_cost=Decimal('1.00'),
+                    stock_quantity=stock, reorder_point=0, lead_time_days=0)
+
+
+def _bom(bom_id: str, components, sub_assemblies=None, version: str = '1') -> BillOfMaterials:
+    return BillOfMaterials(id=bom_id, product_id=bom_id, version=version, components=components,
+                           labor_hours=Decimal('1'), notes='', sub_assemblies=sub_assemblies or {})
+
+
+class TestBomExplosion(unittest.TestCase):
+    def setUp(self):
+        self.screw = _material('screw', stock=100)
+        self.plate = _material('plate', stock=10)
+        self.frame = _bom('frame', {'screw': 4, 'plate': 1})
+        self.product = _bom('product', {'screw': 2}, {'frame': 2})
+        self.engine = BomExplosionEngine(MaterialRegistry([self.screw, self.plate]))
+        self.engine.register_bom(self.frame)
+
+    def test_explode_flattens_nested_assemblies(self):
+        self.assertEqual(self.engine.explode(self.product, 3), {'screw': 30, 'plate': 6})
+
+    def test_explode_many_sums_demands(self):
+        vector = self.engine.explode_many([(self.product, 1), (self.frame, 5)])
+        by_id = {material.id: int(vector[index]) for index, material in enumerate(self.engine.materials)}
+        self.assertEqual(by_id, {'screw': 30, 'plate': 7})
+
+    def test_new_child_version_evicts_parent_explosion(self):
+        self.engine.explode(self.product)
+        self.engine.register_bom(replace(self.frame, version='2', components={'screw': 1}))
+        self.assertEqual(self.engine.explode(self.product), {'screw': 4})
+
+    def test_cycle_is_rejected(self):
+        top = _bom('a', {}, {'b': 1})
+        self.engine.register_bom(_bom('b', {}, {'a': 1}))
+        with self.assertRaises(ValueError):
+            self.engine.explode(top)
+
+    def test_inventory_checks_leaf_materials(self):
+        inventory = InventoryManagementService(self.engine)
+        self.assertTrue(inventory.check_material_availability(self.product, 5))
+        self.assertFalse(inventory.check_material_availability(self.product, 6))
+        inventory.reserve_materials(self.product, 5)
+        self.assertEqual((self.screw.stock_quantity, self.plate.stock_quantity), (50, 0))
+        inventory.release_materials(self.product, 5)
+        self.assertEqual((self.screw.stock_quantity, self.plate.stock_quantity), (100, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
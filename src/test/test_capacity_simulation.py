@@ -0,0 +1,97 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.capacity_simulation import CapacitySimulator, PlanSnapshot, Scenario, _start_method, daily_windows
+from src.core_domain_models import Resource, ResourceType, WorkOrder, WorkOrderStatus
+from src.main import ERPSystem
+from src.resource_calendar import ResourceCalendar
+
+MONDAY = datetime(2025, 3, 3)
+WEEK = (MONDAY, MONDAY + timedelta(days=7))
+
+
+def _machine(resource_id: str) -> Resource:
+    day_shift = daily_windows([resource_id], MONDAY, 7, timedelta(hours=6), timedelta(hours=8))
+    return Resource(id=resource_id, name=resource_id, type=ResourceType.MACHINE, capacity_per_hour=Decimal('10'),
+                    cost_per_hour=Decimal('45.50'), availability_schedule={},
+                    calendar=ResourceCalendar([(start, end) for _, start, end in day_shift]))
+
+
+def _order(order_id: str, due_days: int) -> WorkOrder:
+    return WorkOrder(id=order_id, bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=40, start_date=MONDAY,
+                     end_date=MONDAY, assigned_resources=[], actual_labor_hours=Decimal('0'),
+                     actual_material_usage={}, due_date=MONDAY + timedelta(days=due_days))
+
+
+class TestCapacitySimulation(unittest.TestCase):
+    def setUp(self):
+        self.machines = [_machine('M1'), _machine('M2')]
+        self.orders = [_order(f"WO{i}", 5) for i in range(12)]  # 48 machine hours, 112 available a week
+        self.snapshot = PlanSnapshot.capture(self.machines, self.orders, *WEEK)
+
+    def test_scenarios_leave_live_data_untouched(self):
+        free_before = self.machines[0].calendar.free_seconds(*WEEK)
+        baseline, down = CapacitySimulator(self.snapshot, workers=0).run([
+            Scenario('baseline'),
+            Scenario('M2 down', downtime=(('M2',) + WEEK,)),
+        ])
+        self.assertEqual(self.machines[0].calendar.free_seconds(*WEEK), free_before)
+        self.assertEqual(self.orders[0].assigned_resources, [])
+        self.assertEqual(baseline.late_orders, [])
+        self.assertAlmostEqual(baseline.utilisation['M1'], 24 / 56)
+        self.assertEqual(baseline.cost, Decimal('48') * Decimal('45.50'))
+        self.assertEqual(down.utilisation['M2'], 0.0)
+        self.assertEqual(len(down.late_orders), 2)  # Ten 4h orders fill M1's first five days
+        self.assertEqual(down.cost, baseline.cost)
+
+    def test_sub_cent_rates_are_costed(self):
+        for machine in self.machines:
+            machine.cost_per_hour = Decimal('37.125')
+        result, = CapacitySimulator(PlanSnapshot.capture(self.machines, self.orders, *WEEK), workers=0).run([
+            Scenario('baseline')])
+        self.assertEqual(result.cost, Decimal('1782.00'))  # 48 hours at 37.125
+
+    def test_second_shift_recovers_lost_capacity(self):
+        second_shift = daily_windows(['M1'], MONDAY, 7, timedelta(hours=14), timedelta(hours=8))
+        result, = CapacitySimulator(self.snapshot, workers=0).run([
+            Scenario('M2 down, M1 on two shifts', downtime=(('M2',) + WEEK,), extra_time=second_shift)])
+        self.assertEqual(result.late_orders, [])
+        self.assertLess(result.finish, MONDAY + timedelta(days=3))
+
+    def test_process_pool_matches_inline(self):
+        scenarios = [Scenario(f"M1 down {day}", downtime=(('M1', MONDAY + timedelta(days=day),
+                                                            MONDAY + timedelta(days=day + 1)),))
+                     for day in range(4)]
+        inline = CapacitySimulator(self.snapshot, workers=0).run(scenarios)
+        pooled = CapacitySimulator(self.snapshot, workers=2).run(scenarios)
+        self.assertEqual([(r.name, r.utilisation, r.late_orders, r.cost) for r in pooled],
+                         [(r.name, r.utilisation, r.late_orders, r.cost) for r in inline])
+
+    def test_threaded_callers_do_not_fork(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            self.assertNotEqual(_start_method(), 'fork')
+            scenarios = [Scenario('baseline'), Scenario('M2 down', downtime=(('M2',) + WEEK,))]
+            pooled = CapacitySimulator(self.snapshot, workers=2).run(scenarios)
+        finally:
+            stop.set()
+            thread.join()
+        inline = CapacitySimulator(self.snapshot, workers=0).run(scenarios)
+        self.assertEqual([(r.name, r.utilisation, r.late_orders, r.cost) for r in pooled],
+                         [(r.name, r.utilisation, r.late_orders, r.cost) for r in inline])
+
+    def test_erp_system_simulates_its_resources(self):
+        erp = ERPSystem()
+        erp.resources.update((machine.id, machine) for machine in self.machines)
+        result, = erp.simulate_capacity([Scenario('M3 added', added_resources=(_machine('M3'),))],
+                                        self.orders, *WEEK, workers=0)
+        self.assertEqual(set(result.utilisation), {'M1', 'M2', 'M3'})
+        self.assertNotIn('M3', erp.resources)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.catalogue_store import BomStore, MaterialStore, WorkOrderStore
+from src.core_domain_models import BillOfMaterials, Material, Resource, ResourceType, WorkOrder, WorkOrderStatus
+from src.resource_calendar import to_seconds
+
+START = datetime(2025, 4, 7, 8)
+
+
+def _material(material_id: str, unit_cost: str = '1.25') -> Material:
+    return Material(id=material_id, name=f"Material {material_id}", description='steel', unit_cost=Decimal(unit_cost),
+                    stock_quantity=40, reorder_point=5, lead_time_days=3)
+
+
+class TestCatalogueStore(unittest.TestCase):
+    def setUp(self):
+        self.materials = MaterialStore()
+        for material_id in ('bolt', 'nut', 'washer'):
+            self.materials.register(_material(material_id))
+
+    def test_materials_round_trip_and_replace_in_place(self):
+        self.assertEqual(self.materials.get('nut'), _material('nut'))
+        self.assertEqual(self.materials.register(_material('nut', '0.99')), 1)
+        self.assertEqual(self.materials.get('nut').unit_cost, Decimal('0.99'))
+        self.assertEqual(self.materials.get('nut').name, 'Material nut')
+        self.assertEqual(len(self.materials), 3)
+        self.assertEqual(self.materials.stock_vector().tolist(), [40, 40, 40])
+        self.assertIsNone(self.materials.get('gear'))
+        with self.assertRaises(ValueError):
+            self.materials.register(_material('gear', '0.125'))  # Finer than a cent
+        self.assertNotIn('gear', self.materials)
+
+    def test_boms_keep_components_as_material_rows(self):
+        boms = BomStore(self.materials)
+        bom = BillOfMaterials(id='B1', product_id='P1', version='2', components={'washer': 4, 'bolt': 2},
+                              labor_hours=Decimal('1.25'), notes='', sub_assemblies={'B0': 3})
+        boms.append(bom)
+        self.assertEqual(boms.bom('B1'), bom)
+        rows, quantities = boms.components('B1')
+        self.assertEqual((rows.tolist(), quantities.tolist()), ([2, 0], [4, 2]))
+        with self.assertRaises(ValueError):
+            boms.append(bom)
+        with self.assertRaises(ValueError):
+            boms.append(BillOfMaterials(id='B2', product_id='P2', version='1', components={'gear': 1},
+                                        labor_hours=Decimal('1'), notes=''))
+        with self.assertRaises(ValueError):
+            boms.bom('B2')
+
+    def test_work_orders_round_trip(self):
+        lathe = Resource(id='R1', name='Lathe', type=ResourceType.MACHINE, capacity_per_hour=Decimal('1'),
+                         cost_per_hour=Decimal('60'), availability_schedule={})
+        orders = WorkOrderStore(self.materials, {'R1': lathe})
+        planned = WorkOrder(id='WO1', bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=3, start_date=START,
+                            end_date=START + timedelta(hours=2), assigned_resources=[], actual_labor_hours=Decimal('0'),
+                            actual_material_usage={'nut': 6})
+        started = WorkOrder(id='WO2', bom_id='B1', status=WorkOrderStatus.IN_PROGRESS, quantity=1, start_date=START,
+                            end_date=START, assigned_resources=[lathe], actual_labor_hours=Decimal('0.75'),
+                            actual_material_usage={}, priority=4, due_date=START + timedelta(days=1))
+        orders.append(planned)
+        orders.append(started)
+        self.assertEqual([orders.work_order(0), orders.work_order(1)], [planned, started])
+        boms, bom_ids, statuses, quantities, starts = orders.planning_columns()
+        self.assertEqual([bom_ids[code] for code in boms], ['B1', 'B1'])
+        self.assertEqual(list(statuses), [0, 1])
+        self.assertEqual((list(quantities), list(starts)), ([3, 1], [to_seconds(START)] * 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import unittest
+from decimal import Decimal
+
+from src.change_feed import RESERVATION, WORK_ORDER, ChangeFeedHub, ResyncRequired
+from src.core_domain_models import BillOfMaterials, Material
+from src.main import ERPSystem
+
+
+class TestChangeFeedHub(unittest.TestCase):
+    def test_replay_and_topic_filter(self):
+        async def scenario():
+            hub = ChangeFeedHub()
+            for index in range(4):
+                hub.publish(WORK_ORDER if index % 2 else RESERVATION, 'created', {'index': index})
+            replayed = hub.subscribe(after=1, topics=[WORK_ORDER])
+            live = hub.subscribe()
+            hub.publish(WORK_ORDER, 'status_changed', {'index': 4})
+            return await replayed.next_batch(0), await live.next_batch(0), hub.stats()
+
+        replayed, live, stats = asyncio.run(scenario())
+        self.assertEqual([event.data['index'] for event in replayed], [1, 3, 4])
+        self.assertEqual([event.id for event in live], [5])
+        self.assertEqual(stats['subscribers'], 2)
+
+    def test_slow_subscriber_catches_up_from_replay(self):
+        async def scenario():
+            hub = ChangeFeedHub(replay_size=8, max_queue=2)
+            slow = hub.subscribe()
+            for index in range(5):
+                hub.publish(WORK_ORDER, 'created', {'index': index})
+            caught_up = await slow.next_batch(0)
+            for index in range(5, 20):
+                hub.publish(WORK_ORDER, 'created', {'index': index})
+            with self.assertRaises(ResyncRequired):
+                await slow.next_batch(0)
+            with self.assertRaises(ResyncRequired):
+                hub.subscribe(after=3)
+            return caught_up, hub.overflows
+
+        caught_up, overflows = asyncio.run(scenario())
+        self.assertEqual([event.id for event in caught_up], [1, 2, 3, 4, 5])
+        self.assertEqual(overflows, 2)
+
+    def test_publish_from_another_thread_wakes_subscriber(self):
+        async def scenario():
+            hub = ChangeFeedHub()
+            subscription = hub.subscribe()
+            threading.Timer(0.05, hub.publish, (RESERVATION, 'reserved', {})).start()
+            return await subscription.next_batch(timeout=5)
+
+        batch = asyncio.run(scenario())
+        self.assertEqual([(event.topic, event.type) for event in batch], [(RESERVATION, 'reserved')])
+
+    def test_sse_framing(self):
+        event = ChangeFeedHub().publish(WORK_ORDER, 'status_changed', {'id': 7, 'status': 'DONE'})
+        frame = event.to_sse()
+        self.assertTrue(frame.startswith('id: 1\nevent: work_order.status_changed\ndata: {'))
+        self.assertTrue(frame.endswith('\n\n'))
+
+
+class TestDomainEvents(unittest.TestCase):
+    def test_reservations_are_published(self):
+        hub = ChangeFeedHub()
+        erp = ERPSystem(change_feed=hub)
+        bolt = Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'), stock_quantity=10,
+                        reorder_point=0, lead_time_days=0)
+        erp.update_material(bolt)
+        bom = BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                              labor_hours=Decimal('1'), notes='')
+        inventory = erp.inventory_management
+        self.assertTrue(inventory.try_reserve_materials(bom, 3, 'WO1'))
+        self.assertFalse(inventory.try_reserve_materials(bom, 3, 'WO2'))
+        inventory.release_work_orders(['WO1'])
+        self.assertEqual([(event.type, event.data.get('materials')) for event in hub._events],
+                         [('reserved', {'bolt': 6}), ('released', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
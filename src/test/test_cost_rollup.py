@@ -0,0 +1,128 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src import database_models as orm
+from src.analytics_rollups import RollupRefresher, project_totals
+from src.core_domain_models import Material, Resource, ResourceType, TimeEntry, WorkOrder, WorkOrderStatus
+from src.core_services import ProjectManagementService
+from src.cost_rollup import (
+    CostRollupEngine, divide_half_even, from_cents, labor_cost, reference_costs, to_cents, to_rate_millicents
+)
+from src.database_models import create_schema
+from src.material_registry import MaterialRegistry
+from src.resource_calendar import ResourceCalendar
+from src.time_expense_store import TimeEntryStore
+
+DAY = datetime(2025, 3, 3)
+
+
+def _resource(resource_id: str, rate: str) -> Resource:
+    return Resource(id=resource_id, name=resource_id, type=ResourceType.HUMAN, capacity_per_hour=Decimal('1'),
+                    cost_per_hour=Decimal(rate), availability_schedule={}, calendar=ResourceCalendar([]))
+
+
+def _work_order(work_order_id: str, usage=None) -> WorkOrder:
+    return WorkOrder(id=work_order_id, bom_id='B1', status=WorkOrderStatus.IN_PROGRESS, quantity=1,
+                     start_date=DAY, end_date=DAY, assigned_resources=[], actual_labor_hours=Decimal('0'),
+                     actual_material_usage=usage or {})
+
+
+def _entry(entry_id: str, resource_id: str, work_order_id: str, start: datetime, seconds: int) -> TimeEntry:
+    return TimeEntry(id=entry_id, resource_id=resource_id, project_id='P1', work_order_id=work_order_id,
+                     start_time=start, end_time=start + timedelta(seconds=seconds), activity_description='')
+
+
+class TestMoney(unittest.TestCase):
+    def test_cents_round_trip_is_exact(self):
+        self.assertEqual(to_cents(Decimal('12.34')), 1234)
+        self.assertEqual(from_cents(-5), Decimal('-0.05'))
+        with self.assertRaises(ValueError):
+            to_cents(Decimal('0.005'))
+
+    def test_rates_are_kept_to_the_millicent(self):
+        self.assertEqual(to_rate_millicents(Decimal('37.125')), 3712500)
+        self.assertEqual(to_rate_millicents(Decimal('37.1234550')), 3712346)  # Rounded half-even
+        self.assertEqual(labor_cost(3600, Decimal('37.125')), Decimal('37.12'))
+        self.assertEqual(labor_cost(3600, Decimal('37.1234550')), labor_cost(3600, Decimal('37.12346')))
+
+    def test_divide_rounds_half_to_even(self):
+        numerators = np.array([5, 15, 25, 26, 24, -5], dtype=np.int64)
+        self.assertEqual(divide_half_even(numerators, 10).tolist(), [0, 2, 2, 3, 2, 0])
+
+
+class TestCostRollup(unittest.TestCase):
+    def setUp(self):
+        self.materials = MaterialRegistry([
+            Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.35'), stock_quantity=0,
+                     reorder_point=0, lead_time_days=0)])
+        self.resources = {'welder': _resource('welder', '87.50'), 'fitter': _resource('fitter', '42.15'),
+                          'planner': _resource('planner', '37.125')}
+        self.engine = CostRollupEngine(self.materials, self.resources, Decimal('100.00'))
+
+    def test_labor_uses_exact_seconds_and_resource_rates(self):
+        store = TimeEntryStore()
+        # 22:30 to 01:15 crosses midnight: 2h45m at 87.50 plus 30m at 100.00 is 290.625, rounded half-even
+        store.append(_entry('T1', 'welder', 'WO1', DAY + timedelta(hours=22, minutes=30), 9900))
+        store.append(_entry('T2', 'temp', 'WO1', DAY, 1800))  # No known rate, billed at the default
+        store.append(_entry('T3', 'fitter', 'WO9', DAY, 3600))  # Not in the rollup
+        store.append(_entry('T4', 'planner', 'WO2', DAY, 3600))  # A sub-cent rate: 37.125 rounds to 37.12
+        rollup = self.engine.rollup([_work_order('WO1', {'bolt': 10}), _work_order('WO2')], store)
+        self.assertEqual(rollup.labor_cents.tolist(), [29062, 3712])
+        self.assertEqual(rollup.costs(), {'WO1': Decimal('294.12'), 'WO2': Decimal('37.12')})
+        self.assertEqual(rollup.total(), Decimal('331.24'))
+
+    def test_matches_decimal_reference(self):
+        rng = random.Random(11)
+        work_orders = [_work_order(f"WO{i}", {'bolt': rng.randint(0, 40)}) for i in range(200)]
+        store = TimeEntryStore()
+        for i in range(3000):
+            store.append(_entry(f"T{i}", rng.choice(['welder', 'fitter', 'planner', 'temp']), f"WO{rng.randrange(220)}",
+                                DAY + timedelta(seconds=rng.randrange(10 ** 6)), rng.randint(1, 40000)))
+        expected = reference_costs(work_orders, store, self.materials, self.resources, Decimal('100.00'))
+        self.assertEqual(self.engine.rollup(work_orders, store).costs(), expected)
+
+
+class TestLaborCostPolicy(unittest.TestCase):
+    def test_metrics_rollups_and_engine_agree(self):
+        # 50 s at 42.15/h is 0.5854...: 0.59 per entry, where rounding the 150 s total would give 1.76
+        starts = [DAY + timedelta(hours=hour) for hour in range(3)]
+        entries = [_entry(f"T{i}", '1', 'WO1', start, 50) for i, start in enumerate(starts)]
+        self.assertEqual(labor_cost(50, Decimal('42.15')), Decimal('0.59'))
+
+        resources = {'1': _resource('1', '42.15')}
+        store = TimeEntryStore()
+        metrics = ProjectManagementService(resources=resources)
+        for entry in entries:
+            store.append(entry)
+            metrics.record_time_entry(entry)
+        engine = CostRollupEngine(MaterialRegistry(), resources)
+
+        database = create_engine('sqlite://')
+        with database.begin() as connection:
+            create_schema(connection)
+        with Session(database) as session:
+            session.add_all([
+                orm.Project(id=1, name='P1', start_date=DAY, end_date=DAY, budget=Decimal('100')),
+                orm.Resource(id=1, name='fitter', type='HUMAN', capacity_per_hour=1, cost_per_hour=Decimal('42.15')),
+            ])
+            session.add_all(orm.TimeEntry(project_id=1, resource_id=1, start_time=entry.start_time,
+                                          end_time=entry.end_time) for entry in entries)
+            session.commit()
+            RollupRefresher().refresh(session)
+            session.commit()
+            rolled_up = project_totals(session, [1])[0]['labor_cost']
+        database.dispose()
+
+        self.assertEqual(metrics.get_aggregate('P1').labor_cost, Decimal('1.77'))
+        self.assertEqual(engine.rollup([_work_order('WO1')], store).costs()['WO1'], Decimal('1.77'))
+        self.assertEqual(rolled_up, Decimal('1.77'))
+
+
+if __name__ == '__main__':
+    unittest.main()
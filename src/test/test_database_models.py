@@ -0,0 +1,81 @@
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src.database_models import create_schema, maintain_partitions, partition_ddl, partitioned_tables
+
+
+class _RecordingConnection:
+    """
+    Stands in for a PostgreSQL connection: answers the catalogue and default
+    partition lookups and records every statement.
+    """
+
+    def __init__(self, existing, in_default):
+        self.dialect = postgresql.dialect()
+        self.existing = existing
+        self.in_default = in_default  # Table to months of the rows in its default partition
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql.startswith('SELECT DISTINCT'):
+            table = sql.split('FROM ')[1].removesuffix('_default')
+            return [(datetime(month.year, month.month, 1),) for month in self.in_default.get(table, ())]
+        return []
+
+    def scalar(self, statement, params):
+        return params['name'] if params['name'] in self.existing else None
+
+
+class TestSchema(unittest.TestCase):
+    def test_foreign_key_access_paths_are_indexed(self):
+        engine = create_engine('sqlite://')
+        with engine.begin() as connection:
+            create_schema(connection)
+        inspector = inspect(engine)
+        leading = {table: {tuple(index['column_names']) for index in inspector.get_indexes(table)}
+                   for table in inspector.get_table_names()}
+        self.assertIn(('resource_id', 'start_time', 'end_time'), leading['resource_assignments'])
+        self.assertIn(('work_order_id',), leading['resource_assignments'])
+        self.assertIn(('work_order_id',), leading['material_usage'])
+        self.assertIn(('status', 'start_date', 'id'), leading['work_orders'])
+        self.assertIn(('project_id', 'date'), leading['expense_entries'])
+        engine.dispose()
+
+    def test_partitioned_parents_carry_key_in_primary_key(self):
+        ddl = {table.name: str(CreateTable(table).compile(dialect=postgresql.dialect()))
+               for table in partitioned_tables()}
+        self.assertIn('PRIMARY KEY (id, start_time)', ddl['time_entries'])
+        self.assertIn('PARTITION BY RANGE (start_time)', ddl['time_entries'])
+        self.assertIn('PARTITION BY RANGE (used_at)', ddl['material_usage'])
+        self.assertIn('id SERIAL', ddl['material_usage'])
+
+    def test_monthly_partitions_cross_year_end(self):
+        statements = partition_ddl('time_entries', date(2025, 11, 20), 3)
+        self.assertEqual(len(statements), 4)
+        self.assertIn("time_entries_2025_12 PARTITION OF time_entries FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')",
+                      statements[1])
+        self.assertTrue(statements[-1].endswith('time_entries_default PARTITION OF time_entries DEFAULT'))
+
+    def test_maintenance_adds_missing_months_and_drains_the_default_partition(self):
+        connection = _RecordingConnection({'time_entries_2025_03'}, {'time_entries': [date(2026, 1, 1)]})
+        created = maintain_partitions(connection, date(2025, 3, 1), 2)
+        self.assertEqual(created, ['time_entries_2025_04', 'time_entries_2026_01',
+                                   'material_usage_2025_03', 'material_usage_2025_04'])
+        # Rows of the month leave the default partition before its own partition is created
+        create = next(i for i, sql in enumerate(connection.statements) if 'time_entries_2026_01 PARTITION OF' in sql)
+        self.assertIn('DELETE FROM time_entries_default', connection.statements[create - 1])
+        self.assertEqual(connection.statements[create + 1], 'INSERT INTO time_entries SELECT * FROM time_entries_moved')
+
+        engine = create_engine('sqlite://')
+        with engine.begin() as sqlite:
+            self.assertEqual(maintain_partitions(sqlite), [])
+        engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,65 @@
 import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.core_domain_models import BillOfMaterials, Material, Resource, ResourceType, Workflow, WorkflowStep
+from src.main import ERPSystem
+from src.resource_calendar import ResourceCalendar
+
+MONDAY = datetime(2025, 3, 3, 8)
 
 
 class TestERP(unittest.TestCase):
-    def test_erp(self):
-        self.assertTrue(False)
-        # erp_file = "path/to/erp_file.erp"
-        # data = parse_erp(erp_file)
-        # self.assertEqual(len(data), 100)
\ No newline at end of file
+    def setUp(self):
+        self.erp = ERPSystem(change_feed=None)
+        self.bolt = Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'), stock_quantity=10,
+                             reorder_point=0, lead_time_days=0)
+        self.erp.update_material(self.bolt)
+        self.erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                            labor_hours=Decimal('1'), notes=''))
+        self.lathe = Resource(id='R1', name='Lathe', type=ResourceType.MACHINE, capacity_per_hour=Decimal('4'),
+                              cost_per_hour=Decimal('60'), availability_schedule={},
+                              calendar=ResourceCalendar([(MONDAY, MONDAY + timedelta(hours=8))]))
+        self.erp.resources['R1'] = self.lathe
+        self.erp.register_workflow_template(Workflow(id='W1', name='Assembly', total_estimated_duration=0, steps=[
+            WorkflowStep(id='S1', name='Turn', description='', estimated_duration=60, required_resources=[],
+                         predecessor_steps=[]),
+            WorkflowStep(id='S2', name='Inspect', description='', estimated_duration=30, required_resources=[],
+                         predecessor_steps=['S1'])]))
+
+    def test_work_order_reserves_stock_and_books_a_resource(self):
+        work_order = self.erp.create_work_order('B1', 3, MONDAY)
+        self.assertEqual(work_order.assigned_resources, [self.lathe])
+        self.assertEqual(work_order.end_date, MONDAY + timedelta(hours=3))  # One labor hour per unit
+        bom = self.erp._get_bom('B1')
+        self.assertTrue(self.erp.inventory_management.check_material_availability(bom, 2))
+        self.assertFalse(self.erp.inventory_management.check_material_availability(bom, 3))
+
+        # The lathe is busy until 11:00, so this order fails and hands its stock back
+        self.assertIsNone(self.erp.create_work_order('B1', 1, MONDAY + timedelta(hours=1)))
+        self.assertTrue(self.erp.inventory_management.check_material_availability(bom, 2))
+
+    def test_project_costs_and_progress(self):
+        work_order = self.erp.create_work_order('B1', 3, MONDAY)
+        project = self.erp.create_project('Line 1', '', MONDAY, 'W1')
+        self.assertEqual(project.end_date, MONDAY + timedelta(minutes=90))
+
+        self.erp.log_time('R1', project.id, work_order.id, MONDAY, MONDAY + timedelta(minutes=90), 'Turning')
+        self.erp.record_material_usage(project.id, work_order, self.bolt, 6)
+        self.erp.update_step_status(project, 'S1', True, actual_duration=45)
+        self.assertEqual(self.erp.cost_work_orders([work_order]), {work_order.id: Decimal('90.60')})
+        metrics = self.erp.project_management.calculate_project_metrics(project)
+        self.assertEqual(metrics['total_cost'], Decimal('90.60'))
+        self.assertEqual(metrics['progress_percentage'], 50.0)
+        self.assertEqual(project.assigned_workflow.total_estimated_duration, 75)  # Turning took 45 minutes, not 60
+
+        # The template, and projects created from it later, are unaffected
+        template = self.erp._get_workflow_template('W1')
+        self.assertEqual((template.total_estimated_duration, template.steps[0].estimated_duration), (0, 60))
+        self.assertEqual(self.erp.create_project('Line 2', '', MONDAY, 'W1').assigned_workflow.total_estimated_duration,
+                         90)
+        self.assertEqual(project.assigned_workflow.total_estimated_duration, 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from dataclasses import replace
+
+from src.bench.factory_data import SCALES, generate
+from src.bom_explosion import BomExplosionEngine
+from src.material_registry import MaterialRegistry
+from src.workflow_engine import CriticalPathEngine
+
+TINY = replace(SCALES['small'], materials=50, boms=20, components=4, work_orders=60, time_entries=300, expenses=20)
+
+
+class TestFactoryData(unittest.TestCase):
+    def test_same_seed_same_factory(self):
+        first, second = generate(TINY, seed=3), generate(TINY, seed=3)
+        self.assertEqual(first.boms, second.boms)
+        self.assertEqual(first.work_orders, second.work_orders)
+        self.assertEqual(list(first.iter_time_entries()), list(second.iter_time_entries()))
+        self.assertNotEqual(generate(TINY, seed=4).boms, first.boms)
+
+    def test_boms_and_workflows_are_acyclic(self):
+        dataset = generate(TINY)
+        explosion = BomExplosionEngine(MaterialRegistry(dataset.materials))
+        for bom in dataset.boms:
+            explosion.register_bom(bom)
+        products = [bom for bom in dataset.boms if bom.sub_assemblies]
+        self.assertTrue(products)
+        self.assertTrue(explosion.explode(products[-1], 2))
+        for workflow in dataset.workflows:
+            depth = TINY.workflow_steps // TINY.workflow_width
+            self.assertGreaterEqual(len(CriticalPathEngine(workflow.steps).critical_path()), depth)
+
+    def test_entries_reference_the_factory(self):
+        dataset = generate(TINY)
+        work_orders = {order.id: order for order in dataset.work_orders}
+        resources = {resource.id for resource in dataset.resources}
+        for entry in dataset.time_entries:
+            self.assertIn(entry.resource_id, resources)
+            self.assertIn(work_orders[entry.work_order_id], dataset.projects[int(entry.project_id[2:])].work_orders)
+
+
+if __name__ == '__main__':
+    unittest.main()
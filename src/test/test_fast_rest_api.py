@@ -0,0 +1,472 @@
+import asyncio
+import json
+import unittest
+import unittest.mock
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src import fast_rest_api
+from src.change_feed import RESERVATION, ChangeFeedHub
+from src.core_domain_models import BillOfMaterials, Material
+from src.database_models import (
+    ExpenseEntry, MaterialUsage, Project, ResourceAssignment, TimeEntry, User, UserRole, WorkOrder, init_async_db
+)
+from src.main import ERPSystem
+from src.password_hashing import PasswordHasher
+
+
+class ApiTestCase(unittest.TestCase):
+    """
+    Runs the app against an in-memory aiosqlite database as a signed-in manager.
+    """
+
+    def setUp(self):
+        self.engine = self.run_async(init_async_db('sqlite://'))
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.user = User(username='manager', email='m@example.com', password_hash='x', role=UserRole.MANAGER)
+        self.run_async(self.add_all(self.user, Project(name='Line 1', start_date=datetime(2025, 1, 1),
+                                                       end_date=datetime(2025, 6, 1), budget=1000)))
+
+        async def get_db():
+            async with self.Session() as db:
+                yield db
+
+        fast_rest_api.app.dependency_overrides[fast_rest_api.get_db] = get_db
+        fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: self.user
+        self.client = TestClient(fast_rest_api.app)
+
+    def tearDown(self):
+        fast_rest_api.app.dependency_overrides.clear()
+        self.run_async(self.engine.dispose())
+
+    def run_async(self, awaitable):
+        return asyncio.run(awaitable)
+
+    async def add_all(self, *instances):
+        async with self.Session() as db:
+            db.add_all(instances)
+            await db.commit()
+
+    def count(self, model) -> int:
+        async def count():
+            async with self.Session() as db:
+                return await db.scalar(select(func.count()).select_from(model))
+        return self.run_async(count())
+
+
+class TestBulkTimeEntries(ApiTestCase):
+    def _entry(self, hour: int) -> dict:
+        return {'project_id': 1, 'start_time': f"2025-03-03T{hour:02d}:00:00",
+                'end_time': f"2025-03-03T{hour:02d}:45:00", 'activity_description': 'punch'}
+
+    def test_json_array_reports_row_errors(self):
+        rows = [self._entry(8), {'project_id': 1}, self._entry(9),
+                {**self._entry(10), 'end_time': '2025-03-03T09:00:00'}]
+        response = self.client.post('/time-entries/bulk', json=rows)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['inserted'], 2)
+        self.assertEqual([error['row'] for error in body['errors']], [1, 3])
+        self.assertEqual(self.count(TimeEntry), 2)
+
+    def test_ndjson_body(self):
+        payload = '\n'.join([json.dumps(self._entry(hour)) for hour in range(6, 12)] + ['{not json'])
+        response = self.client.post('/time-entries/bulk', content=payload,
+                                    headers={'Content-Type': 'application/x-ndjson'})
+        body = response.json()
+        self.assertEqual(body['inserted'], 6)
+        self.assertEqual(body['errors'][0]['row'], 6)
+        self.assertEqual(self.count(TimeEntry), 6)
+
+    def test_unknown_references_are_row_errors(self):
+        rows = [self._entry(8), {**self._entry(9), 'project_id': 99}, {**self._entry(10), 'resource_id': 7},
+                {**self._entry(11), 'work_order_id': 5, 'project_id': 98}]
+        response = self.client.post('/time-entries/bulk', json=rows)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['inserted'], 1)
+        self.assertEqual([(error['row'], len(error['errors'])) for error in body['errors']], [(1, 1), (2, 1), (3, 2)])
+        self.assertIn('project_id', body['errors'][0]['errors'][0])
+        self.assertEqual(self.count(TimeEntry), 1)
+
+    def test_reference_checks_are_chunked(self):
+        lookups = []
+
+        def record(conn, cursor, statement, parameters, *args):
+            if statement.startswith('SELECT projects.id'):
+                lookups.append(len(parameters))
+
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', record)
+        rows = [{**self._entry(8), 'project_id': project_id} for project_id in range(1, 8)]
+        with unittest.mock.patch.object(fast_rest_api, 'BATCH_SIZE', 3):
+            body = self.client.post('/time-entries/bulk', json=rows).json()
+        self.assertEqual(lookups, [3, 3, 1])
+        self.assertEqual(body['inserted'], 1)
+        self.assertEqual([error['row'] for error in body['errors']], [1, 2, 3, 4, 5, 6])
+
+    def test_non_array_body_is_rejected(self):
+        response = self.client.post('/time-entries/bulk', json={'project_id': 1})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestProjectAggregate(ApiTestCase):
+    def _add_work_orders(self, count: int):
+        work_orders = [WorkOrder(project_id=1, status='open', quantity=1, start_date=datetime(2025, 1, 1),
+                                 end_date=datetime(2025, 1, 2)) for _ in range(count)]
+        self.run_async(self.add_all(*work_orders))
+        children = []
+        for work_order in work_orders:
+            children.append(ResourceAssignment(work_order_id=work_order.id, resource_id=1,
+                                               start_time=datetime(2025, 1, 1, 8), end_time=datetime(2025, 1, 1, 16)))
+            children.append(MaterialUsage(work_order_id=work_order.id, material_id=1, quantity_used=3))
+        children.append(TimeEntry(project_id=1, start_time=datetime(2025, 1, 1, 8), end_time=datetime(2025, 1, 1, 9)))
+        children.append(ExpenseEntry(project_id=1, amount=12.5, date=datetime(2025, 1, 1)))
+        self.run_async(self.add_all(*children))
+
+    def _get_counting_queries(self, path: str):
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', count)
+        try:
+            response = self.client.get(path)
+        finally:
+            event.remove(self.engine.sync_engine, 'before_cursor_execute', count)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(statements)
+
+    def test_detail_query_count_does_not_grow_with_work_orders(self):
+        self._add_work_orders(3)
+        body, few = self._get_counting_queries('/projects/1')
+        self.assertEqual(body['work_order_count'], 3)
+        self.assertEqual(len(body['work_orders'][0]['resource_assignments']), 1)
+        self.assertEqual(body['work_orders'][0]['material_usage'][0]['quantity_used'], 3)
+
+        self._add_work_orders(200)
+        body, many = self._get_counting_queries('/projects/1')
+        self.assertEqual(body['work_order_count'], 203)
+        self.assertEqual(body['time_entry_count'], 2)
+        self.assertEqual(body['expense_total'], '25.00')
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 6)
+
+    def test_list_is_a_single_query(self):
+        self._add_work_orders(4)
+        body, queries = self._get_counting_queries('/projects/')
+        self.assertEqual(queries, 1)
+        project = body['items'][0]
+        self.assertEqual(project['work_order_count'], 4)
+        self.assertEqual(project['expense_total'], '12.50')
+        self.assertNotIn('work_orders', project)
+
+    def test_missing_project(self):
+        self.assertEqual(self.client.get('/projects/99').status_code, 404)
+
+
+class TestKeysetPagination(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Shared start dates so pages must break ties on id
+        self.run_async(self.add_all(*[
+            WorkOrder(project_id=1, status='open' if i % 3 else 'closed', quantity=1,
+                      start_date=datetime(2025, 1, 1 + i // 4), end_date=datetime(2025, 2, 1)) for i in range(40)
+        ], *[
+            TimeEntry(project_id=1, resource_id=i % 2, start_time=datetime(2025, 3, 1, 8 + i // 5),
+                      end_time=datetime(2025, 3, 1, 18)) for i in range(20)
+        ]))
+
+    def _walk(self, path: str, **params) -> list:
+        items, cursor = [], None
+        while True:
+            response = self.client.get(path, params={**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['items']), params['limit'])
+            items.extend(page['items'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return items
+
+    def test_work_orders_pages_cover_every_match_once(self):
+        items = self._walk('/work-orders/', limit=7, status='open', start_from='2025-01-03T00:00:00',
+                           start_to='2025-01-09T00:00:00')
+        expected = [i + 1 for i in range(40) if i % 3 and 8 <= i < 32]
+        self.assertEqual([item['id'] for item in items], expected)
+
+    def test_time_entries_filter_by_resource(self):
+        items = self._walk('/time-entries/', limit=3, resource_id=1, project_id=1)
+        self.assertEqual([item['id'] for item in items], list(range(2, 21, 2)))
+
+    def test_projects_page(self):
+        self.run_async(self.add_all(*[Project(name=f"P{i}", start_date=datetime(2025, 1, 1), end_date=datetime(2025, 2, 1),
+                                              budget=1) for i in range(4)]))
+        self.assertEqual([item['id'] for item in self._walk('/projects/', limit=2)], [1, 2, 3, 4, 5])
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/work-orders/', params={'cursor': 'bm9wZQ=='}).status_code, 400)
+        self.assertEqual(self.client.get('/work-orders/', params={'limit': 0}).status_code, 422)
+
+    def test_filtered_seek_uses_composite_index(self):
+        async def plan():
+            async with self.engine.connect() as connection:
+                result = await connection.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM work_orders WHERE status = 'open' "
+                    "AND (start_date, id) > ('2025-01-05', 12) ORDER BY start_date, id LIMIT 8")
+                return ' '.join(row[-1] for row in result)
+        self.assertIn('ix_work_orders_status_start_date_id', self.run_async(plan()))
+
+
+class TestResourceAssignments(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.run_async(self.add_all(ResourceAssignment(work_order_id=1, resource_id=7,
+                                                       start_time=datetime(2025, 3, 3, 8),
+                                                       end_time=datetime(2025, 3, 3, 12))))
+
+    def _row(self, resource_id: int, start: int, end: int) -> dict:
+        return {'work_order_id': 2, 'resource_id': resource_id,
+                'start_time': f"2025-03-03T{start:02d}:00:00", 'end_time': f"2025-03-03T{end:02d}:00:00"}
+
+    def test_conflicts_reject_whole_batch(self):
+        response = self.client.post('/resource-assignments/', json=[
+            self._row(7, 12, 14), self._row(7, 11, 13), self._row(8, 9, 10), self._row(7, 13, 15)])
+        self.assertEqual(response.status_code, 409)
+        conflicts = {(c['row'], c['conflicting_row'], c['conflicting_assignment_id']) for c in response.json()['detail']}
+        self.assertEqual(conflicts, {(1, None, 1), (0, 1, None), (3, 0, None)})
+        self.assertEqual(self.count(ResourceAssignment), 1)
+
+    def test_free_batch_is_stored_and_queryable(self):
+        response = self.client.post('/resource-assignments/', json=[self._row(7, 12, 14), self._row(8, 8, 12)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.count(ResourceAssignment), 3)
+        overlapping = self.client.get('/resources/7/assignments',
+                                      params={'start': '2025-03-03T11:00:00', 'end': '2025-03-03T12:30:00'})
+        self.assertEqual([(a['id'], a['end_time']) for a in overlapping.json()],
+                         [(1, '2025-03-03T12:00:00'), (response.json()[0]['id'], '2025-03-03T14:00:00')])
+
+
+class TestTokenCache(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        del fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user]
+        fast_rest_api.token_cache.clear()
+        self.admin = User(username='admin', email='a@example.com', password_hash='x', role=UserRole.ADMIN)
+        self.run_async(self.add_all(self.admin))
+
+    def _headers(self, username: str) -> dict:
+        return {'Authorization': f"Bearer {fast_rest_api.create_access_token({'sub': username})}"}
+
+    def test_repeat_requests_hit_cache_until_role_changes(self):
+        manager = self._headers('manager')
+        misses = fast_rest_api.token_cache.misses
+        self.assertEqual(self.client.get('/projects/1', headers=manager).status_code, 200)
+        self.assertEqual(self.client.get('/projects/1', headers=manager).status_code, 200)
+        self.assertEqual(fast_rest_api.token_cache.misses, misses + 1)
+        self.assertGreaterEqual(fast_rest_api.token_cache.hits, 1)
+
+        response = self.client.put(f"/users/{self.user.id}/role", json={'role': 'worker'},
+                                   headers=self._headers('admin'))
+        self.assertEqual(response.status_code, 200)
+        project = {'name': 'New', 'start_date': '2025-01-01T00:00:00', 'end_date': '2025-02-01T00:00:00',
+                   'budget': '10'}
+        self.assertEqual(self.client.post('/projects/', json=project, headers=manager).status_code, 403)
+
+    def test_rolled_back_role_change_keeps_cache(self):
+        manager = self._headers('manager')
+        self.assertEqual(self.client.get('/projects/1', headers=manager).status_code, 200)
+
+        async def demote_then_roll_back():
+            async with self.Session() as db:
+                user = await db.get(User, self.user.id)
+                user.role = UserRole.WORKER
+                await db.flush()
+                self.assertEqual(len(fast_rest_api.token_cache), 1)  # Not evicted before commit
+                await db.rollback()
+        self.run_async(demote_then_roll_back())
+        self.assertEqual(len(fast_rest_api.token_cache), 1)
+
+    def test_deleted_user_is_rejected(self):
+        manager = self._headers('manager')
+        self.assertEqual(self.client.get('/projects/1', headers=manager).status_code, 200)
+        self.assertEqual(self.client.delete(f"/users/{self.user.id}", headers=self._headers('admin')).status_code, 204)
+        self.assertEqual(self.client.get('/projects/1', headers=manager).status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.get('/projects/1', headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, 401)
+
+
+class TestLogin(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hasher = fast_rest_api.password_hasher
+        fast_rest_api.password_hasher = PasswordHasher(rounds=4, workers=2)
+        old_cost = PasswordHasher(rounds=5, workers=0)
+        self.worker = User(username='worker', email='w@example.com', role=UserRole.WORKER,
+                           password_hash=self.run_async(old_cost.hash('secret')))
+        self.run_async(self.add_all(self.worker))
+
+    def tearDown(self):
+        fast_rest_api.password_hasher.shutdown()
+        fast_rest_api.password_hasher = self.hasher
+        super().tearDown()
+
+    def _stored_hash(self) -> str:
+        async def load():
+            async with self.Session() as db:
+                return (await db.get(User, self.worker.id)).password_hash
+        return self.run_async(load())
+
+    def test_login_rehashes_old_work_factor(self):
+        response = self.client.post('/token', data={'username': 'worker', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self._stored_hash().startswith('$2b$04$'))
+        response = self.client.post('/token', data={'username': 'worker', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_wrong_password_is_rejected(self):
+        response = self.client.post('/token', data={'username': 'worker', 'password': 'guess'})
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(self._stored_hash().startswith('$2b$05$'))
+        response = self.client.post('/token', data={'username': 'nobody', 'password': 'secret'})
+        self.assertEqual(response.status_code, 401)
+
+
+class TestChangeFeed(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hub = fast_rest_api.change_feed
+        fast_rest_api.change_feed = ChangeFeedHub(replay_size=4)
+        self.run_async(self.add_all(WorkOrder(project_id=1, status='planned', quantity=1,
+                                              start_date=datetime(2025, 1, 1), end_date=datetime(2025, 1, 2))))
+
+    def tearDown(self):
+        fast_rest_api.change_feed = self.hub
+        super().tearDown()
+
+    def _events(self) -> list:
+        return [(event.type, event.data['status']) for event in fast_rest_api.change_feed._events]
+
+    def test_status_changes_publish_after_commit(self):
+        response = self.client.put('/work-orders/1/status', json={'status': 'in_progress'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._events(), [('created', 'planned'), ('status_changed', 'in_progress')])
+        self.assertEqual(fast_rest_api.change_feed._events[-1].data['previous_status'], 'planned')
+        self.assertEqual(self.client.put('/work-orders/99/status', json={'status': 'done'}).status_code, 404)
+
+    def test_stream_replays_after_cursor(self):
+        # TestClient buffers whole responses, so drive the SSE generator directly
+        self.client.put('/work-orders/1/status', json={'status': 'in_progress'})
+
+        async def frames():
+            stream = fast_rest_api._sse_events(fast_rest_api.change_feed.subscribe(after=1))
+            replayed, idle = await stream.__anext__(), await stream.__anext__()
+            await stream.aclose()
+            return replayed, idle
+
+        with unittest.mock.patch.object(fast_rest_api, 'CHANGE_FEED_HEARTBEAT_SECONDS', 0.01):
+            replayed, idle = self.run_async(frames())
+        self.assertTrue(replayed.startswith('id: 2\nevent: work_order.status_changed\n'))
+        self.assertEqual(idle, ': keepalive\n\n')
+        self.assertEqual(fast_rest_api.change_feed.stats()['subscribers'], 0)
+
+    def test_stream_carries_reservations_from_the_planning_services(self):
+        fast_rest_api.change_feed = self.hub  # The process-wide hub, which the API's ERPSystem publishes to
+        after = self.hub.last_id
+        erp = fast_rest_api.erp
+        self.assertIs(erp.change_feed, self.hub)
+        self.assertIsNone(ERPSystem().change_feed)  # Other systems publish nowhere unless given a hub
+        erp.update_material(Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'),
+                                     stock_quantity=10, reorder_point=0, lead_time_days=0))
+        erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                       labor_hours=Decimal('1'), notes=''))
+        work_order = erp.create_work_order('B1', 3, datetime(2025, 1, 6))
+
+        async def first_frame():
+            stream = fast_rest_api._sse_events(fast_rest_api.change_feed.subscribe(after, [RESERVATION]))
+            frame = await stream.__anext__()
+            await stream.aclose()
+            return frame
+
+        frame = self.run_async(first_frame())
+        self.assertTrue(frame.startswith('id: '))
+        self.assertIn('event: reservation.reserved\n', frame)
+        payload = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual((payload['work_order_id'], payload['materials']), (work_order.id, {'bolt': 6}))
+
+    def test_cursor_outside_replay_buffer_needs_resync(self):
+        for status in ('in_progress', 'done', 'planned', 'done', 'cancelled'):
+            self.client.put('/work-orders/1/status', json={'status': status})
+        self.assertEqual(self.client.get('/events', params={'after': 0}).status_code, 410)
+        self.assertEqual(self.client.get('/events', headers={'Last-Event-ID': 'x'}).status_code, 400)
+
+
+class TestMetricsEndpoint(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        fast_rest_api.metrics.reset()
+        self.admin = User(username='admin', email='a@example.com', password_hash='x', role=UserRole.ADMIN)
+        self.run_async(self.add_all(self.admin))
+
+    def tearDown(self):
+        fast_rest_api.profiler.enabled = False
+        super().tearDown()
+
+    def test_requests_are_timed_by_route_template(self):
+        self.assertEqual(self.client.get('/projects/1').status_code, 200)
+        self.assertEqual(self.client.get('/projects/99').status_code, 404)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('erp_http_request_seconds_count{method="GET",route="/projects/{project_id}",status="200"} 1',
+                      response.text)
+        self.assertIn('erp_http_request_seconds_count{method="GET",route="/projects/{project_id}",status="404"} 1',
+                      response.text)
+        self.assertIn('erp_token_cache_hits ', response.text)
+
+    def test_profile_is_opt_in(self):
+        self.assertNotIn('x-profile-id', self.client.get('/projects/1', headers={'X-Profile': '1'}).headers)
+        fast_rest_api.profiler.enabled = True
+        response = self.client.get('/projects/1', headers={'X-Profile': '1'})
+        profile_id = response.headers['x-profile-id']
+        self.assertNotIn('x-profile-id', self.client.get('/projects/1').headers)
+
+        fast_rest_api.app.dependency_overrides[fast_rest_api.get_current_user] = lambda: self.admin
+        self.assertEqual(self.client.get(f"/metrics/profiles/{profile_id}").status_code, 200)
+        self.assertEqual(self.client.get('/metrics/profiles/0').status_code, 404)
+        slowest = self.client.get('/metrics/slowest').json()
+        self.assertIn('GET /projects/{project_id}', [trace['span'] for trace in slowest])
+
+
+class TestAnalytics(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.run_async(self.add_all(
+            TimeEntry(project_id=1, start_time=datetime(2025, 1, 6, 8), end_time=datetime(2025, 1, 6, 12)),
+            ExpenseEntry(project_id=1, amount=12.5, date=datetime(2025, 1, 13))))
+
+    def test_metrics_are_read_from_refreshed_rollups(self):
+        self.assertEqual(self.client.get('/analytics/project-metrics/1').json()['total_cost'], '0')
+        self.assertEqual(self.client.post('/analytics/rollups/refresh').status_code, 403)
+        self.user.role = UserRole.ADMIN
+        response = self.client.post('/analytics/rollups/refresh')
+        self.assertEqual(response.json()['time_entries'], 1)
+
+        metrics = self.client.get('/analytics/project-metrics/1').json()
+        self.assertEqual((metrics['labor_cost'], metrics['expense_total']), ('400.00', '12.50'))
+        self.assertEqual(self.client.get('/analytics/project-metrics/99').status_code, 404)
+        portfolio = self.client.get('/analytics/portfolio', params={'first_week': '2025-01-13T00:00:00'}).json()
+        self.assertIsNotNone(portfolio['refreshed_at'])
+        self.assertEqual(portfolio['projects'][0]['total_cost'], '12.50')
+        weeks = self.client.get('/analytics/portfolio/weekly').json()
+        self.assertEqual([week['week_start'] for week in weeks], ['2025-01-06T00:00:00', '2025-01-13T00:00:00'])
+        self.assertEqual(self.client.get('/analytics/utilisation', params={'by': 'shift'}).status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
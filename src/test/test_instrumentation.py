@@ -0,0 +1,111 @@
+import time
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+
+from src.core_domain_models import BillOfMaterials, Material, Resource, ResourceType
+from src.instrumentation import Metrics, SamplingProfiler, instrument_engine
+from src.main import ERPSystem
+from src.resource_calendar import ResourceCalendar
+
+
+class TestMetrics(unittest.TestCase):
+    def test_nested_spans_attribute_time_to_stages(self):
+        metrics = Metrics(slowest=2)
+        for pause in (0.001, 0.02, 0.005):
+            with metrics.span('create_work_order'):
+                with metrics.span('reserve_materials'):
+                    time.sleep(pause)
+                with metrics.span('schedule_resources'):
+                    pass
+        slowest = metrics.slowest_traces()
+        self.assertEqual(len(slowest), 2)
+        self.assertGreaterEqual(slowest[0]['seconds'], 0.02)
+        self.assertGreaterEqual(slowest[0]['stages']['create_work_order/reserve_materials'], 0.02)
+        self.assertIn('create_work_order/schedule_resources', slowest[0]['stages'])
+        reserve = metrics.histogram('erp_span_seconds', span='create_work_order/reserve_materials')
+        self.assertEqual(reserve.count, 3)
+        self.assertGreaterEqual(reserve.quantile(0.99), 0.02)
+
+    def test_disabled_records_nothing(self):
+        metrics = Metrics(enabled=False)
+        with metrics.span('create_work_order'):
+            metrics.increment('erp_work_orders_total')
+        self.assertEqual(metrics.timed('noop')(lambda: 7)(), 7)
+        self.assertEqual(metrics.render(), '\n')
+        self.assertEqual(metrics.slowest_traces(), [])
+
+    def test_prometheus_text_format(self):
+        metrics = Metrics(buckets=(0.01, 0.1))
+        metrics.observe('erp_db_query_seconds', 0.05, operation='select', table='work"orders')
+        metrics.observe('erp_db_query_seconds', 0.5, operation='select', table='work"orders')
+        metrics.increment('erp_work_orders_total', status='rejected')
+        metrics.add_collector(lambda: {'erp_change_feed_subscribers': 3})
+        self.assertEqual(metrics.render().splitlines(), [
+            '# TYPE erp_db_query_seconds histogram',
+            'erp_db_query_seconds_bucket{operation="select",table="work\\"orders",le="0.01"} 0',
+            'erp_db_query_seconds_bucket{operation="select",table="work\\"orders",le="0.1"} 1',
+            'erp_db_query_seconds_bucket{operation="select",table="work\\"orders",le="+Inf"} 2',
+            'erp_db_query_seconds_sum{operation="select",table="work\\"orders"} 0.55',
+            'erp_db_query_seconds_count{operation="select",table="work\\"orders"} 2',
+            '# TYPE erp_work_orders_total counter',
+            'erp_work_orders_total{status="rejected"} 1',
+            '# TYPE erp_change_feed_subscribers gauge',
+            'erp_change_feed_subscribers 3',
+        ])
+
+    def test_engine_queries_are_timed_inside_spans(self):
+        metrics = Metrics()
+        engine = create_engine('sqlite://')
+        instrument_engine(engine, metrics)
+        with engine.begin() as connection:
+            connection.execute(text('CREATE TABLE work_orders (id INTEGER PRIMARY KEY)'))
+            with metrics.span('load'):
+                connection.execute(text('SELECT id FROM work_orders'))
+        self.assertEqual(metrics.histogram('erp_db_query_seconds', operation='select', table='work_orders').count, 1)
+        self.assertIn('db', metrics.slowest_traces()[0]['stages'])
+
+    def test_erp_system_times_services_and_stages(self):
+        metrics = Metrics()
+        erp = ERPSystem(metrics=metrics)
+        erp.resources['R1'] = Resource(id='R1', name='Press', type=ResourceType.MACHINE, capacity_per_hour=Decimal('4'),
+                                       cost_per_hour=Decimal('50'), availability_schedule={},
+                                       calendar=ResourceCalendar([(datetime(2025, 1, 6), datetime(2025, 1, 7))]))
+        erp.update_material(Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'),
+                                     stock_quantity=10, reorder_point=0, lead_time_days=0))
+        erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                       labor_hours=Decimal('1'), notes=''))
+        work_order = erp.create_work_order('B1', 2, datetime(2025, 1, 6, 8))
+        self.assertEqual(work_order.end_date, datetime(2025, 1, 6, 10))  # Labor hours outlast the press
+        stages = metrics.slowest_traces()[0]['stages']
+        self.assertEqual(metrics.slowest_traces()[0]['span'], 'create_work_order')
+        self.assertTrue({'create_work_order/get_bom', 'create_work_order/reserve_materials',
+                         'create_work_order/reserve_materials/inventory_management.try_reserve_materials',
+                         'create_work_order/calculate_end_date', 'create_work_order/schedule_resources'} <= set(stages))
+        self.assertIsNone(ERPSystem().metrics.span('create_work_order').__enter__())
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_collapsed_stacks_name_the_hot_function(self):
+        def spin(seconds):
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+
+        profiler = SamplingProfiler(interval=0.001, keep=1)
+        sampling = profiler.start()
+        spin(0.1)
+        first = sampling.stop()
+        second = profiler.start().stop()
+        self.assertEqual(list(profiler.profiles), [second])
+        self.assertNotIn(first, profiler.profiles)
+        sampling = profiler.start()
+        spin(0.1)
+        collapsed = profiler.collapsed(sampling.stop())
+        self.assertIn('spin (test_instrumentation.py:', collapsed.splitlines()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
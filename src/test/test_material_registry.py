@@ -0,0 +1,48 @@
+import unittest
+from dataclasses import FrozenInstanceError
+from datetime import datetime
+from decimal import Decimal
+
+from src.bom_explosion import BomExplosionEngine
+from src.core_domain_models import BillOfMaterials, Material, TimeEntry
+from src.material_registry import MaterialRegistry
+
+
+def _material(material_id: str, unit_cost: str = '1.00') -> Material:
+    return Material(id=material_id, name=material_id, description='', unit_cost=Decimal(unit_cost),
+                    stock_quantity=5, reorder_point=0, lead_time_days=0)
+
+
+class TestMaterialRegistry(unittest.TestCase):
+    def test_register_keeps_index_when_replacing(self):
+        registry = MaterialRegistry([_material('bolt'), _material('nut')])
+        self.assertEqual(registry.register(_material('nut', '2.00')), 1)
+        self.assertEqual(registry['nut'].unit_cost, Decimal('2.00'))
+        self.assertEqual(len(registry), 2)
+        self.assertIsNone(registry.get('washer'))
+        with self.assertRaises(ValueError):
+            registry.index('washer')
+
+    def test_explosion_resolves_component_ids_through_shared_registry(self):
+        registry = MaterialRegistry([_material('bolt')])
+        engine = BomExplosionEngine(registry)
+        bom = BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 3},
+                              labor_hours=Decimal('1'), notes='')
+        replacement = _material('bolt', '9.99')
+        registry.register(replacement)
+        self.assertIs(engine.leaf_requirements(bom, 2)[0][0], replacement)
+        with self.assertRaises(ValueError):
+            engine.explode(BillOfMaterials(id='B2', product_id='P2', version='1', components={'ghost': 1},
+                                           labor_hours=Decimal('1'), notes=''))
+
+    def test_models_are_slotted(self):
+        self.assertFalse(hasattr(_material('bolt'), '__dict__'))
+        entry = TimeEntry(id='T1', resource_id='R1', project_id='P1', work_order_id=None,
+                          start_time=datetime(2025, 1, 1, 8), end_time=datetime(2025, 1, 1, 9),
+                          activity_description='')
+        with self.assertRaises(FrozenInstanceError):
+            entry.end_time = datetime(2025, 1, 1, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
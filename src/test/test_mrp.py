@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.bom_explosion import BomExplosionEngine
+from src.core_domain_models import BillOfMaterials, Material, WorkOrder, WorkOrderStatus
+from src.material_registry import MaterialRegistry
+from src.mrp import MaterialRequirementsPlanningService
+
+
+class TestMrp(unittest.TestCase):
+    def setUp(self):
+        self.week = datetime(2025, 1, 6)
+        self.steel = Material(id='steel', name='Steel', description='', unit_cost=Decimal('2.00'),
+                              stock_quantity=30, reorder_point=10, lead_time_days=14)
+        self.paint = Material(id='paint', name='Paint', description='', unit_cost=Decimal('1.00'),
+                              stock_quantity=5, reorder_point=0, lead_time_days=0)
+        self.bom = BillOfMaterials(id='B1', product_id='P1', version='1', components={'steel': 10},
+                                   labor_hours=Decimal('1'), notes='')
+        self.engine = BomExplosionEngine(MaterialRegistry([self.steel]))
+        self.engine.register_bom(self.bom)
+
+    def _order(self, order_id: str, week: int, quantity: int, status=WorkOrderStatus.PLANNED) -> WorkOrder:
+        return WorkOrder(id=order_id, bom_id='B1', status=status, quantity=quantity,
+                         start_date=self.week + timedelta(weeks=week), end_date=self.week,
+                         assigned_resources=[], actual_labor_hours=Decimal('0'), actual_material_usage={})
+
+    def test_netting_respects_reorder_point_and_lead_time(self):
+        orders = [self._order('WO1', 1, 1), self._order('WO2', 3, 2),
+                  self._order('WO3', 3, 5, status=WorkOrderStatus.COMPLETED)]
+        result = MaterialRequirementsPlanningService(self.engine).run(
+            orders, [self.steel, self.paint], self.week, buckets=4)
+
+        steel = result.materials.index(self.steel)
+        paint = result.materials.index(self.paint)
+        self.assertEqual(result.gross_requirements[steel].tolist(), [0, 10, 0, 20])
+        self.assertEqual(result.net_requirements[steel].tolist(), [0, 0, 0, 10])
+        self.assertEqual(result.projected_on_hand[steel].tolist(), [30, 20, 20, 10])
+        self.assertEqual(result.planned_order_releases[steel].tolist(), [0, 10, 0, 0])
+        self.assertFalse(result.gross_requirements[paint].any())
+
+        purchase_orders = result.planned_purchase_orders()
+        self.assertEqual(len(purchase_orders), 1)
+        self.assertEqual((purchase_orders[0].material_id, purchase_orders[0].quantity), ('steel', 10))
+        self.assertEqual(purchase_orders[0].release_date, self.week + timedelta(weeks=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
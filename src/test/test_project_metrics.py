@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.core_domain_models import (ExpenseEntry, Material, Project, Resource, ResourceType, TimeEntry, WorkOrder,
+                                    WorkOrderStatus, Workflow, WorkflowStep)
+from src.core_services import ProjectManagementService
+
+
+class TestProjectMetrics(unittest.TestCase):
+    def setUp(self):
+        self.start = datetime(2025, 2, 3, 8)
+        steps = [WorkflowStep(id=f"s{i}", name='', description='', estimated_duration=60,
+                              required_resources=[], predecessor_steps=[]) for i in range(4)]
+        self.work_order = WorkOrder(id='WO1', bom_id='B1', status=WorkOrderStatus.IN_PROGRESS, quantity=1,
+                                    start_date=self.start, end_date=self.start, assigned_resources=[],
+                                    actual_labor_hours=Decimal('0'), actual_material_usage={})
+        self.project = Project(id='P1', name='P', description='', start_date=self.start,
+                               end_date=self.start + timedelta(days=30), work_orders=[self.work_order],
+                               assigned_workflow=Workflow(id='W1', name='', steps=steps, total_estimated_duration=240),
+                               budget=Decimal('10000'), actual_cost=Decimal('0'))
+        self.steel = Material(id='steel', name='Steel', description='', unit_cost=Decimal('2.50'),
+                              stock_quantity=0, reorder_point=0, lead_time_days=0)
+        self.service = ProjectManagementService()
+
+    def _time_entry(self, entry_id: str, minutes: int) -> TimeEntry:
+        return TimeEntry(id=entry_id, resource_id='R1', project_id='P1', work_order_id='WO1',
+                         start_time=self.start, end_time=self.start + timedelta(minutes=minutes),
+                         activity_description='')
+
+    def test_metrics_follow_logged_activity(self):
+        entries = [self._time_entry('T1', 90), self._time_entry('T2', 30)]
+        expense = ExpenseEntry(id='E1', project_id='P1', amount=Decimal('40.00'), description='',
+                               date=self.start, category='travel')
+        for entry in entries:
+            self.service.record_time_entry(entry)
+        self.service.record_expense(expense)
+        self.service.record_material_usage('P1', self.work_order, self.steel, 4)
+        self.service.record_step_status('P1', 's0', True)
+
+        metrics = self.service.calculate_project_metrics(self.project)
+        self.assertEqual(metrics['labor_hours'], Decimal('2'))
+        self.assertEqual(metrics['total_cost'], Decimal('250.00'))
+        self.assertEqual(metrics['progress_percentage'], 25.0)
+        self.assertEqual(self.work_order.actual_material_usage, {'steel': 4})
+
+        rebuilt = self.service.rebuild_project_metrics(self.project, entries, [expense], {'s0'})
+        self.assertEqual(rebuilt.total_cost, metrics['total_cost'])
+
+    def test_labor_is_costed_at_the_resource_rate(self):
+        resource = Resource(id='R1', name='R1', type=ResourceType.HUMAN, capacity_per_hour=Decimal('1'),
+                            cost_per_hour=Decimal('60.00'), availability_schedule={})
+        service = ProjectManagementService(resources={'R1': resource})
+        service.record_time_entry(self._time_entry('T1', 45))
+        self.assertEqual(service.get_aggregate('P1').labor_cost, Decimal('45.00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
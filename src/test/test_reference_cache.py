@@ -0,0 +1,143 @@
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from src.core_domain_models import BillOfMaterials, Material, Resource, ResourceType, Workflow, WorkflowStep
+from src.main import ERPSystem
+from src.reference_cache import LocalSharedTier, ReadThroughCache, SharedCacheTier, decode, encode
+
+
+def _bom(version: str) -> BillOfMaterials:
+    return BillOfMaterials(id='B1', product_id='P1', version=version, components={'bolt': 2},
+                           labor_hours=Decimal('1'), notes='')
+
+
+class TestReadThroughCache(unittest.TestCase):
+    def setUp(self):
+        self.source = {key: f"value {key}" for key in 'abcd'}
+        self.loads = []
+
+    def _load(self, key):
+        self.loads.append(key)
+        return self.source.get(key)
+
+    def test_lru_eviction_by_entries_and_bytes(self):
+        cache = ReadThroughCache(self._load, 'test', max_entries=2)
+        for key in 'abab':
+            cache.get(key)
+        cache.get('c')  # Evicts 'a', the least recently used
+        cache.get('b')
+        cache.get('a')
+        self.assertEqual(self.loads, ['a', 'b', 'c', 'a'])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (3, 4, 2))
+        self.assertGreater(stats['bytes'], 0)
+
+        small = ReadThroughCache(self._load, 'test', max_bytes=cache.stats()['bytes'] // 2)
+        for key in 'abc':
+            small.get(key)
+        self.assertEqual(len(small), 1)
+        self.assertLessEqual(small.stats()['bytes'], small.max_bytes)
+
+    def test_missing_keys_are_not_cached(self):
+        cache = ReadThroughCache(self._load, 'test')
+        self.assertIsNone(cache.get('z'))
+        self.assertIsNone(cache.get('z'))
+        self.assertEqual(self.loads, ['z', 'z'])
+
+    def test_invalidation_keeps_current_version(self):
+        boms = {'B1': _bom('1')}
+        cache = ReadThroughCache(boms.get, 'bom', version=lambda bom: bom.version)
+        self.assertEqual(cache.get('B1').version, '1')
+        self.assertFalse(cache.invalidate('B1', '1'))
+        boms['B1'] = _bom('2')
+        self.assertTrue(cache.invalidate('B1', '2'))
+        self.assertEqual(cache.get('B1').version, '2')
+
+    def test_shared_tier_serves_other_workers(self):
+        shared = LocalSharedTier()
+        first = ReadThroughCache(self._load, 'test', shared=shared)
+        second = ReadThroughCache(self._load, 'test', shared=shared)
+        self.assertEqual(first.get('a'), second.get('a'))
+        self.assertEqual(self.loads, ['a'])
+        self.assertEqual(second.stats()['shared_hits'], 1)
+        first.invalidate('a')
+        self.assertEqual(len(shared), 0)
+
+    def test_load_racing_an_invalidation_is_not_cached(self):
+        def load(key):
+            value = self._load(key)
+            if len(self.loads) == 1:
+                cache.invalidate(key)  # The source changes while the first load is in flight
+            return value
+
+        shared = LocalSharedTier()
+        cache = ReadThroughCache(load, 'test', shared=shared)
+        self.assertEqual(cache.get('a'), 'value a')  # The caller still gets what was loaded
+        self.assertEqual((len(cache), len(shared)), (0, 0))
+        cache.get('a')
+        cache.get('a')
+        self.assertEqual(self.loads, ['a', 'a'])
+        self.assertEqual((len(cache), len(shared)), (1, 1))
+        self.assertEqual((cache._generations, cache._loading), ({}, {}))
+
+    def test_invalidations_leave_no_per_key_state(self):
+        def failing(key):
+            raise KeyError(key)
+
+        cache = ReadThroughCache(self._load, 'test')
+        for key in range(1000):
+            cache.get(key)
+            cache.invalidate(key)
+        broken = ReadThroughCache(failing, 'test')
+        with self.assertRaises(KeyError):
+            broken.get('a')
+        for each in (cache, broken):
+            self.assertEqual((each._generations, each._loading), ({}, {}))
+
+    def test_shared_tier_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            SharedCacheTier()
+
+    def test_shared_tier_holds_json(self):
+        lathe = Resource(id='R1', name='Lathe', type=ResourceType.MACHINE, capacity_per_hour=Decimal('2.5'),
+                         cost_per_hour=Decimal('60'), availability_schedule={datetime(2025, 1, 6, 8): True})
+        workflow = Workflow(id='W1', name='Assembly', total_estimated_duration=90, steps=[
+            WorkflowStep(id='S1', name='Turn', description='', estimated_duration=90, required_resources=[lathe],
+                         predecessor_steps=[])])
+        payload = encode(workflow)
+        self.assertEqual(json.loads(payload)['steps'][0]['required_resources'][0]['type'], 'MACHINE')
+        copy = decode(payload, Workflow)
+        self.assertEqual(copy, workflow)
+        self.assertTrue(copy.steps[0].required_resources[0].calendar.is_available(
+            datetime(2025, 1, 6, 8), datetime(2025, 1, 6, 9)))
+
+
+class TestErpReferenceData(unittest.TestCase):
+    def test_lookups_go_through_caches(self):
+        shared = LocalSharedTier()
+        erp = ERPSystem(shared_cache=shared)
+        erp.update_material(Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'),
+                                     stock_quantity=10, reorder_point=0, lead_time_days=0))
+        erp.update_bom(_bom('1'))
+        erp.register_workflow_template(Workflow(id='W1', name='Assembly', steps=[], total_estimated_duration=0))
+        for _ in range(3):
+            erp._get_bom('B1')
+            erp._get_workflow_template('W1')
+        self.assertEqual(erp.cache_stats()['bom']['hit_rate'], 2 / 3)
+
+        erp.update_bom(_bom('2'))
+        self.assertEqual(erp._get_bom('B1').version, '2')
+        with self.assertRaises(ValueError):
+            erp._get_workflow_template('W2')
+
+        # Another worker finds the BOM and its materials in the shared tier
+        other = ERPSystem(shared_cache=shared)
+        self.assertEqual(other._get_bom('B1').version, '2')
+        self.assertEqual(other.materials['bolt'].unit_cost, Decimal('0.10'))
+        self.assertTrue(other.inventory_management.check_material_availability(other._get_bom('B1'), 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
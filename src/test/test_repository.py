@@ -0,0 +1,175 @@
+import unittest
+import unittest.mock
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, create_engine, event, func, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from src import database_models as orm
+from src.core_domain_models import Material, Workflow, WorkOrder, WorkOrderStatus
+from src.database_models import create_schema
+from src.main import ERPSystem
+from src.repository import UnitOfWork
+
+START = datetime(2025, 4, 7, 8)
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        with self.engine.begin() as connection:
+            create_schema(connection)
+        with Session(self.engine) as session:
+            session.add(orm.Workflow(id=1, name='Assembly', total_estimated_duration=240))
+            session.add(orm.Project(id=1, name='P1', start_date=START, end_date=START, budget=Decimal('1000'),
+                                    workflow_id=1))
+            session.add_all(orm.Material(id=i, name=f"M{i}", unit_cost=Decimal('1.25'), stock_quantity=10)
+                            for i in range(1, 41))
+            for bom_id in range(1, 31):
+                session.add(orm.BillOfMaterials(id=bom_id, product_id=f"P{bom_id}", version='1',
+                                                labor_hours=Decimal('2')))
+                session.add_all(orm.BOMEntry(bom_id=bom_id, material_id=(bom_id + part) % 40 + 1, quantity=part + 1)
+                                for part in range(3))
+            session.add_all(orm.WorkOrder(id=i, bom_id=i % 30 + 1, project_id=1, status='PLANNED', quantity=2,
+                                          start_date=START, end_date=START) for i in range(1, 121))
+            session.add(orm.MaterialUsage(work_order_id=1, material_id=5, quantity_used=3))
+            session.commit()
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_loads_share_instances_and_take_constant_queries(self):
+        with UnitOfWork(Session(self.engine)) as unit:
+            project = unit.get_project('1')
+            boms = unit.get_boms({work_order.bom_id for work_order in project.work_orders})
+            self.assertEqual(len(project.work_orders), 120)
+            self.assertEqual(len(boms), 30)
+            self.assertEqual(project.assigned_workflow.total_estimated_duration, 240)
+            self.assertEqual(project.work_orders[0].actual_material_usage, {'5': 3})
+            for material_id in boms['1'].components:
+                self.assertIs(material_id, unit.materials[material_id].id)
+            queries = len(self.statements)
+            self.assertLessEqual(queries, 6)
+
+            self.assertIs(unit.get_boms(['1'])['1'], boms['1'])
+            self.assertIs(unit.get_work_orders(['7'])['7'], project.work_orders[6])
+            self.assertIs(unit.materials['2'], unit.get_materials(['2'])['2'])
+            self.assertEqual(len(self.statements), queries)
+            with self.assertRaises(ValueError):
+                unit.get_project('99')
+
+    def test_flush_writes_changes_in_bulk_statements(self):
+        with UnitOfWork(Session(self.engine)) as unit:
+            project = unit.get_project('1')
+            unit.get_boms({work_order.bom_id for work_order in project.work_orders})
+            for work_order in project.work_orders:
+                work_order.status = WorkOrderStatus.IN_PROGRESS
+                usage = work_order.actual_material_usage
+                usage['5'] = usage.get('5', 0) + 1
+            unit.materials['3'].stock_quantity = 7
+            unit.boms['2'].components = {'1': 9}
+            new_order = WorkOrder(id='500', bom_id='1', status=WorkOrderStatus.PLANNED, quantity=1,
+                                  start_date=START, end_date=START, assigned_resources=[],
+                                  actual_labor_hours=Decimal('0'), actual_material_usage={})
+            unit.add(new_order)
+            project.work_orders.append(new_order)
+            unit.add(Material(id='41', name='M41', description='', unit_cost=Decimal('0.10'), stock_quantity=0,
+                              reorder_point=0, lead_time_days=0))
+            del self.statements[:]
+            unit.flush()
+            events = unit.session.info['change_feed']
+        writes = [statement for statement in self.statements if not statement.startswith(('SELECT', 'BEGIN'))]
+        self.assertLessEqual(len(writes), 9)
+        self.assertEqual(len(events), 121)
+        self.assertEqual(events[0][1:], ('status_changed', {'id': 1, 'project_id': 1, 'status': 'IN_PROGRESS',
+                                                            'previous_status': 'PLANNED'}))
+
+        with Session(self.engine) as session:
+            self.assertEqual(session.scalar(select(func.count()).where(orm.WorkOrder.status == 'IN_PROGRESS')), 120)
+            self.assertEqual(session.get(orm.WorkOrder, 500).project_id, 1)
+            self.assertEqual(session.get(orm.Material, 3).stock_quantity, 7)
+            self.assertEqual(session.get(orm.Material, 41).name, 'M41')
+            self.assertEqual([(entry.material_id, entry.quantity) for entry in session.get(orm.BillOfMaterials, 2)
+                              .components], [(1, 9)])
+            used = session.scalar(select(func.sum(orm.MaterialUsage.quantity_used))
+                                  .where(orm.MaterialUsage.work_order_id == 1))
+            self.assertEqual(used, 4)
+            transitions = select(orm.WorkOrderTransition.from_status, orm.WorkOrderTransition.to_status)
+            self.assertEqual(session.execute(transitions.where(orm.WorkOrderTransition.to_status != 'PLANNED')).all(),
+                             [('PLANNED', 'IN_PROGRESS')] * 120)
+            self.assertEqual(session.execute(transitions.where(orm.WorkOrderTransition.work_order_id == 500)).all(),
+                             [(None, 'PLANNED')])
+
+    def test_free_form_statuses_load_and_keep_their_spelling(self):
+        with Session(self.engine) as session:
+            session.execute(update(orm.WorkOrder).where(orm.WorkOrder.id <= 3)
+                            .values(status=case((orm.WorkOrder.id == 1, 'completed'), (orm.WorkOrder.id == 2, 'done'),
+                                                else_='on hold')))
+            session.commit()
+        with UnitOfWork(Session(self.engine)) as unit:
+            first, second, third = unit.get_project('1').work_orders[:3]
+            self.assertEqual([first.status, second.status, third.status],
+                             [WorkOrderStatus.COMPLETED, WorkOrderStatus.COMPLETED, WorkOrderStatus.PLANNED])
+            first.quantity = 5
+            third.status = WorkOrderStatus.IN_PROGRESS
+        with Session(self.engine) as session:
+            self.assertEqual([session.get(orm.WorkOrder, i).status for i in (1, 2, 3)],
+                             ['completed', 'done', 'IN_PROGRESS'])
+            self.assertEqual(session.execute(select(orm.WorkOrderTransition.from_status)
+                                             .where(orm.WorkOrderTransition.from_status.is_not(None))).scalars().all(),
+                             ['on hold'])
+
+    def test_unchanged_objects_are_not_written(self):
+        with UnitOfWork(Session(self.engine)) as unit:
+            unit.get_project('1')
+            unit.get_resources()
+            del self.statements[:]
+        self.assertFalse([statement for statement in self.statements if statement.startswith(('INSERT', 'UPDATE'))])
+
+    def test_erp_system_plans_from_the_database(self):
+        erp = ERPSystem(lambda: Session(self.engine))
+        with erp.unit_of_work() as unit:
+            work_orders = unit.get_project('1').work_orders
+            result = erp.plan_materials(work_orders, START, buckets=4)
+            self.assertIs(erp._get_bom('3'), unit.boms['3'])
+        self.assertTrue(result.planned_purchase_orders())
+        self.assertEqual(len([statement for statement in self.statements if statement.startswith('SELECT')]), 6)
+        with self.assertRaises(ValueError):
+            erp.update_project_progress('1')
+
+    def test_created_objects_get_row_ids_and_are_flushed(self):
+        erp = ERPSystem(lambda: Session(self.engine))
+        erp.register_workflow_template(Workflow(id='1', name='Assembly', steps=[], total_estimated_duration=0))
+        with erp.unit_of_work():
+            work_order = erp.create_work_order('1', 2, START)
+            project = erp.create_project('P2', '', START, '1')
+        self.assertEqual((work_order.id, project.id), ('121', '2'))
+        with Session(self.engine) as session:
+            self.assertEqual(session.get(orm.WorkOrder, 121).bom_id, 1)
+            self.assertEqual(session.get(orm.Project, 2).workflow_id, 1)
+
+    def test_ids_come_from_the_sequence_on_postgresql(self):
+        session = unittest.mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+        session.execute.return_value.scalar_one.side_effect = [41, 42]
+        unit = UnitOfWork(session)
+        self.assertEqual([unit.new_id(WorkOrder), unit.new_id(WorkOrder)], ['41', '42'])
+        statement = session.execute.call_args[0][0].compile(dialect=postgresql.dialect())
+        self.assertIn('nextval(pg_get_serial_sequence(', str(statement))
+        self.assertEqual(sorted(statement.params.values()), ['id', 'work_orders'])
+
+    def test_rejects_ids_that_are_not_row_ids(self):
+        unit = UnitOfWork(Session(self.engine))
+        with self.assertRaises(ValueError):
+            unit.add(Material(id='bolt', name='bolt', description='', unit_cost=Decimal('1'), stock_quantity=0,
+                              reorder_point=0, lead_time_days=0))
+        unit.session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
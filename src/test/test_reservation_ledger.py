@@ -0,0 +1,117 @@
+import threading
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.core_domain_models import BillOfMaterials, Material
+from src.database_models import Material as MaterialRecord
+from src.main import ERPSystem
+from src.reservation_ledger import MaterialReservationLedger, SqlReservationLedger
+
+
+def _material(material_id: str, stock: int) -> Material:
+    return Material(id=material_id, name=material_id, description='', unit_cost=Decimal('1.00'),
+                    stock_quantity=stock, reorder_point=0, lead_time_days=0)
+
+
+class TestMaterialReservationLedger(unittest.TestCase):
+    def test_concurrent_reservations_never_oversell(self):
+        bolt, nut = _material('bolt', 1000), _material('nut', 500)
+        ledger = MaterialReservationLedger(stripes=4)
+        granted = []
+
+        def worker():
+            for _ in range(100):
+                if ledger.try_reserve([(bolt, 2), (nut, 1)]):
+                    granted.append(1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(granted), 500)
+        self.assertEqual((bolt.stock_quantity, nut.stock_quantity), (0, 0))
+
+    def test_bulk_reserve_is_all_or_nothing_per_order(self):
+        bolt, nut = _material('bolt', 10), _material('nut', 3)
+        ledger = MaterialReservationLedger()
+        results = ledger.reserve_many([('WO1', [(bolt, 5), (nut, 2)]), ('WO2', [(bolt, 5), (nut, 2)])])
+        self.assertEqual(results, {'WO1': True, 'WO2': False})
+        self.assertEqual((bolt.stock_quantity, nut.stock_quantity), (5, 1))
+
+        self.assertEqual(ledger.release_many(['WO1', 'WO2']), 1)
+        self.assertEqual((bolt.stock_quantity, nut.stock_quantity), (10, 3))
+
+    def test_reusing_a_key_is_rejected(self):
+        bolt = _material('bolt', 10)
+        ledger = MaterialReservationLedger()
+        with self.assertRaises(ValueError):
+            ledger.reserve_many([('WO1', [(bolt, 2)]), ('WO1', [(bolt, 3)])])
+        self.assertEqual(bolt.stock_quantity, 10)
+        self.assertTrue(ledger.try_reserve([(bolt, 2)], key='WO1'))
+        with self.assertRaises(ValueError):
+            ledger.try_reserve([(bolt, 3)], key='WO1')
+        self.assertFalse(ledger.try_reserve([(bolt, 30)], key='WO2'))
+        self.assertTrue(ledger.try_reserve([(bolt, 3)], key='WO2'))  # A failed attempt holds nothing
+        self.assertEqual(ledger.release_many(['WO1', 'WO2']), 2)
+        self.assertEqual(bolt.stock_quantity, 10)
+
+    def test_release_goes_to_the_current_material(self):
+        erp = ERPSystem()
+        erp.update_material(_material('bolt', 8))
+        erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                       labor_hours=Decimal('1'), notes=''))
+        inventory = erp.inventory_management
+        self.assertEqual(inventory.reserve_work_orders([('WO1', erp._get_bom('B1'), 3)]), {'WO1': True})
+        restocked = _material('bolt', 20)  # New master data, counted after the reservation was taken
+        erp.update_material(restocked)
+        self.assertEqual(inventory.release_work_orders(['WO1']), 1)
+        self.assertEqual(restocked.stock_quantity, 26)
+
+    def test_failed_work_order_hands_back_its_reservation(self):
+        erp = ERPSystem()
+        bolt = _material('bolt', 8)
+        erp.update_material(bolt)
+        erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                       labor_hours=Decimal('1'), notes=''))
+        with patch.object(erp.production_planning, 'schedule_work_order', side_effect=RuntimeError('calendar')):
+            with self.assertRaises(RuntimeError):
+                erp.create_work_order('B1', 1, datetime(2025, 1, 6, 8))
+        self.assertEqual(bolt.stock_quantity, 8)
+
+
+class TestSqlReservationLedger(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        MaterialRecord.__table__.create(self.engine)
+        self.session = Session(self.engine)
+        self.session.execute(MaterialRecord.__table__.insert(), [
+            {'id': 1, 'name': 'bolt', 'unit_cost': 1, 'stock_quantity': 10},
+            {'id': 2, 'name': 'nut', 'unit_cost': 1, 'stock_quantity': 3},
+        ])
+
+    def tearDown(self):
+        self.session.close()
+
+    def _stock(self):
+        table = MaterialRecord.__table__
+        return dict(self.session.execute(select(table.c.id, table.c.stock_quantity)).all())
+
+    def test_reserve_many_falls_back_to_per_order_savepoints(self):
+        ledger = SqlReservationLedger(self.session)
+        results = ledger.reserve_many({'WO1': {1: 5, 2: 2}, 'WO2': {1: 5, 2: 2}, 'WO3': {1: 4}})
+        self.assertEqual(results, {'WO1': True, 'WO2': False, 'WO3': True})
+        self.assertEqual(self._stock(), {1: 1, 2: 1})
+
+        ledger.release_many([{1: 5, 2: 2}, {1: 4}])
+        self.assertEqual(self._stock(), {1: 10, 2: 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
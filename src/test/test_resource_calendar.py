@@ -0,0 +1,184 @@
+import random
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.core_domain_models import BillOfMaterials, Material, Resource, ResourceType, WorkOrder, WorkOrderStatus
+from src.core_services import ProductionPlanningService
+from src.main import ERPSystem
+from src.resource_calendar import ResourceCalendar, from_seconds, to_seconds
+from src.segment_tree import MaxSegmentTree
+
+
+def _resource(resource_id: str, calendar: ResourceCalendar) -> Resource:
+    return Resource(
+        id=resource_id,
+        name=resource_id,
+        type=ResourceType.MACHINE,
+        capacity_per_hour=Decimal('1'),
+        cost_per_hour=Decimal('50.00'),
+        availability_schedule={},
+        calendar=calendar,
+    )
+
+
+class TestResourceCalendar(unittest.TestCase):
+    def setUp(self):
+        self.day = datetime(2025, 3, 3)
+        self.calendar = ResourceCalendar([
+            (self.day + timedelta(hours=8), self.day + timedelta(hours=12)),
+            (self.day + timedelta(hours=13), self.day + timedelta(hours=17)),
+        ])
+
+    def test_from_schedule_merges_consecutive_slots(self):
+        schedule = {self.day + timedelta(hours=h): True for h in range(8, 12)}
+        schedule[self.day + timedelta(hours=12)] = False
+        calendar = ResourceCalendar.from_schedule(schedule)
+        self.assertEqual(list(calendar), [(self.day + timedelta(hours=8), self.day + timedelta(hours=12))])
+
+    def test_is_available_handles_partial_hours(self):
+        self.assertTrue(self.calendar.is_available(self.day + timedelta(hours=8, minutes=15),
+                                                   self.day + timedelta(hours=11, minutes=45)))
+        self.assertFalse(self.calendar.is_available(self.day + timedelta(hours=11),
+                                                    self.day + timedelta(hours=14)))
+
+    def test_book_splits_interval(self):
+        self.calendar.book(self.day + timedelta(hours=9), self.day + timedelta(hours=10))
+        self.assertEqual(len(self.calendar), 3)
+        self.assertFalse(self.calendar.is_available(self.day + timedelta(hours=9, minutes=30),
+                                                    self.day + timedelta(hours=9, minutes=45)))
+        self.assertEqual(self.calendar.free_seconds(self.day, self.day + timedelta(days=1)), 7 * 3600)
+
+    def test_find_next_window_skips_short_gaps(self):
+        self.calendar.add_availability(self.day + timedelta(hours=18), self.day + timedelta(hours=19))
+        self.calendar.add_availability(self.day + timedelta(hours=20), self.day + timedelta(hours=26))
+        found = self.calendar.find_next_window(self.day + timedelta(hours=14), timedelta(hours=5))
+        self.assertEqual(found, self.day + timedelta(hours=20))
+        self.assertIsNone(self.calendar.find_next_window(self.day, timedelta(hours=7)))
+
+    def test_copies_share_intervals_until_written(self):
+        copy = self.calendar.copy()
+        self.assertIs(copy._starts, self.calendar._starts)
+        copy.book(self.day + timedelta(hours=9), self.day + timedelta(hours=10))
+        self.assertEqual(len(copy), 3)
+        self.assertEqual(len(self.calendar), 2)
+        self.calendar.add_availability(self.day + timedelta(hours=12), self.day + timedelta(hours=13))
+        self.assertEqual(len(self.calendar), 1)
+        self.assertEqual(len(copy), 3)
+
+    def test_searches_between_bookings_keep_the_tree_in_step(self):
+        rng = random.Random(7)
+        base = to_seconds(self.day)
+        calendar = ResourceCalendar([(self.day, self.day + timedelta(days=30))])
+        copies = []
+        build = unittest.mock.patch.object(MaxSegmentTree, '_build', autospec=True, side_effect=MaxSegmentTree._build)
+        with build as rebuilds:
+            self._random_bookings_and_searches(rng, base, calendar, copies)
+        self.assertLess(rebuilds.call_count, 12)  # The first search, then only when the tree outgrows its leaves
+        for each in [calendar] + copies:
+            self.assertEqual(list(each._tree.tree[each._tree.size:][:len(each)]),
+                             [end - start for start, end in zip(each._starts, each._ends)])
+
+    def _random_bookings_and_searches(self, rng, base, calendar, copies):
+        for _ in range(400):
+            start = base + rng.randrange(30 * 86400)
+            if rng.random() < 0.8:
+                calendar.book_seconds(start, start + rng.randrange(60, 4 * 3600))
+            else:
+                calendar.add_availability(from_seconds(start), from_seconds(start + rng.randrange(60, 3600)))
+            if rng.random() < 0.1:
+                copies.append(calendar.copy())
+                copies[-1].book_seconds(*copies[-1]._starts[:1], *copies[-1]._ends[:1])
+            earliest, duration = base + rng.randrange(30 * 86400), rng.randrange(60, 6 * 3600)
+            expected = next((max(start, earliest) for start, end in zip(calendar._starts, calendar._ends)
+                             if end - max(start, earliest) >= duration), None)
+            self.assertEqual(calendar.find_window_seconds(earliest, duration), expected)
+
+
+class TestProductionPlanningCalendar(unittest.TestCase):
+    def test_schedule_books_resources(self):
+        day = datetime(2025, 3, 3)
+        resource = _resource('M1', ResourceCalendar([(day, day + timedelta(hours=8))]))
+        order = WorkOrder(id='WO1', bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=1,
+                          start_date=day, end_date=day + timedelta(hours=4), assigned_resources=[],
+                          actual_labor_hours=Decimal('0'), actual_material_usage={})
+        service = ProductionPlanningService()
+        self.assertTrue(service.schedule_work_order(order, [resource]))
+        self.assertFalse(service.schedule_work_order(order, [resource]))
+        self.assertEqual(service.find_earliest_start([resource], day, timedelta(hours=2)),
+                         day + timedelta(hours=4))
+
+    def test_work_order_books_one_free_resource(self):
+        day = datetime(2025, 3, 3)
+        erp = ERPSystem()
+        erp.update_material(Material(id='bolt', name='bolt', description='', unit_cost=Decimal('0.10'),
+                                     stock_quantity=12, reorder_point=0, lead_time_days=0))
+        erp.update_bom(BillOfMaterials(id='B1', product_id='P1', version='1', components={'bolt': 2},
+                                       labor_hours=Decimal('1'), notes=''))
+        for resource_id in ('R0', 'R1'):
+            erp.resources[resource_id] = _resource(resource_id, ResourceCalendar([(day, day + timedelta(hours=8))]))
+
+        first = erp.create_work_order('B1', 2, day)
+        self.assertEqual([resource.id for resource in first.assigned_resources], ['R0'])
+        self.assertEqual(erp.resources['R1'].calendar.free_seconds(day, day + timedelta(hours=8)), 8 * 3600)
+        second = erp.create_work_order('B1', 2, day)
+        self.assertEqual([resource.id for resource in second.assigned_resources], ['R1'])
+        self.assertIsNone(erp.create_work_order('B1', 2, day))
+        self.assertEqual(erp.materials['bolt'].stock_quantity, 4)  # The rejected order's reservation went back
+
+    def test_batch_schedule_orders_by_priority_and_capacity(self):
+        day = datetime(2025, 3, 3)
+        resources = [_resource('M1', ResourceCalendar([(day, day + timedelta(hours=8))])),
+                     _resource('M2', ResourceCalendar([(day, day + timedelta(hours=8))]))]
+        resources[1].capacity_per_hour = Decimal('2')
+
+        def order(order_id, quantity, priority):
+            return WorkOrder(id=order_id, bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=quantity,
+                             start_date=day, end_date=day, assigned_resources=[],
+                             actual_labor_hours=Decimal('0'), actual_material_usage={},
+                             priority=priority, due_date=day + timedelta(hours=4))
+
+        orders = [order('low', 4, 0), order('high', 4, 5), order('mid', 4, 1), order('huge', 40, 0)]
+        result = ProductionPlanningService().schedule_work_orders(orders, resources)
+
+        placed = {wo.id: wo for wo in result.scheduled}
+        self.assertEqual([wo.id for wo in result.unscheduled], ['huge'])
+        self.assertEqual(placed['high'].start_date, day)
+        self.assertEqual(placed['mid'].start_date, day)
+        self.assertEqual({placed['high'].assigned_resources[0].id, placed['mid'].assigned_resources[0].id},
+                         {'M1', 'M2'})
+        self.assertEqual(placed['low'].assigned_resources[0].id, 'M2')
+        self.assertEqual(placed['low'].end_date, day + timedelta(hours=4))
+        self.assertEqual(result.late, [])
+
+    def test_batch_schedule_skips_resources_free_only_later(self):
+        day = datetime(2025, 3, 3)
+        resources = [_resource('M1', ResourceCalendar([(day + timedelta(days=5), day + timedelta(days=6))])),
+                     _resource('M2', ResourceCalendar([(day, day + timedelta(hours=8))]))]
+        order = WorkOrder(id='WO1', bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=2, start_date=day,
+                          end_date=day, assigned_resources=[], actual_labor_hours=Decimal('0'),
+                          actual_material_usage={}, due_date=day + timedelta(hours=4))
+        result = ProductionPlanningService().schedule_work_orders([order], resources)
+        self.assertEqual(order.assigned_resources[0].id, 'M2')
+        self.assertEqual(order.end_date, day + timedelta(hours=2))
+        self.assertEqual(result.late, [])
+        self.assertEqual(len(resources[0].calendar), 1)
+
+    def test_batch_schedule_uses_free_time_before_earlier_bookings(self):
+        day = datetime(2025, 3, 3)
+        resource = _resource('M1', ResourceCalendar([(day + timedelta(hours=8), day + timedelta(hours=18))]))
+
+        def order(order_id: str, priority: int, earliest: int) -> WorkOrder:
+            return WorkOrder(id=order_id, bom_id='B1', status=WorkOrderStatus.PLANNED, quantity=2,
+                             start_date=day + timedelta(hours=earliest), end_date=day, assigned_resources=[],
+                             actual_labor_hours=Decimal('0'), actual_material_usage={}, priority=priority)
+
+        urgent, filler = order('X', 2, 14), order('Y', 1, 8)
+        result = ProductionPlanningService().schedule_work_orders([filler, urgent], [resource])
+        self.assertEqual(result.scheduled, [urgent, filler])
+        self.assertEqual((urgent.start_date, filler.start_date), (day + timedelta(hours=14), day + timedelta(hours=8)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.core_domain_models import ExpenseEntry, TimeEntry
+from src.core_services import TimeAndExpenseService
+
+
+class TestTimeAndExpenseStore(unittest.TestCase):
+    def setUp(self):
+        self.day = datetime(2025, 4, 7, 6)
+        self.service = TimeAndExpenseService()
+        # Logged out of order on purpose
+        for hour in (3, 0, 2, 1):
+            for project_id in ('P1', 'P2'):
+                self.service.log_time_entry(TimeEntry(
+                    id=f"{project_id}-{hour}", resource_id='R1', project_id=project_id, work_order_id=None,
+                    start_time=self.day + timedelta(hours=hour),
+                    end_time=self.day + timedelta(hours=hour, minutes=45),
+                    activity_description='machining'))
+
+    def test_time_report_is_ordered_range(self):
+        report = self.service.generate_time_report('P1', self.day + timedelta(hours=1), self.day + timedelta(hours=3))
+        self.assertEqual([entry.id for entry in report], ['P1-1', 'P1-2'])
+        self.assertEqual(report[0].end_time, self.day + timedelta(hours=1, minutes=45))
+        self.assertIsNone(report[0].work_order_id)
+        self.assertEqual(self.service.generate_time_report('P9', self.day, self.day + timedelta(days=1)), [])
+        self.assertEqual(self.service.time_entries.hours_between('P2', self.day, self.day + timedelta(days=1)),
+                         Decimal('3'))
+
+    def test_expenses_round_trip_as_cents(self):
+        for day, amount in ((2, '12.50'), (0, '99.99'), (5, '1.01')):
+            self.service.log_expense_entry(ExpenseEntry(
+                id=f"E{day}", project_id='P1', amount=Decimal(amount), description='', category='parts',
+                date=self.day + timedelta(days=day)))
+        report = self.service.generate_expense_report('P1', self.day, self.day + timedelta(days=3))
+        self.assertEqual([(entry.id, entry.amount) for entry in report],
+                         [('E0', Decimal('99.99')), ('E2', Decimal('12.50'))])
+        self.assertEqual(self.service.expense_entries.total_between('P1', self.day, self.day + timedelta(days=7)),
+                         Decimal('113.50'))
+        with self.assertRaises(ValueError):
+            self.service.log_expense_entry(ExpenseEntry(id='bad', project_id='P1', amount=Decimal('0.001'),
+                                                        description='', category='', date=self.day))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import random
+import unittest
+from decimal import Decimal
+
+from src.core_domain_models import Project, Workflow, WorkflowStep
+from src.core_services import WorkflowManagementService
+from src.workflow_engine import CriticalPathEngine
+
+
+def _step(step_id: str, duration: int, *predecessors: str) -> WorkflowStep:
+    return WorkflowStep(id=step_id, name=step_id, description='', estimated_duration=duration,
+                        required_resources=[], predecessor_steps=list(predecessors))
+
+
+class TestCriticalPathEngine(unittest.TestCase):
+    def setUp(self):
+        #   cut(30) -> weld(60) -> paint(20)
+        #   cut(30) -> drill(10) -----^
+        self.steps = [_step('cut', 30), _step('weld', 60, 'cut'), _step('drill', 10, 'cut'),
+                      _step('paint', 20, 'weld', 'drill')]
+        self.engine = CriticalPathEngine(self.steps)
+
+    def test_schedule_and_critical_path(self):
+        self.assertEqual(self.engine.total_duration, 110)
+        self.assertEqual(self.engine.critical_path(), ['cut', 'weld', 'paint'])
+        self.assertEqual(self.engine.earliest_start('drill'), 30)
+        self.assertEqual(self.engine.latest_start('drill'), 80)
+        self.assertEqual(self.engine.slack('drill'), 50)
+
+    def test_estimate_change_moves_critical_path(self):
+        self.engine.set_duration('drill', 90)
+        self.assertEqual(self.engine.total_duration, 140)
+        self.assertEqual(self.engine.critical_path(), ['cut', 'drill', 'paint'])
+        self.assertEqual(self.engine.slack('weld'), 30)
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CriticalPathEngine([_step('a', 1, 'b'), _step('b', 1, 'a')])
+
+    def test_incremental_updates_match_full_recompute(self):
+        rng = random.Random(3)
+        steps = [_step(f"s{i}", rng.randint(1, 50), *rng.sample([f"s{j}" for j in range(i)], min(i, 3)))
+                 for i in range(200)]
+        engine = CriticalPathEngine(steps)
+        for _ in range(100):
+            step = rng.choice(steps)
+            step.estimated_duration = rng.randint(1, 50)
+            engine.set_duration(step.id, step.estimated_duration)
+        fresh = CriticalPathEngine(steps)
+        self.assertEqual(engine.total_duration, fresh.total_duration)
+        for step in steps:
+            self.assertEqual(engine.earliest_start(step.id), fresh.earliest_start(step.id))
+            self.assertEqual(engine.slack(step.id), fresh.slack(step.id))
+
+
+class TestWorkflowManagementService(unittest.TestCase):
+    def _project(self, project_id: str) -> Project:
+        return Project(id=project_id, name='P', description='', start_date=None, end_date=None, work_orders=[],
+                       assigned_workflow=None, budget=Decimal('0'), actual_cost=Decimal('0'))
+
+    def test_status_updates_maintain_total_duration(self):
+        template = Workflow(id='W1', name='Assembly', steps=[_step('a', 10), _step('b', 20, 'a')],
+                            total_estimated_duration=0)
+        project = self._project('P1')
+        service = WorkflowManagementService()
+        service.create_workflow_instance(template, project)
+        workflow = project.assigned_workflow
+        self.assertEqual(workflow.total_estimated_duration, 30)
+
+        service.update_step_status(project, 'a', True, actual_duration=25)
+        self.assertEqual(workflow.total_estimated_duration, 45)
+        self.assertEqual(service.get_schedule(project).ready_steps(), ['b'])
+
+        service.update_step_estimate(project, 'b', 5)
+        self.assertEqual(workflow.total_estimated_duration, 30)
+        self.assertEqual(workflow.steps[1].estimated_duration, 5)
+
+    def test_projects_from_one_template_are_independent(self):
+        template = Workflow(id='W1', name='Assembly', steps=[_step('a', 10), _step('b', 20, 'a')],
+                            total_estimated_duration=0)
+        first, second = self._project('P1'), self._project('P2')
+        service = WorkflowManagementService()
+        service.create_workflow_instance(template, first)
+        service.update_step_status(first, 'a', True, actual_duration=25)
+        service.update_step_estimate(first, 'b', 5)
+        service.create_workflow_instance(template, second)
+
+        self.assertEqual(first.assigned_workflow.total_estimated_duration, 30)
+        self.assertEqual(service.get_schedule(first).ready_steps(), ['b'])
+        self.assertEqual(second.assigned_workflow.total_estimated_duration, 30)
+        self.assertEqual(service.get_schedule(second).ready_steps(), ['a'])
+        self.assertEqual([step.estimated_duration for step in template.steps], [10, 20])
+        self.assertEqual(template.total_estimated_duration, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from src.core_domain_models import ExpenseEntry, TimeEntry
+from src.resource_calendar import from_seconds, to_seconds
+
+AMOUNT_SCALE = 100  # Expense amounts are stored in integer cents
+
+
+class _Codes:
+    """
+    Interns repeated strings (ids, descriptions, categories) as small integer codes.
+    """
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: Optional[str]) -> Optional[int]:
+        return self._codes.get(value)
+
+
+class _ProjectIndex:
+    """
+    Per-project row numbers sorted by a timestamp column, for range lookups.
+    Rows usually arrive in time order, so inserts are appends.
+    """
+
+    def __init__(self):
+        self._timestamps: Dict[int, array] = {}
+        self._rows: Dict[int, array] = {}
+
+    def add(self, project: int, timestamp: int, row: int) -> None:
+        timestamps = self._timestamps.get(project)
+        if timestamps is None:
+            timestamps = self._timestamps[project] = array('q')
+            self._rows[project] = array('q')
+        rows = self._rows[project]
+        if not timestamps or timestamps[-1] <= timestamp:
+            timestamps.append(timestamp)
+            rows.append(row)
+        else:
+            position = bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            rows.insert(position, row)
+
+    def rows(self, project: Optional[int], start: int, end: int) -> array:
+        timestamps = self._timestamps.get(project)
+        if timestamps is None:
+            return array('q')
+        return self._rows[project][bisect_left(timestamps, start):bisect_left(timestamps, end)]
+
+
+class TimeEntryStore:
+    """
+    Append-only columnar storage for time entries.
+
+    Every column is a typed array or an interned code, so a row costs a few
+    dozen bytes instead of a dataclass instance with its own __dict__.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._resources = _Codes()
+        self._projects = _Codes()
+        self._work_orders = _Codes()
+        self._descriptions = _Codes()
+        self._resource_col = array('l')
+        self._project_col = array('l')
+        self._work_order_col = array('l')
+        self._description_col = array('l')
+        self._start_col = array('q')
+        self._end_col = array('q')
+        self._by_project = _ProjectIndex()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, entry: TimeEntry) -> None:
+        row = len(self._ids)
+        project = self._projects.code(entry.project_id)
+        start = to_seconds(entry.start_time)
+        self._ids.append(entry.id)
+        self._resource_col.append(self._resources.code(entry.resource_id))
+        self._project_col.append(project)
+        self._work_order_col.append(self._work_orders.code(entry.work_order_id))
+        self._description_col.append(self._descriptions.code(entry.activity_description))
+        self._start_col.append(start)
+        self._end_col.append(to_seconds(entry.end_time))
+        self._by_project.add(project, start, row)
+
+    def rows_between(self, project_id: str, start: datetime, end: datetime) -> array:
+        """
+        Row numbers of the project's entries starting in [start, end), in start order.
+        """
+        return self._by_project.rows(self._projects.find(project_id), to_seconds(start), to_seconds(end))
+
+    def entries_between(self, project_id: str, start: datetime, end: datetime) -> List[TimeEntry]:
+        return [self.entry(row) for row in self.rows_between(project_id, start, end)]
+
+    def hours_between(self, project_id: str, start: datetime, end: datetime) -> Decimal:
+        """
+        Total logged hours of the project's entries starting in [start, end).
+        """
+        seconds = sum(self._end_col[row] - self._start_col[row] for row in self.rows_between(project_id, start, end))
+        return Decimal(seconds) / 3600
+
+    def labor_columns(self) -> Tuple[array, List[Optional[str]], array, List[Optional[str]], array, array]:
+        """
+        Raw columns for vectorized costing: (resource codes, resource id per code,
+        work order codes, work order id per code, start seconds, end seconds).
+        """
+        return (self._resource_col, self._resources.values, self._work_order_col, self._work_orders.values,
+                self._start_col, self._end_col)
+
+    def entry(self, row: int) -> TimeEntry:
+        return TimeEntry(
+            id=self._ids[row],
+            resource_id=self._resources.values[self._resource_col[row]],
+            project_id=self._projects.values[self._project_col[row]],
+            work_order_id=self._work_orders.values[self._work_order_col[row]],
+            start_time=from_seconds(self._start_col[row]),
+            end_time=from_seconds(self._end_col[row]),
+            activity_description=self._descriptions.values[self._description_col[row]],
+        )
+
+
+class ExpenseEntryStore:
+    """
+    Append-only columnar storage for expense entries, amounts in integer cents.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._projects = _Codes()
+        self._descriptions = _Codes()
+        self._categories = _Codes()
+        self._project_col = array('l')
+        self._description_col = array('l')
+        self._category_col = array('l')
+        self._date_col = array('q')
+        self._amount_col = array('q')
+        self._by_project = _ProjectIndex()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, entry: ExpenseEntry) -> None:
+        scaled = entry.amount * AMOUNT_SCALE
+        if scaled != scaled.to_integral_value():
+            raise ValueError(f"Expense {entry.id} amount {entry.amount} has sub-cent precision")
+        row = len(self._ids)
+        project = self._projects.code(entry.project_id)
+        date = to_seconds(entry.date)
+        self._ids.append(entry.id)
+        self._project_col.append(project)
+        self._description_col.append(self._descriptions.code(entry.description))
+        self._category_col.append(self._categories.code(entry.category))
+        self._date_col.append(date)
+        self._amount_col.append(int(scaled))
+        self._by_project.add(project, date, row)
+
+    def rows_between(self, project_id: str, start: datetime, end: datetime) -> array:
+        """
+        Row numbers of the project's expenses dated in [start, end), in date order.
+        """
+        return self._by_project.rows(self._projects.find(project_id), to_seconds(start), to_seconds(end))
+
+    def entries_between(self, project_id: str, start: datetime, end: datetime) -> List[ExpenseEntry]:
+        return [self.entry(row) for row in self.rows_between(project_id, start, end)]
+
+    def total_between(self, project_id: str, start: datetime, end: datetime) -> Decimal:
+        cents = sum(self._amount_col[row] for row in self.rows_between(project_id, start, end))
+        return Decimal(cents) / AMOUNT_SCALE
+
+    def entry(self, row: int) -> ExpenseEntry:
+        return ExpenseEntry(
+            id=self._ids[row],
+            project_id=self._projects.values[self._project_col[row]],
+            amount=Decimal(self._amount_col[row]) / AMOUNT_SCALE,
+            description=self._descriptions.values[self._description_col[row]],
+            date=from_seconds(self._date_col[row]),
+            category=self._categories.values[self._category_col[row]],
+        )
@@ -0,0 +1,162 @@
+import heapq
+from typing import List, Optional, Set
+
+from src.core_domain_models import WorkflowStep
+
+
+class CriticalPathEngine:
+    """
+    Critical path schedule over a workflow step DAG, in minutes from workflow start.
+
+    For every step the engine keeps `head` (earliest start) and `tail` (longest
+    path from the step's start to the workflow end, including itself). Latest
+    start is `total_duration - tail`. A duration change only re-propagates heads
+    downstream and tails upstream of the changed step, stopping wherever a value
+    is unchanged.
+    """
+
+    def __init__(self, steps: List[WorkflowStep]):
+        self.step_ids = [step.id for step in steps]
+        self._index = {step_id: i for i, step_id in enumerate(self.step_ids)}
+        self._durations = [step.estimated_duration for step in steps]
+        self._completed = [False] * len(steps)
+        self._predecessors: List[List[int]] = [[] for _ in steps]
+        self._successors: List[List[int]] = [[] for _ in steps]
+        for i, step in enumerate(steps):
+            for predecessor_id in step.predecessor_steps:
+                if predecessor_id not in self._index:
+                    raise ValueError(f"Step {step.id} depends on unknown step {predecessor_id}")
+                predecessor = self._index[predecessor_id]
+                self._predecessors[i].append(predecessor)
+                self._successors[predecessor].append(i)
+
+        self._order = self._topological_order()
+        self._position = [0] * len(steps)
+        for position, i in enumerate(self._order):
+            self._position[i] = position
+        self._sinks = [i for i in range(len(steps)) if not self._successors[i]]
+
+        self._head = [0] * len(steps)
+        self._tail = [0] * len(steps)
+        for i in self._order:
+            self._head[i] = self._compute_head(i)
+        for i in reversed(self._order):
+            self._tail[i] = self._compute_tail(i)
+        self._total = self._compute_total()
+
+    @property
+    def total_duration(self) -> int:
+        return self._total
+
+    def earliest_start(self, step_id: str) -> int:
+        return self._head[self._index[step_id]]
+
+    def latest_start(self, step_id: str) -> int:
+        return self._total - self._tail[self._index[step_id]]
+
+    def slack(self, step_id: str) -> int:
+        i = self._index[step_id]
+        return self._total - self._tail[i] - self._head[i]
+
+    def critical_path(self) -> List[str]:
+        """
+        Step ids of one zero-slack chain from a start step to an end step.
+        """
+        critical = [i for i in self._order if self._total - self._tail[i] == self._head[i]]
+        if not critical:
+            return []
+        path = [min((i for i in critical if not self._predecessors[i]), key=lambda i: self._position[i])]
+        while self._successors[path[-1]]:
+            current = path[-1]
+            path.append(next(i for i in self._successors[current]
+                             if self._head[i] == self._head[current] + self._durations[current]
+                             and self._total - self._tail[i] == self._head[i]))
+        return [self.step_ids[i] for i in path]
+
+    def is_completed(self, step_id: str) -> bool:
+        return self._completed[self._index[step_id]]
+
+    def ready_steps(self) -> List[str]:
+        """
+        Open steps whose predecessors are all completed.
+        """
+        return [self.step_ids[i] for i in self._order
+                if not self._completed[i] and all(self._completed[p] for p in self._predecessors[i])]
+
+    def set_duration(self, step_id: str, duration: int) -> None:
+        """
+        Change a step's duration and update the affected part of the schedule.
+        """
+        i = self._index[step_id]
+        if self._durations[i] == duration:
+            return
+        self._durations[i] = duration
+        self._propagate_heads(self._successors[i])
+        self._propagate_tails([i])
+        self._total = self._compute_total()
+
+    def mark_completed(self, step_id: str, completed: bool = True, actual_duration: Optional[int] = None) -> None:
+        """
+        Record a step's completion, optionally replacing its estimate with the actual duration.
+        """
+        self._completed[self._index[step_id]] = completed
+        if actual_duration is not None:
+            self.set_duration(step_id, actual_duration)
+
+    def _compute_head(self, i: int) -> int:
+        return max((self._head[p] + self._durations[p] for p in self._predecessors[i]), default=0)
+
+    def _compute_tail(self, i: int) -> int:
+        return self._durations[i] + max((self._tail[s] for s in self._successors[i]), default=0)
+
+    def _compute_total(self) -> int:
+        return max((self._head[i] + self._durations[i] for i in self._sinks), default=0)
+
+    def _propagate_heads(self, start: List[int]) -> None:
+        queue = [(self._position[i], i) for i in start]
+        heapq.heapify(queue)
+        queued: Set[int] = set(start)
+        while queue:
+            _, i = heapq.heappop(queue)
+            queued.discard(i)
+            head = self._compute_head(i)
+            if head == self._head[i]:
+                continue
+            self._head[i] = head
+            for successor in self._successors[i]:
+                if successor not in queued:
+                    queued.add(successor)
+                    heapq.heappush(queue, (self._position[successor], successor))
+
+    def _propagate_tails(self, start: List[int]) -> None:
+        queue = [(-self._position[i], i) for i in start]
+        heapq.heapify(queue)
+        queued: Set[int] = set(start)
+        while queue:
+            _, i = heapq.heappop(queue)
+            queued.discard(i)
+            tail = self._compute_tail(i)
+            if tail == self._tail[i]:
+                continue
+            self._tail[i] = tail
+            for predecessor in self._predecessors[i]:
+                if predecessor not in queued:
+                    queued.add(predecessor)
+                    heapq.heappush(queue, (-self._position[predecessor], predecessor))
+
+    def _topological_order(self) -> List[int]:
+        in_degree = [len(predecessors) for predecessors in self._predecessors]
+        ready = [i for i, degree in enumerate(in_degree) if degree == 0]
+        order = []
+        while ready:
+            i = ready.pop()
+            order.append(i)
+            for successor in self._successors[i]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    ready.append(successor)
+        if len(order) != len(self.step_ids):
+            cyclic = sorted(self.step_ids[i] for i, degree in enumerate(in_degree) if degree > 0)
+            raise ValueError(f"Workflow steps form a cycle: {', '.join(cyclic)}")
+        return order
+